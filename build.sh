@@ -11,9 +11,7 @@ cp -R i build/
 cp -R esempi build/
 
 echo "validating HTML"
-for f in *.html; do
-  "$python3" util/validate.py "$f" || die "Failed to validate $f"
-done
+"$python3" util/validate.py *.html || die "Failed to validate HTML"
 
 echo "minimizing HTML"
 for f in *.html; do
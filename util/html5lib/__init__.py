@@ -11,7 +11,7 @@ f = open("my_document.html")
 tree = html5lib.parse(f) 
 """
 
-from .html5parser import HTMLParser, parse
+from .html5parser import HTMLParser, parse, parseMany, getParser, parseEvents
 from .treebuilders import getTreeBuilder
 
 #from .liberalxmlparser import XMLParser, XHTMLParser
@@ -0,0 +1,84 @@
+"""Parsing many files at once, spread over several processes.
+
+Example usage:
+
+from html5lib import batch
+for path, errors in zip(paths, batch.parseFiles(paths)):
+    ...
+"""
+
+try:
+    from concurrent import futures
+except ImportError:
+    # Python before 3.2 has no process pools, and the files are parsed one
+    # after the other
+    futures = None
+
+from .html5parser import getParser
+from .cache import getCache
+from .treewalkers import simpletree as simpletreeWalker
+from .serializer import HTMLSerializer
+
+modes = ("validate", "tree", "serialize")
+
+def parseFiles(paths, workers=None, mode="validate", encoding=None,
+               serializerOptions={}, cacheDirectory=None):
+    """Parse the files in paths over a pool of worker processes and return
+    a list with a result for each of them, in the same order as paths
+
+    workers - the number of processes, by default as many as the machine has
+    processors. With 1, or where concurrent.futures is not available, all
+    the files are parsed in this process
+
+    mode - what to return for each file
+           "validate" - the list of its parse errors, as in HTMLParser.errors
+           "tree" - its simpletree document
+           "serialize" - the bytes of its tree serialized by HTMLSerializer,
+                         in encoding or else UTF-8
+
+    encoding - the encoding of the files, if known
+
+    serializerOptions - keyword arguments for HTMLSerializer in "serialize"
+    mode
+
+    cacheDirectory - where to keep a cache.ParseCache of the parse results,
+    if any
+    """
+    if mode not in modes:
+        raise ValueError("Unknown mode %r, expected one of %s" %
+                         (mode, ", ".join(modes)))
+    jobs = [(path, mode, encoding, serializerOptions, cacheDirectory)
+            for path in paths]
+    if workers == 1 or len(jobs) < 2 or futures is None:
+        return [parseFile(job) for job in jobs]
+    executor = futures.ProcessPoolExecutor(workers)
+    try:
+        return list(executor.map(parseFile, jobs))
+    finally:
+        executor.shutdown()
+
+def parseFile(job):
+    """Parse one file in a worker process. Parsers are reused from one file
+    to the next, see html5parser.getParser"""
+    path, mode, encoding, serializerOptions, cacheDirectory = job
+    if cacheDirectory is None:
+        cache = None
+    else:
+        cache = getCache(cacheDirectory)
+    if mode == "validate":
+        parser = getParser("null", cache=cache)
+    else:
+        parser = getParser("simpletree", cache=cache)
+    stream = open(path, "rb")
+    try:
+        document = parser.parse(stream, encoding=encoding)
+    finally:
+        stream.close()
+    if mode == "validate":
+        return parser.errors
+    elif mode == "tree":
+        return document
+    else:
+        serializer = HTMLSerializer(**serializerOptions)
+        output = serializer.render(simpletreeWalker.TreeWalker(document))
+        return output.encode(encoding or "utf-8")
@@ -0,0 +1,167 @@
+"""An on-disk cache of parse results, for HTMLParser(cache=...).
+
+Entries are keyed by the SHA-256 of the input bytes together with the
+configuration of the parser, the version of the entry format and the sources
+of html5lib, so that a changed parser doesn't use results from an older one,
+and hold the document, the parse errors and
+the compatibility mode, pickled and compressed. When the entries take more
+than maxSize bytes the least recently used ones are removed.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+
+# The version of the format of the entries, to be increased whenever what
+# HTMLParser.parseCached stores or how keys are made changes
+version = 2
+
+# ParseCache objects handed out by getCache, by directory
+cacheInstances = {}
+
+# The SHA-256 of the sources of html5lib, worked out on first use
+sourceDigest = None
+
+def getSourceDigest():
+    """The hex SHA-256 of the names and contents of the modules of html5lib,
+    which changes with any change to the parser"""
+    global sourceDigest
+    if sourceDigest is None:
+        packageDirectory = os.path.dirname(os.path.abspath(__file__))
+        paths = []
+        for directory, dirnames, filenames in os.walk(packageDirectory):
+            if "tests" in dirnames:
+                dirnames.remove("tests")
+            for filename in filenames:
+                if filename.endswith(".py"):
+                    paths.append(os.path.join(directory, filename))
+        digest = hashlib.sha256()
+        for path in sorted(paths):
+            name = os.path.relpath(path, packageDirectory).replace(os.sep, "/")
+            digest.update(name.encode("utf-8") + b"\0")
+            f = open(path, "rb")
+            try:
+                digest.update(f.read())
+            finally:
+                f.close()
+            digest.update(b"\0")
+        sourceDigest = digest.hexdigest()
+    return sourceDigest
+
+def getCache(directory, maxSize=None):
+    """Get the ParseCache for directory, shared with other calls in this
+    process so that it can be part of the configuration of pooled parsers"""
+    directory = os.path.abspath(directory)
+    if directory not in cacheInstances:
+        if maxSize is None:
+            cacheInstances[directory] = ParseCache(directory)
+        else:
+            cacheInstances[directory] = ParseCache(directory, maxSize)
+    return cacheInstances[directory]
+
+class ParseCache(object):
+    suffix = ".parse"
+
+    def __init__(self, directory, maxSize=64*1024*1024):
+        """directory - where to keep the entries. It is created if needed
+
+        maxSize - how many bytes the entries may take in total"""
+        self.directory = directory
+        self.maxSize = maxSize
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, data, config):
+        """The key for the input bytes data parsed with config, a tuple of
+        strings, numbers and booleans"""
+        digest = hashlib.sha256(repr((version, getSourceDigest(),
+                                      config)).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """Return the result stored for key, or None"""
+        path = self.path(key)
+        try:
+            f = open(path, "rb")
+        except EnvironmentError:
+            return None
+        try:
+            try:
+                result = pickle.loads(zlib.decompress(f.read()))
+            except Exception:
+                # A damaged entry, or one written by another version
+                return None
+        finally:
+            f.close()
+        # Mark the entry as recently used
+        try:
+            os.utime(path, None)
+        except EnvironmentError:
+            pass
+        return result
+
+    def set(self, key, result):
+        """Store result for key, unless it can't be pickled"""
+        try:
+            data = zlib.compress(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+        except (pickle.PicklingError, TypeError, AttributeError,
+                RuntimeError):
+            # Too deep a tree raises RuntimeError, or its subclass
+            # RecursionError from Python 3.5 on
+            return
+        # Write to a temporary file first, so that other processes using the
+        # cache never see half an entry
+        fd, tempPath = tempfile.mkstemp(dir=self.directory)
+        try:
+            f = os.fdopen(fd, "wb")
+            try:
+                f.write(data)
+            finally:
+                f.close()
+            path = self.path(key)
+            try:
+                os.rename(tempPath, path)
+            except EnvironmentError:
+                # On Windows rename doesn't replace an entry that another
+                # process has written meanwhile
+                os.remove(path)
+                os.rename(tempPath, path)
+        except EnvironmentError:
+            try:
+                os.remove(tempPath)
+            except EnvironmentError:
+                pass
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the rest fit in
+        maxSize"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except EnvironmentError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except EnvironmentError:
+                pass
+            total -= size
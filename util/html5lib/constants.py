@@ -1109,3 +1109,7 @@ class DataLossWarning(UserWarning):
 
 class ReparseException(Exception):
     pass
+
+class NeedDataException(Exception):
+    """Raised by a HTMLPushInputStream that has run out of the data fed so far"""
+    pass
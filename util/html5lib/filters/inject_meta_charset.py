@@ -1,4 +1,5 @@
 from . import _base
+from html5lib.utils import Token
 
 class Filter(_base.Filter):
     def __init__(self, source, encoding):
@@ -11,19 +12,19 @@ class Filter(_base.Filter):
         pending = []
 
         for token in _base.Filter.__iter__(self):
-            type = token["type"]
+            type = token.type
             if type == "StartTag":
-                if token["name"].lower() == "head":
+                if token.name.lower() == "head":
                     state = "in_head"
 
             elif type == "EmptyTag":
-                if token["name"].lower() == "meta":
+                if token.name.lower() == "meta":
                    # replace charset with actual encoding
                    has_http_equiv_content_type = False
                    content_index = -1
-                   for i,(name,value) in enumerate(token["data"]):
+                   for i,(name,value) in enumerate(token.data):
                        if name.lower() == 'charset':
-                          token["data"][i] = ('charset', self.encoding)
+                          token.data[i] = ('charset', self.encoding)
                           meta_found = True
                           break
                        elif name == 'http-equiv' and value.lower() == 'content-type':
@@ -32,26 +33,25 @@ class Filter(_base.Filter):
                            content_index = i
                    else:
                        if has_http_equiv_content_type and content_index >= 0:
-                           token["data"][content_index] = ('content', 'text/html; charset=%s' % self.encoding)
+                           token.data[content_index] = ('content', 'text/html; charset=%s' % self.encoding)
                            meta_found = True
 
-                elif token["name"].lower() == "head" and not meta_found:
+                elif token.name.lower() == "head" and not meta_found:
                     # insert meta into empty head
-                    yield {"type": "StartTag", "name": "head",
-                           "data": token["data"]}
-                    yield {"type": "EmptyTag", "name": "meta",
-                           "data": [["charset", self.encoding]]}
-                    yield {"type": "EndTag", "name": "head"}
+                    yield Token("StartTag", token.data, name="head")
+                    yield Token("EmptyTag", [["charset", self.encoding]],
+                                name="meta")
+                    yield Token("EndTag", [], name="head")
                     meta_found = True
                     continue
 
             elif type == "EndTag":
-                if token["name"].lower() == "head" and pending:
+                if token.name.lower() == "head" and pending:
                     # insert meta into head (if necessary) and flush pending queue
                     yield pending.pop(0)
                     if not meta_found:
-                        yield {"type": "EmptyTag", "name": "meta",
-                               "data": [["charset", self.encoding]]}
+                        yield Token("EmptyTag", [["charset", self.encoding]],
+                                    name="meta")
                     while pending:
                         yield pending.pop(0)
                     meta_found = True
@@ -12,18 +12,18 @@ class Filter(_base.Filter):
 
     def __iter__(self):
         for previous, token, next in self.slider():
-            type = token["type"]
+            type = token.type
             if type == "StartTag":
-                if token["data"] or not self.is_optional_start(token["name"], previous, next):
+                if token.data or not self.is_optional_start(token.name, previous, next):
                     yield token
             elif type == "EndTag":
-                if not self.is_optional_end(token["name"], next):
+                if not self.is_optional_end(token.name, next):
                     yield token
             else:
                 yield token
 
     def is_optional_start(self, tagname, previous, next):
-        type = next and next["type"] or None
+        type = next and next.type or None
         if tagname in 'html':
             # An html element's start tag may be omitted if the first thing
             # inside the html element is not a space character or a comment.
@@ -35,7 +35,7 @@ class Filter(_base.Filter):
             if type in ("StartTag", "EmptyTag"):
                 return True
             elif type == "EndTag":
-                return next["name"] == "head"
+                return next.name == "head"
         elif tagname == 'body':
             # A body element's start tag may be omitted if the first thing
             # inside the body element is not a space character or a comment,
@@ -48,7 +48,7 @@ class Filter(_base.Filter):
                 # XXX: we do not look at the preceding event, so we never omit
                 # the body element's start tag if it's followed by a script or
                 # a style element.
-                return next["name"] not in ('script', 'style')
+                return next.name not in ('script', 'style')
             else:
                 return True
         elif tagname == 'colgroup':
@@ -60,7 +60,7 @@ class Filter(_base.Filter):
                 # XXX: we do not look at the preceding event, so instead we never
                 # omit the colgroup element's end tag when it is immediately
                 # followed by another colgroup element. See is_optional_end.
-                return next["name"] == "col"
+                return next.name == "col"
             else:
                 return False
         elif tagname == 'tbody':
@@ -71,16 +71,16 @@ class Filter(_base.Filter):
             if type == "StartTag":
                 # omit the thead and tfoot elements' end tag when they are
                 # immediately followed by a tbody element. See is_optional_end.
-                if previous and previous['type'] == 'EndTag' and \
-                  previous['name'] in ('tbody','thead','tfoot'):
+                if previous and previous.type == 'EndTag' and \
+                  previous.name in ('tbody','thead','tfoot'):
                     return False
-                return next["name"] == 'tr'
+                return next.name == 'tr'
             else:
                 return False
         return False
 
     def is_optional_end(self, tagname, next):
-        type = next and next["type"] or None
+        type = next and next.type or None
         if tagname in ('html', 'head', 'body'):
             # An html element's end tag may be omitted if the html element
             # is not immediately followed by a space character or a comment.
@@ -96,7 +96,7 @@ class Filter(_base.Filter):
             # immediately followed by another tr element, or if there is
             # no more content in the parent element.
             if type == "StartTag":
-                return next["name"] == tagname
+                return next.name == tagname
             else:
                 return type == "EndTag" or type is None
         elif tagname in ('dt', 'dd'):
@@ -106,7 +106,7 @@ class Filter(_base.Filter):
             # immediately followed by another dd element or a dt element,
             # or if there is no more content in the parent element.
             if type == "StartTag":
-                return next["name"] in ('dt', 'dd')
+                return next.name in ('dt', 'dd')
             elif tagname == 'dd':
                 return type == "EndTag" or type is None
             else:
@@ -119,7 +119,7 @@ class Filter(_base.Filter):
             # nav, ol, p, pre, section, table, or ul, element, or if
             # there is no more content in the parent element.
             if type in ("StartTag", "EmptyTag"):
-                return next["name"] in ('address', 'article', 'aside',     \
+                return next.name in ('address', 'article', 'aside',     \
                     'blockquote', 'datagrid', 'dialog', 'dir', 'div',      \
                     'dl', 'fieldset', 'footer', 'form', 'h1', 'h2', 'h3',  \
                     'h4', 'h5', 'h6', 'header', 'hr', 'menu', 'nav', 'ol', \
@@ -133,7 +133,7 @@ class Filter(_base.Filter):
             # element, or if there is no more content in the parent
             # element.
             if type == "StartTag":
-                return next["name"] in ('option', 'optgroup')
+                return next.name in ('option', 'optgroup')
             else:
                 return type == "EndTag" or type is None
         elif tagname in ('rt', 'rp'):
@@ -144,7 +144,7 @@ class Filter(_base.Filter):
             # immediately followed by an rt or rp element, or if there is
             # no more content in the parent element.
             if type == "StartTag":
-                return next["name"] in ('rt', 'rp')
+                return next.name in ('rt', 'rp')
             else:
                 return type == "EndTag" or type is None
         elif tagname == 'colgroup':
@@ -156,7 +156,7 @@ class Filter(_base.Filter):
             elif type == "StartTag":
                 # XXX: we also look for an immediately following colgroup
                 # element. See is_optional_start.
-                return next["name"] != 'colgroup'
+                return next.name != 'colgroup'
             else:
                 return True
         elif tagname in ('thead', 'tbody'):
@@ -171,7 +171,7 @@ class Filter(_base.Filter):
             # XXX: we never omit the end tag when the following element is
             # a tbody. See is_optional_start.
             if type == "StartTag":
-                return next["name"] in ['tbody', 'tfoot']
+                return next.name in ['tbody', 'tfoot']
             elif tagname == 'tbody':
                 return type == "EndTag" or type is None
             else:
@@ -183,7 +183,7 @@ class Filter(_base.Filter):
             # XXX: we never omit the end tag when the following element is
             # a tbody. See is_optional_start.
             if type == "StartTag":
-                return next["name"] == 'tbody'
+                return next.name == 'tbody'
             else:
                 return type == "EndTag" or type is None
         elif tagname in ('td', 'th'):
@@ -194,7 +194,7 @@ class Filter(_base.Filter):
             # immediately followed by a td or th element, or if there is
             # no more content in the parent element.
             if type == "StartTag":
-                return next["name"] in ('td', 'th')
+                return next.name in ('td', 'th')
             else:
                 return type == "EndTag" or type is None
         return False
@@ -19,20 +19,20 @@ class Filter(_base.Filter):
     def __iter__(self):
         preserve = 0
         for token in _base.Filter.__iter__(self):
-            type = token["type"]
+            type = token.type
             if type == "StartTag" \
-              and (preserve or token["name"] in self.spacePreserveElements):
+              and (preserve or token.name in self.spacePreserveElements):
                 preserve += 1
 
             elif type == "EndTag" and preserve:
                 preserve -= 1
 
-            elif not preserve and type == "SpaceCharacters" and token["data"]:
-                # Test on token["data"] above to not introduce spaces where there were not
-                token["data"] = " "
+            elif not preserve and type == "SpaceCharacters" and token.data:
+                # Test on token.data above to not introduce spaces where there were not
+                token.data = " "
 
             elif not preserve and type == "Characters":
-                token["data"] = collapse_spaces(token["data"])
+                token.data = collapse_spaces(token.data)
 
             yield token
 
@@ -1,4 +1,11 @@
 import sys
+import threading
+try:
+    from time import perf_counter as timer
+except ImportError:
+    # Python before 3.3 has no perf_counter, and stats times are only as
+    # precise as the clock
+    from time import time as timer
 
 from . import inputstream
 from . import tokenizer
@@ -8,12 +15,13 @@ from .treebuilders._base import Marker
 from .treebuilders import simpletree
 
 from . import utils
+from .utils import Token
 
 from .constants import contentModelFlags, spaceCharacters, asciiUpper2Lower
 from .constants import scopingElements, formattingElements, specialElements
 from .constants import headingElements, tableInsertModeElements
 from .constants import cdataElements, rcdataElements, voidElements
-from .constants import tokenTypes
+from .constants import tokenTypes, ReparseException
 
 def parse(doc, treebuilderName="simpletree", encoding=None, implementation=None):
     tb = treebuilders.getTreeBuilder(treebuilderName, 
@@ -21,16 +29,62 @@ def parse(doc, treebuilderName="simpletree", encoding=None, implementation=None)
     p = HTMLParser(tb)
     return p.parse(doc, encoding=encoding)
 
+def parseEvents(doc, encoding=None):
+    """Parse a HTML document into a stream of (event, node) pairs, see
+    treebuilders.events"""
+    p = HTMLParser(treebuilders.getTreeBuilder("events"))
+    return p.parseEvents(doc, encoding=encoding)
+
+# Parsers handed out by getParser, kept per thread since an HTMLParser can
+# only work on one document at a time
+parserPool = threading.local()
+
+def getParser(treebuilderName="simpletree", implementation=None, **kwargs):
+    """Get a HTMLParser for the given type of tree that is shared with later
+    calls from the same thread, so that the setup of the parser and of its
+    tree builder is only paid for once. Any further keyword arguments are
+    passed on to HTMLParser when it is first created
+
+    Each parse resets the parser, so the errors of a document must be read
+    before the next one is parsed"""
+    key = (treebuilderName.lower(), implementation,
+           tuple(sorted(kwargs.items())))
+    try:
+        parsers = parserPool.parsers
+    except AttributeError:
+        parsers = parserPool.parsers = {}
+    if key not in parsers:
+        tb = treebuilders.getTreeBuilder(treebuilderName,
+                                         implementation=implementation)
+        parsers[key] = HTMLParser(tb, **kwargs)
+    return parsers[key]
+
+def parseMany(docs, treebuilderName="simpletree", encoding=None,
+              implementation=None):
+    """Parse each of the documents in docs with the same pooled parser,
+    generating their trees in order"""
+    p = getParser(treebuilderName, implementation)
+    for doc in docs:
+        yield p.parse(doc, encoding=encoding)
+
 class HTMLParser(object):
     """HTML parser. Generates a tree structure from a stream of (possibly
         malformed) HTML"""
 
     def __init__(self, tree = simpletree.TreeBuilder,
                  tokenizer = tokenizer.HTMLTokenizer, strict = False,
-                 namespaceHTMLElements = False):
+                 namespaceHTMLElements = False, collectErrors = True,
+                 firstErrorOnly = False, cache = None, collectStats = False):
         """
         strict - raise an exception when a parse error is encountered
 
+        collectErrors - record parse errors in self.errors. Without it no
+        work is spent on finding where errors are, or on checking the input
+        for invalid characters
+
+        firstErrorOnly - stop recording parse errors after the first one,
+        for when all that matters is whether the document has any
+
         tree - a treebuilder class controlling the type of tree that will be
         returned. Built in treebuilders can be accessed through
         html5lib.treebuilders.getTreeBuilder(treeType)
@@ -38,15 +92,40 @@ class HTMLParser(object):
         tokenizer - a class that provides a stream of tokens to the treebuilder.
         This may be replaced for e.g. a sanitizer which converts some tags to
         text
+
+        cache - a cache.ParseCache in which parse keeps what it returns for
+        each document, so that parsing the same input again with the same
+        configuration doesn't need to go through it. When the result comes
+        from the cache only the document, errors and compatMode are set;
+        the parser is left as reset() leaves it, with no tokenizer, an empty
+        tree and, with collectStats, empty stats
+
+        collectStats - gather statistics about each parse in self.stats: the
+        time spent in each phase and in each tokenizer state, the number of
+        tokens of each type, the number of times the active formatting
+        elements were reconstructed and the adoption agency algorithm ran,
+        and the largest number of open elements. self.stats holds only
+        dicts, strings and numbers, so it can be e.g. dumped as JSON
         """
 
         # Raise an exception on the first error encountered
         self.strict = strict
 
+        self.collectErrors = collectErrors
+        self.firstErrorOnly = firstErrorOnly
+
         self.tree = tree(namespaceHTMLElements)
         self.tokenizer_class = tokenizer
         self.errors = []
 
+        self.cache = cache
+
+        self.collectStats = collectStats
+        self.stats = None
+
+        # The stream of the document being parsed with feed(), if any
+        self.pushStream = None
+
         self.phases = {
             "initial": InitialPhase(self, self.tree),
             "beforeHtml": BeforeHtmlPhase(self, self.tree),
@@ -72,19 +151,27 @@ class HTMLParser(object):
             # XXX after after frameset
         }
 
+        if collectStats:
+            self.installStatsHooks()
+
     def _parse(self, stream, innerHTML=False, container="div",
                encoding=None, parseMeta=True, useChardet=True, **kwargs):
-        
-        self.tree.reset()
-        self.firstStartTag = False
-        self.errors = []
-        # "quirks" / "limited quirks" / "no quirks"
-        self.compatMode = "no quirks"
+
+        self.reset()
 
         self.tokenizer = self.tokenizer_class(stream, encoding=encoding,
                                               parseMeta=parseMeta,
                                               useChardet=useChardet, **kwargs)
 
+        # Whether parse errors are still being recorded
+        self.reportErrors = self.collectErrors
+        self.tokenizer.stream.reportErrors = self.collectErrors
+        # In strict mode errors the tokenizer finds still have to be raised
+        self.tokenizer.reportErrors = self.collectErrors or self.strict
+
+        if self.collectStats:
+            self.timeTokenizerStates()
+
         if innerHTML:
             self.innerHTML = container.lower()
 
@@ -101,15 +188,94 @@ class HTMLParser(object):
             self.phase = self.phases["beforeHtml"]
             self.phase.insertHtmlElement()
             self.resetInsertionMode()
-        else:
-            self.innerHTML = False
-            self.phase = self.phases["initial"]
+
+    def reset(self):
+        """Put the parser back in the state it was in when it was created,
+        so it can be reused for another document. The tree builder starts a
+        new document and the errors of the previous one are dropped"""
+        self.tree.reset()
+        self.firstStartTag = False
+        self.errors = []
+        # "quirks" / "limited quirks" / "no quirks"
+        self.compatMode = "no quirks"
+
+        self.tokenizer = None
+        self.pushStream = None
+        self.innerHTML = False
+        self.phase = self.phases["initial"]
+        for phase in self.phases.values():
+            phase.reset()
 
         # We only seem to have InBodyPhase testcases where the following is
         # relevant ... need others too
         self.lastPhase = None
         self.beforeRCDataPhase = None
 
+        if self.collectStats:
+            self.stats = {
+                "phaseTime": {},
+                "tokens": {},
+                "tokenizerStates": {},
+                "reconstructActiveFormattingElements": 0,
+                "adoptionAgency": 0,
+                "maxOpenElements": 0
+            }
+
+    def installStatsHooks(self):
+        """Count the calls that self.stats keeps track of. The dispatch
+        tables of the phases are shared with other parsers, so inBody gets
+        an end tag table of its own for counting the adoption agency runs"""
+        parser = self
+        reconstruct = self.tree.reconstructActiveFormattingElements
+        def countedReconstruct():
+            parser.stats["reconstructActiveFormattingElements"] += 1
+            reconstruct()
+        self.tree.reconstructActiveFormattingElements = countedReconstruct
+
+        inBody = self.phases["inBody"]
+        def countedAdoptionAgency(phase, token):
+            parser.stats["adoptionAgency"] += 1
+            InBodyPhase.endTagFormatting(phase, token)
+        endTagHandler = utils.MethodDispatcher()
+        for name, method in InBodyPhase.endTagHandler.items():
+            if method is InBodyPhase.endTagFormatting:
+                method = countedAdoptionAgency
+            endTagHandler[name] = method
+        endTagHandler.default = InBodyPhase.endTagHandler.default
+        inBody.endTagHandler = endTagHandler
+        inBody.endTagFormatting = lambda token: countedAdoptionAgency(inBody,
+                                                                      token)
+
+    def timeTokenizerStates(self):
+        """Make the tokenizer keep the time spent in each of its states in
+        self.stats"""
+        states = self.tokenizer.states
+        stateStats = self.stats["tokenizerStates"]
+        for name, state in list(states.items()):
+            states[name] = timedState(state, stateStats.setdefault(name,
+                {"time": 0.0, "calls": 0}))
+            if state == self.tokenizer.state:
+                self.tokenizer.state = states[name]
+
+    def measuredTokens(self, tokens):
+        """Pass tokens on, keeping the number of tokens of each type and the
+        time each phase takes to process them in self.stats"""
+        stats = self.stats
+        phaseTime = stats["phaseTime"]
+        tokenCounts = stats["tokens"]
+        typeNames = dict([(value, key) for key, value in tokenTypes.items()])
+        for token in tokens:
+            typeName = typeNames.get(token.type, token.type)
+            tokenCounts[typeName] = tokenCounts.get(typeName, 0) + 1
+            phase = self.phase.__class__.__name__
+            start = timer()
+            yield token
+            phaseTime[phase] = phaseTime.get(phase, 0.0) + timer() - start
+            depth = len(self.tree.openElements)
+            if depth > stats["maxOpenElements"]:
+                stats["maxOpenElements"] = depth
+
+    def mainLoop(self, tokens):
         CharactersToken = tokenTypes["Characters"]
         SpaceCharactersToken = tokenTypes["SpaceCharacters"]
         StartTagToken = tokenTypes["StartTag"]
@@ -118,10 +284,10 @@ class HTMLParser(object):
         DoctypeToken = tokenTypes["Doctype"]
         
         
-        for token in self.normalizedTokens():
+        for token in tokens:
             #print self.phase.__class__.__name__
             #print token
-            type = token["type"]
+            type = token.type
             if type == CharactersToken:
                 self.phase.processCharacters(token)
             elif type == SpaceCharactersToken:
@@ -129,10 +295,10 @@ class HTMLParser(object):
             elif type == StartTagToken:
                 self.selfClosingAcknowledged = False
                 self.phase.processStartTag(token)
-                if (token["selfClosing"]
+                if (token.selfClosing
                     and not self.selfClosingAcknowledged):
                     self.parseError("non-void-element-with-trailing-soldius",
-                                    {"name":token["name"]})
+                                    {"name":token.name})
             elif type == EndTagToken:
                 self.phase.processEndTag(token)
             elif type == CommentToken:
@@ -140,14 +306,13 @@ class HTMLParser(object):
             elif type == DoctypeToken:
                 self.phase.processDoctype(token)
             else:
-                self.parseError(token["data"], token.get("datavars", {}))
-
-        # When the loop finishes it's EOF
-        self.phase.processEOF()
+                self.parseError(token.data, getattr(token, "datavars", {}))
 
     def normalizedTokens(self):
-        for token in self.tokenizer:
-            yield self.normalizeToken(token)
+        tokens = (self.normalizeToken(token) for token in self.tokenizer)
+        if self.collectStats:
+            tokens = self.measuredTokens(tokens)
+        return tokens
 
     def parse(self, stream, encoding=None, parseMeta=True, useChardet=True):
         """Parse a HTML document into a well-formed tree
@@ -159,9 +324,123 @@ class HTMLParser(object):
         regardless of any BOM or later declaration (such as in a meta
         element)
         """
-        self._parse(stream, innerHTML=False, encoding=encoding)
+        if self.cache is not None:
+            return self.parseCached(stream, encoding)
+        return self.parseDocument(stream, encoding)
+
+    def parseCached(self, stream, encoding=None):
+        """Parse a HTML document, unless the cache has it already. On a
+        cache hit the per-parse state other than errors and compatMode is
+        reset rather than left over from the previous document"""
+        if hasattr(stream, "read"):
+            stream = stream.read()
+        if isinstance(stream, str):
+            data = stream.encode("utf-8")
+        else:
+            data = bytes(stream)
+        config = (type(stream).__name__, encoding,
+                  self.tree.__class__.__module__, self.tree.__class__.__name__,
+                  self.tree.defaultNamespace, self.strict, self.collectErrors,
+                  self.firstErrorOnly, self.tokenizer_class.__module__,
+                  self.tokenizer_class.__name__)
+        key = self.cache.key(data, config)
+        result = self.cache.get(key)
+        if result is None:
+            document = self.parseDocument(stream, encoding)
+            self.cache.set(key, (document, self.errors, self.compatMode))
+        else:
+            self.reset()
+            document, self.errors, self.compatMode = result
+        return document
+
+    def parseDocument(self, stream, encoding=None):
+        for restarted in self.parseSteps(stream, encoding):
+            pass
         return self.tree.getDocument()
-    
+
+    def parseSteps(self, stream, encoding=None, stepSize=None):
+        """Run the tree construction over the tokens of a document. This is
+        a generator, which pauses after every stepSize tokens, and at the
+        end, so that parseEvents can hand out what has been parsed so far.
+        Without a stepSize it only pauses at the end.
+
+        If a <meta> gives another encoding than the one guessed, the parse
+        starts over from the beginning of the document in that encoding,
+        with a new tree. The value yielded is True the first time the
+        generator pauses after that, and False otherwise
+        """
+        self._parse(stream, innerHTML=False, encoding=encoding)
+        restarted = False
+        try:
+            while True:
+                try:
+                    if stepSize is None:
+                        self.mainLoop(self.normalizedTokens())
+                    else:
+                        count = 0
+                        # Tokens have to be processed one at a time, since
+                        # the tree construction stage may change how the
+                        # tokenizer goes on
+                        for token in self.normalizedTokens():
+                            self.mainLoop((token,))
+                            count += 1
+                            if count == stepSize:
+                                count = 0
+                                yield restarted
+                                restarted = False
+                except ReparseException:
+                    # The input stream has started over in the new encoding
+                    self._parse(self.tokenizer.stream, innerHTML=False)
+                    restarted = True
+                else:
+                    break
+        finally:
+            # Also when parsing stops half way, e.g. on a ParseError in
+            # strict mode
+            self.tokenizer.stream.release()
+        # When the loop finishes it's EOF
+        self.phase.processEOF()
+        yield restarted
+
+    def parseEvents(self, stream, encoding=None, parseMeta=True,
+                    useChardet=True):
+        """Parse a HTML document into a stream of (event, node) pairs, which
+        are generated as parsing goes on instead of once the whole tree is
+        built. The parser must have been created with a tree builder that
+        provides flushEvents, i.e. treebuilders.getTreeBuilder("events")
+
+        stream and encoding are as for parse. While the encoding is only a
+        guess, a <meta> can make the parse start over in another one, so the
+        events are held back until the encoding is certain or as many
+        characters have been read as the input stream looks through for a
+        <meta> before parsing. From then on the encoding is taken as
+        certain, and a <meta> further on is not acted on as parse would
+        """
+        # Events held back while the parse may still start over, or None
+        # once they are handed out as they come
+        pending = []
+        for restarted in self.parseSteps(stream, encoding, 100):
+            if pending is None:
+                for event in self.tree.flushEvents():
+                    yield event
+                continue
+            if restarted:
+                pending = []
+            pending.extend(self.tree.flushEvents())
+            stream = self.tokenizer.stream
+            if (stream.charEncoding[1] == "tentative" and
+                stream.offset() >= stream.numBytesMeta):
+                stream.charEncoding = (stream.charEncoding[0], "certain")
+            if stream.charEncoding[1] != "tentative":
+                for event in pending:
+                    yield event
+                pending = None
+        if pending is not None:
+            for event in pending:
+                yield event
+        for event in self.tree.flushEvents(final=True):
+            yield event
+
     def parseFragment(self, stream, container="div", encoding=None,
                       parseMeta=False, useChardet=True):
         """Parse a HTML fragment into a well-formed tree fragment
@@ -177,22 +456,64 @@ class HTMLParser(object):
         element)
         """
         self._parse(stream, True, container=container, encoding=encoding)
+        try:
+            self.mainLoop(self.normalizedTokens())
+        finally:
+            self.tokenizer.stream.release()
+        self.phase.processEOF()
         return self.tree.getFragment()
 
+    def feed(self, data, encoding=None):
+        """Parse the next piece of a HTML document, as it arrives from e.g. a
+        pipe or a socket, without waiting for the rest of it
+
+        data - a string, or bytes in the given encoding. Pieces may be split
+        anywhere, also in the middle of a tag, an entity or a CR LF pair
+
+        The optional encoding parameter is only used with the first piece
+        of a document. Its encoding can't be detected, so if it is not
+        given bytes are taken to be UTF-8
+        """
+        if self.pushStream is None:
+            stream = inputstream.HTMLPushInputStream(encoding)
+            self._parse(stream, innerHTML=False)
+            self.pushStream = stream
+        self.pushStream.feed(data)
+        self.mainLoop(self.normalizedTokens())
+
+    def close(self):
+        """Finish parsing the document passed to feed() and return it"""
+        if self.pushStream is None:
+            self.feed("")
+        self.pushStream.close()
+        self.pushStream = None
+        self.mainLoop(self.normalizedTokens())
+        self.phase.processEOF()
+        return self.tree.getDocument()
+
     def parseError(self, errorcode="XXX-undefined-error", datavars={}):
         # XXX The idea is to make errorcode mandatory.
-        self.errors.append((self.tokenizer.stream.position(), errorcode, datavars))
+        if self.reportErrors:
+            self.errors.append((self.tokenizer.position(), errorcode,
+                                datavars))
+            if self.firstErrorOnly:
+                self.reportErrors = False
+                self.tokenizer.stream.reportErrors = False
+                self.tokenizer.reportErrors = self.strict
         if self.strict:
             raise ParseError
 
     def normalizeToken(self, token):
         """ HTML5 specific normalizations to the token stream """
 
-        if token["type"] == tokenTypes["StartTag"]:
-            token["data"] = dict(token["data"][::-1])
+        if type(token) is dict:
+            # Tokenizers written before tokens became objects produce dicts
+            token = Token.fromDict(token)
 
-        return token
+        if token.type == tokenTypes["StartTag"]:
+            token.data = dict(token.data[::-1])
 
+        return token
 
     def resetInsertionMode(self):
         # The name of this method is mostly historical. (It's also used in the
@@ -213,7 +534,7 @@ class HTMLParser(object):
             "body":"inBody",
             "frameset":"inFrameset"
         }
-        for node in self.tree.openElements[::-1]:
+        for node in reversed(self.tree.openElements):
             nodeName = node.name
             if node == self.tree.openElements[0]:
                 last = True
@@ -252,6 +573,18 @@ class HTMLParser(object):
 
         self.phase = self.phases["inCDataRCData"]
 
+def timedState(state, stateStats):
+    """Wrap the tokenizer state method state so that it adds the time it
+    takes and the number of calls to the dict stateStats"""
+    def timed():
+        start = timer()
+        try:
+            return state()
+        finally:
+            stateStats["time"] += timer() - start
+            stateStats["calls"] += 1
+    return timed
+
 class Phase(object):
     """Base class for helper object that implements each phase of processing
     """
@@ -265,10 +598,33 @@ class Phase(object):
     #   - startTag* methods
     # * EndTag
     #   - endTag* methods
+    #
+    # Subclasses list their tag handlers in startTagMethods/endTagMethods as
+    # (names, method name) pairs; the dispatch tables are built from those
+    # once per class rather than once per parser instance.
+    startTagMethods = ()
+    endTagMethods = ()
 
     def __init__(self, parser, tree):
         self.parser = parser
         self.tree = tree
+        if "startTagHandler" not in self.__class__.__dict__:
+            self.__class__.compileHandlers()
+
+    def reset(self):
+        """Forget any state left over from the previous document"""
+        pass
+
+    def compileHandlers(cls):
+        """Build the class level startTagHandler and endTagHandler tables,
+        mapping tag names to unbound methods"""
+        for kind in ("startTag", "endTag"):
+            handler = utils.MethodDispatcher([
+                (names, getattr(cls, methodName))
+                for names, methodName in getattr(cls, kind + "Methods")])
+            handler.default = getattr(cls, kind + "Other", None)
+            setattr(cls, kind + "Handler", handler)
+    compileHandlers = classmethod(compileHandlers)
 
     def processEOF(self):
         raise NotImplementedError
@@ -282,23 +638,23 @@ class Phase(object):
         self.parser.parseError("unexpected-doctype")
 
     def processSpaceCharacters(self, token):
-        self.tree.insertText(token["data"])
+        self.tree.insertText(token.data)
 
     def processStartTag(self, token):
-        self.startTagHandler[token["name"]](token)
+        self.startTagHandler[token.name](self, token)
 
     def startTagHtml(self, token):
-        if self.parser.firstStartTag == False and token["name"] == "html":
+        if self.parser.firstStartTag == False and token.name == "html":
            self.parser.parseError("non-html-root")
         # XXX Need a check here to see if the first start tag token emitted is
         # this token... If it's not, invoke self.parser.parseError().
-        for attr, value in token["data"].items():
+        for attr, value in token.data.items():
             if attr not in self.tree.openElements[0].attributes:
                 self.tree.openElements[0].attributes[attr] = value
         self.parser.firstStartTag = False
 
     def processEndTag(self, token):
-        self.endTagHandler[token["name"]](token)
+        self.endTagHandler[token.name](self, token)
 
 class InitialPhase(Phase):
     # This phase deals with error handling as well which is currently not
@@ -316,10 +672,10 @@ class InitialPhase(Phase):
 
     def processDoctype(self, token):
 
-        name = token["name"]
-        publicId = token["publicId"]
-        systemId = token["systemId"]
-        correct = token["correct"]
+        name = token.name
+        publicId = token.publicId
+        systemId = token.systemId
+        correct = token.correct
 
         if (name != "html" or publicId != None or
             systemId != None):
@@ -335,7 +691,7 @@ class InitialPhase(Phase):
         if publicId != "":
             publicId = publicId.translate(asciiUpper2Lower)
 
-        if ((not correct) or token["name"] != "html"
+        if ((not correct) or token.name != "html"
             or publicId in
             ("+//silmaril//dtd html pro v0r11 19970101//en",
              "-//advasoft ltd//dtd html 3.0 aswedit + extensions//en",
@@ -435,14 +791,14 @@ class InitialPhase(Phase):
 
     def processStartTag(self, token):
         self.parser.parseError("expected-doctype-but-got-start-tag",
-          {"name": token["name"]})
+          {"name": token.name})
         self.compatMode = "quirks"
         self.parser.phase = self.parser.phases["beforeHtml"]
         self.parser.phase.processStartTag(token)
 
     def processEndTag(self, token):
         self.parser.parseError("expected-doctype-but-got-end-tag",
-          {"name": token["name"]})
+          {"name": token.name})
         self.compatMode = "quirks"
         self.parser.phase = self.parser.phases["beforeHtml"]
         self.parser.phase.processEndTag(token)
@@ -470,7 +826,7 @@ class BeforeHtmlPhase(Phase):
         self.parser.phase.processCharacters(token)
 
     def processStartTag(self, token):
-        if token["name"] == "html":
+        if token.name == "html":
             self.parser.firstStartTag = True
         self.insertHtmlElement()
         self.parser.phase.processStartTag(token)
@@ -481,19 +837,14 @@ class BeforeHtmlPhase(Phase):
 
 
 class BeforeHeadPhase(Phase):
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("head", self.startTagHead)
-        ])
-        self.startTagHandler.default = self.startTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("head", "startTagHead")
+    ]
 
-        self.endTagHandler = utils.MethodDispatcher([
-            (("head", "br"), self.endTagImplyHead)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    endTagMethods = [
+        (("head", "br"), "endTagImplyHead")
+    ]
 
     def processEOF(self):
         self.startTagHead(impliedTagToken("head", "StartTag"))
@@ -521,29 +872,24 @@ class BeforeHeadPhase(Phase):
 
     def endTagOther(self, token):
         self.parser.parseError("end-tag-after-implied-root",
-          {"name": token["name"]})
+          {"name": token.name})
 
 class InHeadPhase(Phase):
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler =  utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("title", self.startTagTitle),
-            (("noscript", "noframes", "style"), self.startTagNoScriptNoFramesStyle),
-            ("script", self.startTagScript),
-            (("base", "link", "command", "eventsource"), 
-             self.startTagBaseLinkCommandEventsource),
-            ("meta", self.startTagMeta),
-            ("head", self.startTagHead)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self. endTagHandler = utils.MethodDispatcher([
-            ("head", self.endTagHead),
-            ("br", self.endTagBr)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("title", "startTagTitle"),
+        (("noscript", "noframes", "style"), "startTagNoScriptNoFramesStyle"),
+        ("script", "startTagScript"),
+        (("base", "link", "command", "eventsource"), 
+         "startTagBaseLinkCommandEventsource"),
+        ("meta", "startTagMeta"),
+        ("head", "startTagHead")
+    ]
+
+    endTagMethods = [
+        ("head", "endTagHead"),
+        ("br", "endTagBr")
+    ]
 
     # helper
     def appendToHead(self, element):
@@ -571,14 +917,14 @@ class InHeadPhase(Phase):
     def startTagBaseLinkCommandEventsource(self, token):
         self.tree.insertElement(token)
         self.tree.openElements.pop()
-        token["selfClosingAcknowledged"] = True
+        token.selfClosingAcknowledged = True
 
     def startTagMeta(self, token):
         self.tree.insertElement(token)
         self.tree.openElements.pop()
-        token["selfClosingAcknowledged"] = True
+        token.selfClosingAcknowledged = True
 
-        attributes = token["data"]
+        attributes = token.data
         if self.parser.tokenizer.stream.charEncoding[1] == "tentative":
             if "charset" in attributes:
                 codec = inputstream.codecName(attributes["charset"])
@@ -616,7 +962,7 @@ class InHeadPhase(Phase):
         self.parser.phase.processEndTag(token)
 
     def endTagOther(self, token):
-        self.parser.parseError("unexpected-end-tag", {"name": token["name"]})
+        self.parser.parseError("unexpected-end-tag", {"name": token.name})
 
     def anythingElse(self):
         self.endTagHead(impliedTagToken("head"))
@@ -628,20 +974,16 @@ class InHeadPhase(Phase):
 # class InHeadNoScriptPhase(Phase):
 
 class AfterHeadPhase(Phase):
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("body", "startTagBody"),
+        ("frameset", "startTagFrameset"),
+        (("base", "link", "meta", "noframes", "script", "style", "title"),
+          "startTagFromHead"),
+        ("head", "startTagHead")
+    ]
 
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("body", self.startTagBody),
-            ("frameset", self.startTagFrameset),
-            (("base", "link", "meta", "noframes", "script", "style", "title"),
-              self.startTagFromHead),
-            ("head", self.startTagHead)
-        ])
-        self.startTagHandler.default = self.startTagOther
-        self.endTagHandler = utils.MethodDispatcher([("br", self.endTagBr)])
-        self.endTagHandler.default = self.endTagOther
+    endTagMethods = [("br", "endTagBr")]
 
     def processEOF(self):
         self.anythingElse()
@@ -661,16 +1003,16 @@ class AfterHeadPhase(Phase):
 
     def startTagFromHead(self, token):
         self.parser.parseError("unexpected-start-tag-out-of-my-head",
-          {"name": token["name"]})
+          {"name": token.name})
         self.tree.openElements.append(self.tree.headPointer)
         self.parser.phases["inHead"].processStartTag(token)
-        for node in self.tree.openElements[::-1]:
+        for node in reversed(self.tree.openElements):
             if node.name == "head":
                 self.tree.openElements.remove(node)
                 break
 
     def startTagHead(self, token):
-        self.parser.parseError("unexpected-start-tag", {"name":token["name"]})
+        self.parser.parseError("unexpected-start-tag", {"name":token.name})
 
     def startTagOther(self, token):
         self.anythingElse()
@@ -682,7 +1024,7 @@ class AfterHeadPhase(Phase):
         self.parser.phase.processEndTag(token)
 
     def endTagOther(self, token):
-        self.parser.parseError("unexpected-end-tag", {"name":token["name"]})
+        self.parser.parseError("unexpected-end-tag", {"name":token.name})
 
     def anythingElse(self):
         self.tree.insertElement(impliedTagToken("body", "StartTag"))
@@ -692,69 +1034,70 @@ class AfterHeadPhase(Phase):
 class InBodyPhase(Phase):
     # http://www.whatwg.org/specs/web-apps/current-work/#in-body
     # the crazy mode
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        (("base", "link", "meta", "script", "style", "title"),
+          "startTagProcessInHead"),
+        ("body", "startTagBody"),
+        (("address", "article", "aside", "blockquote", "center", "datagrid",
+          "details", "dialog", "dir", "div", "dl", "fieldset", "figure",
+          "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "listing",
+          "menu", "nav", "ol", "p", "pre", "section", "ul"),
+          "startTagCloseP"),
+        ("form", "startTagForm"),
+        (("li", "dd", "dt"), "startTagListItem"),
+        ("plaintext","startTagPlaintext"),
+        (headingElements, "startTagHeading"),
+        ("a", "startTagA"),
+        (("b", "big", "em", "font", "i", "s", "small", "strike", "strong",
+          "tt", "u"),"startTagFormatting"),
+        ("nobr", "startTagNobr"),
+        ("button", "startTagButton"),
+        (("applet", "marquee", "object"), "startTagAppletMarqueeObject"),
+        ("xmp", "startTagXmp"),
+        ("table", "startTagTable"),
+        (("area", "basefont", "bgsound", "br", "embed", "img", "param",
+          "spacer", "wbr"), "startTagVoidFormatting"),
+        ("hr", "startTagHr"),
+        ("image", "startTagImage"),
+        ("input", "startTagInput"),
+        ("isindex", "startTagIsIndex"),
+        ("textarea", "startTagTextarea"),
+        (("iframe", "noembed", "noframes", "noscript"), "startTagCdata"),
+        ("select", "startTagSelect"),
+        (("rp", "rt"), "startTagRpRt"),
+        (("option", "optgroup"), "startTagOpt"),
+        (("caption", "col", "colgroup", "frame", "frameset", "head",
+          "tbody", "td", "tfoot", "th", "thead",
+          "tr"), "startTagMisplaced"),
+        (("event-source", "command"), "startTagNew")
+    ]
+
+    endTagMethods = [
+        ("body","endTagBody"),
+        ("html","endTagHtml"),
+        (("address", "article", "aside", "blockquote", "center", "datagrid",
+          "details", "dialog", "dir", "div", "dl", "fieldset", "figure",
+          "footer", "header", "listing", "menu", "nav", "ol", "pre", "section",
+          "ul"), "endTagBlock"),
+        ("form", "endTagForm"),
+        ("p","endTagP"),
+        (("dd", "dt", "li"), "endTagListItem"),
+        (headingElements, "endTagHeading"),
+        (("a", "b", "big", "em", "font", "i", "nobr", "s", "small",
+          "strike", "strong", "tt", "u"), "endTagFormatting"),
+        (("applet", "button", "marquee", "object"), "endTagAppletButtonMarqueeObject"),
+        ("br", "endTagBr"),
+    ]
+
     def __init__(self, parser, tree):
         Phase.__init__(self, parser, tree)
 
         #Keep a ref to this for special handling of whitespace in <pre>
         self.processSpaceCharactersNonPre = self.processSpaceCharacters
 
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            (("base", "link", "meta", "script", "style", "title"),
-              self.startTagProcessInHead),
-            ("body", self.startTagBody),
-            (("address", "article", "aside", "blockquote", "center", "datagrid",
-              "details", "dialog", "dir", "div", "dl", "fieldset", "figure",
-              "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "listing",
-              "menu", "nav", "ol", "p", "pre", "section", "ul"),
-              self.startTagCloseP),
-            ("form", self.startTagForm),
-            (("li", "dd", "dt"), self.startTagListItem),
-            ("plaintext",self.startTagPlaintext),
-            (headingElements, self.startTagHeading),
-            ("a", self.startTagA),
-            (("b", "big", "em", "font", "i", "s", "small", "strike", "strong",
-              "tt", "u"),self.startTagFormatting),
-            ("nobr", self.startTagNobr),
-            ("button", self.startTagButton),
-            (("applet", "marquee", "object"), self.startTagAppletMarqueeObject),
-            ("xmp", self.startTagXmp),
-            ("table", self.startTagTable),
-            (("area", "basefont", "bgsound", "br", "embed", "img", "param",
-              "spacer", "wbr"), self.startTagVoidFormatting),
-            ("hr", self.startTagHr),
-            ("image", self.startTagImage),
-            ("input", self.startTagInput),
-            ("isindex", self.startTagIsIndex),
-            ("textarea", self.startTagTextarea),
-            (("iframe", "noembed", "noframes", "noscript"), self.startTagCdata),
-            ("select", self.startTagSelect),
-            (("rp", "rt"), self.startTagRpRt),
-            (("option", "optgroup"), self.startTagOpt),
-            (("caption", "col", "colgroup", "frame", "frameset", "head",
-              "tbody", "td", "tfoot", "th", "thead",
-              "tr"), self.startTagMisplaced),
-            (("event-source", "command"), self.startTagNew)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self.endTagHandler = utils.MethodDispatcher([
-            ("body",self.endTagBody),
-            ("html",self.endTagHtml),
-            (("address", "article", "aside", "blockquote", "center", "datagrid",
-              "details", "dialog", "dir", "div", "dl", "fieldset", "figure",
-              "footer", "header", "listing", "menu", "nav", "ol", "pre", "section",
-              "ul"), self.endTagBlock),
-            ("form", self.endTagForm),
-            ("p",self.endTagP),
-            (("dd", "dt", "li"), self.endTagListItem),
-            (headingElements, self.endTagHeading),
-            (("a", "b", "big", "em", "font", "i", "nobr", "s", "small",
-              "strike", "strong", "tt", "u"), self.endTagFormatting),
-            (("applet", "button", "marquee", "object"), self.endTagAppletButtonMarqueeObject),
-            ("br", self.endTagBr),
-            ])
-        self.endTagHandler.default = self.endTagOther
+    def reset(self):
+        self.processSpaceCharacters = self.processSpaceCharactersNonPre
 
     # helper
     def addFormattingElement(self, token):
@@ -767,7 +1110,7 @@ class InBodyPhase(Phase):
         allowed_elements = frozenset(("dd", "dt", "li", "p", "tbody", "td",
                                       "tfoot", "th", "thead", "tr", "body",
                                       "html"))
-        for node in self.tree.openElements[::-1]:
+        for node in reversed(self.tree.openElements):
             if node.name not in allowed_elements:
                 self.parser.parseError("expected-closing-tag-but-got-eof")
                 break
@@ -776,7 +1119,7 @@ class InBodyPhase(Phase):
     def processSpaceCharactersDropNewline(self, token):
         # Sometimes (start of <pre>, <listing>, and <textarea> blocks) we
         # want to drop leading newlines
-        data = token["data"]
+        data = token.data
         self.processSpaceCharacters = self.processSpaceCharactersNonPre
         if (data.startswith("\n") and
             self.tree.openElements[-1].name in ("pre", "listing", "textarea")
@@ -791,12 +1134,12 @@ class InBodyPhase(Phase):
         # moment, but apparently that doesn't match the real world so we don't
         # do it for space characters.
         self.tree.reconstructActiveFormattingElements()
-        self.tree.insertText(token["data"])
+        self.tree.insertText(token.data)
 
     #This matches the current spec but may not match the real world
     def processSpaceCharacters(self, token):
         self.tree.reconstructActiveFormattingElements()
-        self.tree.insertText(token["data"])
+        self.tree.insertText(token.data)
 
     def startTagProcessInHead(self, token):
         self.parser.phases["inHead"].processStartTag(token)
@@ -807,7 +1150,7 @@ class InBodyPhase(Phase):
             or self.tree.openElements[1].name != "body"):
             assert self.parser.innerHTML
         else:
-            for attr, value in token["data"].items():
+            for attr, value in token.data.items():
                 if attr not in self.tree.openElements[1].attributes:
                     self.tree.openElements[1].attributes[attr] = value
 
@@ -815,7 +1158,7 @@ class InBodyPhase(Phase):
         if self.tree.elementInScope("p"):
             self.endTagP(impliedTagToken("p"))
         self.tree.insertElement(token)
-        if token["name"] in ("pre", "listing"):
+        if token.name in ("pre", "listing"):
             self.processSpaceCharacters = self.processSpaceCharactersDropNewline
 
     def startTagForm(self, token):
@@ -831,9 +1174,8 @@ class InBodyPhase(Phase):
         if self.tree.elementInScope("p"):
             self.endTagP(impliedTagToken("p"))
         stopNames = {"li":("li"), "dd":("dd", "dt"), "dt":("dd", "dt")}
-        stopName = stopNames[token["name"]]
-        # AT Use reversed in Python 2.4...
-        for i, node in enumerate(self.tree.openElements[::-1]):
+        stopName = stopNames[token.name]
+        for i, node in enumerate(reversed(self.tree.openElements)):
             if node.name in stopName:
                 poppedNodes = []
                 for j in range(i+1):
@@ -868,7 +1210,7 @@ class InBodyPhase(Phase):
         #
         #for item in headingElements:
         #    if self.tree.elementInScope(item):
-        #        self.parser.parseError("unexpected-start-tag", {"name": token["name"]})
+        #        self.parser.parseError("unexpected-start-tag", {"name": token.name})
         #        item = self.tree.openElements.pop()
         #        while item.name not in headingElements:
         #            item = self.tree.openElements.pop()
@@ -944,8 +1286,8 @@ class InBodyPhase(Phase):
         self.parser.parseError("unexpected-start-tag-treated-as",
           {"originalName": "image", "newName": "img"})
         self.processStartTag(impliedTagToken("img", "StartTag",
-                                             attributes=token["data"],
-                                             selfClosing=token["selfClosing"]))
+                                             attributes=token.data,
+                                             selfClosing=token.selfClosing))
 
     def startTagInput(self, token):
         self.tree.reconstructActiveFormattingElements()
@@ -965,14 +1307,14 @@ class InBodyPhase(Phase):
         self.processStartTag(impliedTagToken("label", "StartTag"))
         # XXX Localization ...
         self.processCharacters(
-            {"type":tokenTypes["Characters"], 
-             "data":"This is a searchable index. Insert your search keywords here: "})
-        attributes = token["data"].copy() #don't really need a copy here I think
+            Token(tokenTypes["Characters"],
+                  "This is a searchable index. Insert your search keywords here: "))
+        attributes = token.data.copy() #don't really need a copy here I think
         attributes["name"] = "isindex"
         self.processStartTag(impliedTagToken("input", "StartTag", 
                                              attributes = attributes,
                                              selfClosing = 
-                                             token["selfClosing"]))
+                                             token.selfClosing))
         self.processEndTag(impliedTagToken("label"))
         self.processEndTag(impliedTagToken("p"))
         self.processStartTag(impliedTagToken("hr", "StartTag"))
@@ -1023,7 +1365,7 @@ class InBodyPhase(Phase):
         "option", "optgroup", "tbody", "td", "tfoot", "th", "thead",
         "tr", "noscript"
         """
-        self.parser.parseError("unexpected-start-tag-ignored", {"name": token["name"]})
+        self.parser.parseError("unexpected-start-tag-ignored", {"name": token.name})
 
     def startTagNew(self, token):
         """New HTML5 elements, "event-source", "section", "nav",
@@ -1079,43 +1421,43 @@ class InBodyPhase(Phase):
 
     def endTagBlock(self, token):
         #Put us back in the right whitespace handling mode
-        if token["name"] == "pre":
+        if token.name == "pre":
             self.processSpaceCharacters = self.processSpaceCharactersNonPre
-        inScope = self.tree.elementInScope(token["name"])
+        inScope = self.tree.elementInScope(token.name)
         if inScope:
             self.tree.generateImpliedEndTags()
-        if self.tree.openElements[-1].name != token["name"]:
-             self.parser.parseError("end-tag-too-early", {"name": token["name"]})
+        if self.tree.openElements[-1].name != token.name:
+             self.parser.parseError("end-tag-too-early", {"name": token.name})
         if inScope:
             node = self.tree.openElements.pop()
-            while node.name != token["name"]:
+            while node.name != token.name:
                 node = self.tree.openElements.pop()
 
     def endTagForm(self, token):
         self.tree.formPointer = None
-        if not self.tree.elementInScope(token["name"]):
+        if not self.tree.elementInScope(token.name):
             self.parser.parseError("unexpected-end-tag",
                                    {"name":"form"})
         else:
             self.tree.generateImpliedEndTags()
-            if self.tree.openElements[-1].name != token["name"]:
+            if self.tree.openElements[-1].name != token.name:
                 self.parser.parseError("end-tag-too-early-ignored",
                                        {"name": "form"})
             node = self.tree.openElements.pop()
-            while node.name != token["name"]:
+            while node.name != token.name:
                 node = self.tree.openElements.pop()
 
     def endTagListItem(self, token):
         # AT Could merge this with the Block case
-        if self.tree.elementInScope(token["name"]):
-            self.tree.generateImpliedEndTags(token["name"])
+        if self.tree.elementInScope(token.name):
+            self.tree.generateImpliedEndTags(token.name)
         
-        if self.tree.openElements[-1].name != token["name"]:
-            self.parser.parseError("end-tag-too-early", {"name": token["name"]})
+        if self.tree.openElements[-1].name != token.name:
+            self.parser.parseError("end-tag-too-early", {"name": token.name})
 
-        if self.tree.elementInScope(token["name"]):
+        if self.tree.elementInScope(token.name):
             node = self.tree.openElements.pop()
-            while node.name != token["name"]:
+            while node.name != token.name:
                 node = self.tree.openElements.pop()
 
     def endTagHeading(self, token):
@@ -1123,8 +1465,8 @@ class InBodyPhase(Phase):
             if self.tree.elementInScope(item):
                 self.tree.generateImpliedEndTags()
                 break
-        if self.tree.openElements[-1].name != token["name"]:
-            self.parser.parseError("end-tag-too-early", {"name": token["name"]})
+        if self.tree.openElements[-1].name != token.name:
+            self.parser.parseError("end-tag-too-early", {"name": token.name})
 
         for item in headingElements:
             if self.tree.elementInScope(item):
@@ -1137,25 +1479,25 @@ class InBodyPhase(Phase):
         """The much-feared adoption agency algorithm"""
         # http://www.whatwg.org/specs/web-apps/current-work/#adoptionAgency
         # XXX Better parseError messages appreciated.
-        name = token["name"]
+        name = token.name
         while True:
             # Step 1 paragraph 1
             afeElement = self.tree.elementInActiveFormattingElements(
-                token["name"])
+                token.name)
             if not afeElement or (afeElement in self.tree.openElements and
               not self.tree.elementInScope(afeElement.name)):
-                self.parser.parseError("adoption-agency-1.1", {"name": token["name"]})
+                self.parser.parseError("adoption-agency-1.1", {"name": token.name})
                 return
 
             # Step 1 paragraph 2
             elif afeElement not in self.tree.openElements:
-                self.parser.parseError("adoption-agency-1.2", {"name": token["name"]})
+                self.parser.parseError("adoption-agency-1.2", {"name": token.name})
                 self.tree.activeFormattingElements.remove(afeElement)
                 return
 
             # Step 1 paragraph 3
             if afeElement != self.tree.openElements[-1]:
-                self.parser.parseError("adoption-agency-1.3", {"name": token["name"]})
+                self.parser.parseError("adoption-agency-1.3", {"name": token.name})
 
             # Step 2
             # Start of the adoption agency algorithm proper
@@ -1248,14 +1590,14 @@ class InBodyPhase(Phase):
               self.tree.openElements.index(furthestBlock) + 1, clone)
 
     def endTagAppletButtonMarqueeObject(self, token):
-        if self.tree.elementInScope(token["name"]):
+        if self.tree.elementInScope(token.name):
             self.tree.generateImpliedEndTags()
-        if self.tree.openElements[-1].name != token["name"]:
-            self.parser.parseError("end-tag-too-early", {"name": token["name"]})
+        if self.tree.openElements[-1].name != token.name:
+            self.parser.parseError("end-tag-too-early", {"name": token.name})
 
-        if self.tree.elementInScope(token["name"]):
+        if self.tree.elementInScope(token.name):
             element = self.tree.openElements.pop()
-            while element.name != token["name"]:
+            while element.name != token.name:
                 element = self.tree.openElements.pop()
             self.tree.clearActiveFormattingElements()
 
@@ -1267,30 +1609,28 @@ class InBodyPhase(Phase):
         self.tree.openElements.pop()
 
     def endTagOther(self, token):
-        for node in self.tree.openElements[::-1]:
-            if node.name == token["name"]:
+        for node in reversed(self.tree.openElements):
+            if node.name == token.name:
                 self.tree.generateImpliedEndTags()
-                if self.tree.openElements[-1].name != token["name"]:
-                    self.parser.parseError("unexpected-end-tag", {"name": token["name"]})
+                if self.tree.openElements[-1].name != token.name:
+                    self.parser.parseError("unexpected-end-tag", {"name": token.name})
                 while self.tree.openElements.pop() != node:
                     pass
                 break
             else:
                 if node.name in specialElements | scopingElements:
-                    self.parser.parseError("unexpected-end-tag", {"name": token["name"]})
+                    self.parser.parseError("unexpected-end-tag", {"name": token.name})
                     break
 
 class InCDataRCDataPhase(Phase):
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-        self.startTagHandler = utils.MethodDispatcher([])
-        self.startTagHandler.default = self.startTagOther
-        self.endTagHandler = utils.MethodDispatcher([
-                ("script", self.endTagScript)])
-        self.endTagHandler.default = self.endTagOther
+    startTagMethods = []
+
+    endTagMethods = [
+        ("script", "endTagScript")
+    ]
 
     def processCharacters(self, token):
-        self.tree.insertText(token["data"])
+        self.tree.insertText(token.data)
     
     def processEOF(self):
         self.parser.parseError("expected-named-closing-tag-but-got-eof", 
@@ -1315,27 +1655,23 @@ class InCDataRCDataPhase(Phase):
 
 class InTablePhase(Phase):
     # http://www.whatwg.org/specs/web-apps/current-work/#in-table
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("caption", self.startTagCaption),
-            ("colgroup", self.startTagColgroup),
-            ("col", self.startTagCol),
-            (("tbody", "tfoot", "thead"), self.startTagRowGroup),
-            (("td", "th", "tr"), self.startTagImplyTbody),
-            ("table", self.startTagTable),
-            (("style", "script"), self.startTagStyleScript),
-            ("input", self.startTagInput)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self.endTagHandler = utils.MethodDispatcher([
-            ("table", self.endTagTable),
-            (("body", "caption", "col", "colgroup", "html", "tbody", "td",
-              "tfoot", "th", "thead", "tr"), self.endTagIgnore)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("caption", "startTagCaption"),
+        ("colgroup", "startTagColgroup"),
+        ("col", "startTagCol"),
+        (("tbody", "tfoot", "thead"), "startTagRowGroup"),
+        (("td", "th", "tr"), "startTagImplyTbody"),
+        ("table", "startTagTable"),
+        (("style", "script"), "startTagStyleScript"),
+        ("input", "startTagInput")
+    ]
+
+    endTagMethods = [
+        ("table", "endTagTable"),
+        (("body", "caption", "col", "colgroup", "html", "tbody", "td",
+          "tfoot", "th", "thead", "tr"), "endTagIgnore")
+    ]
 
     # helper methods
     def clearStackToTableContext(self):
@@ -1362,7 +1698,7 @@ class InTablePhase(Phase):
 
     def processSpaceCharacters(self, token):
         if "tainted" not in self.getCurrentTable()._flags:
-            self.tree.insertText(token["data"])
+            self.tree.insertText(token.data)
         else:
             self.processCharacters(token)
 
@@ -1416,7 +1752,7 @@ class InTablePhase(Phase):
             self.startTagOther(token)
 
     def startTagInput(self, token):
-        if "type" in token["data"] and token["data"]["type"].translate(asciiUpper2Lower) == "hidden" and "tainted" not in self.getCurrentTable()._flags:
+        if "type" in token.data and token.data["type"].translate(asciiUpper2Lower) == "hidden" and "tainted" not in self.getCurrentTable()._flags:
             self.parser.parseError("unexpected-hidden-input-in-table")
             self.tree.insertElement(token)
             # XXX associate with form
@@ -1425,7 +1761,7 @@ class InTablePhase(Phase):
             self.startTagOther(token)
 
     def startTagOther(self, token):
-        self.parser.parseError("unexpected-start-tag-implies-table-voodoo", {"name": token["name"]})
+        self.parser.parseError("unexpected-start-tag-implies-table-voodoo", {"name": token.name})
         if "tainted" not in self.getCurrentTable()._flags:
             self.getCurrentTable()._flags.append("tainted")
         # Do the table magic!
@@ -1450,10 +1786,10 @@ class InTablePhase(Phase):
             self.parser.parseError()
 
     def endTagIgnore(self, token):
-        self.parser.parseError("unexpected-end-tag", {"name": token["name"]})
+        self.parser.parseError("unexpected-end-tag", {"name": token.name})
 
     def endTagOther(self, token):
-        self.parser.parseError("unexpected-end-tag-implies-table-voodoo", {"name": token["name"]})
+        self.parser.parseError("unexpected-end-tag-implies-table-voodoo", {"name": token.name})
         if "tainted" not in self.getCurrentTable()._flags:
             self.getCurrentTable()._flags.append("tainted")
         # Do the table magic!
@@ -1464,23 +1800,18 @@ class InTablePhase(Phase):
 
 class InCaptionPhase(Phase):
     # http://www.whatwg.org/specs/web-apps/current-work/#in-caption
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            (("caption", "col", "colgroup", "tbody", "td", "tfoot", "th",
-              "thead", "tr"), self.startTagTableElement)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self.endTagHandler = utils.MethodDispatcher([
-            ("caption", self.endTagCaption),
-            ("table", self.endTagTable),
-            (("body", "col", "colgroup", "html", "tbody", "td", "tfoot", "th",
-              "thead", "tr"), self.endTagIgnore)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        (("caption", "col", "colgroup", "tbody", "td", "tfoot", "th",
+          "thead", "tr"), "startTagTableElement")
+    ]
+
+    endTagMethods = [
+        ("caption", "endTagCaption"),
+        ("table", "endTagTable"),
+        (("body", "col", "colgroup", "html", "tbody", "td", "tfoot", "th",
+          "thead", "tr"), "endTagIgnore")
+    ]
 
     def ignoreEndTagCaption(self):
         return not self.tree.elementInScope("caption", True)
@@ -1528,7 +1859,7 @@ class InCaptionPhase(Phase):
             self.parser.phase.processEndTag(token)
 
     def endTagIgnore(self, token):
-        self.parser.parseError("unexpected-end-tag", {"name": token["name"]})
+        self.parser.parseError("unexpected-end-tag", {"name": token.name})
 
     def endTagOther(self, token):
         self.parser.phases["inBody"].processEndTag(token)
@@ -1536,21 +1867,15 @@ class InCaptionPhase(Phase):
 
 class InColumnGroupPhase(Phase):
     # http://www.whatwg.org/specs/web-apps/current-work/#in-column
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("col", "startTagCol")
+    ]
 
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("col", self.startTagCol)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self.endTagHandler = utils.MethodDispatcher([
-            ("colgroup", self.endTagColgroup),
-            ("col", self.endTagCol)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    endTagMethods = [
+        ("colgroup", "endTagColgroup"),
+        ("col", "endTagCol")
+    ]
 
     def ignoreEndTagColgroup(self):
         return self.tree.openElements[-1].name == "html"
@@ -1602,24 +1927,20 @@ class InColumnGroupPhase(Phase):
 
 class InTableBodyPhase(Phase):
     # http://www.whatwg.org/specs/web-apps/current-work/#in-table0
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("tr", self.startTagTr),
-            (("td", "th"), self.startTagTableCell),
-            (("caption", "col", "colgroup", "tbody", "tfoot", "thead"),
-             self.startTagTableOther)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self.endTagHandler = utils.MethodDispatcher([
-            (("tbody", "tfoot", "thead"), self.endTagTableRowGroup),
-            ("table", self.endTagTable),
-            (("body", "caption", "col", "colgroup", "html", "td", "th",
-              "tr"), self.endTagIgnore)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("tr", "startTagTr"),
+        (("td", "th"), "startTagTableCell"),
+        (("caption", "col", "colgroup", "tbody", "tfoot", "thead"),
+         "startTagTableOther")
+    ]
+
+    endTagMethods = [
+        (("tbody", "tfoot", "thead"), "endTagTableRowGroup"),
+        ("table", "endTagTable"),
+        (("body", "caption", "col", "colgroup", "html", "td", "th",
+          "tr"), "endTagIgnore")
+    ]
 
     # helper methods
     def clearStackToTableBodyContext(self):
@@ -1648,7 +1969,7 @@ class InTableBodyPhase(Phase):
 
     def startTagTableCell(self, token):
         self.parser.parseError("unexpected-cell-in-table-body", 
-                               {"name": token["name"]})
+                               {"name": token.name})
         self.startTagTr(impliedTagToken("tr", "StartTag"))
         self.parser.phase.processStartTag(token)
 
@@ -1669,13 +1990,13 @@ class InTableBodyPhase(Phase):
         self.parser.phases["inTable"].processStartTag(token)
 
     def endTagTableRowGroup(self, token):
-        if self.tree.elementInScope(token["name"], True):
+        if self.tree.elementInScope(token.name, True):
             self.clearStackToTableBodyContext()
             self.tree.openElements.pop()
             self.parser.phase = self.parser.phases["inTable"]
         else:
             self.parser.parseError("unexpected-end-tag-in-table-body",
-              {"name": token["name"]})
+              {"name": token.name})
 
     def endTagTable(self, token):
         if (self.tree.elementInScope("tbody", True) or
@@ -1691,7 +2012,7 @@ class InTableBodyPhase(Phase):
 
     def endTagIgnore(self, token):
         self.parser.parseError("unexpected-end-tag-in-table-body",
-          {"name": token["name"]})
+          {"name": token.name})
 
     def endTagOther(self, token):
         self.parser.phases["inTable"].processEndTag(token)
@@ -1699,24 +2020,20 @@ class InTableBodyPhase(Phase):
 
 class InRowPhase(Phase):
     # http://www.whatwg.org/specs/web-apps/current-work/#in-row
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            (("td", "th"), self.startTagTableCell),
-            (("caption", "col", "colgroup", "tbody", "tfoot", "thead",
-              "tr"), self.startTagTableOther)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self.endTagHandler = utils.MethodDispatcher([
-            ("tr", self.endTagTr),
-            ("table", self.endTagTable),
-            (("tbody", "tfoot", "thead"), self.endTagTableRowGroup),
-            (("body", "caption", "col", "colgroup", "html", "td", "th"),
-              self.endTagIgnore)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        (("td", "th"), "startTagTableCell"),
+        (("caption", "col", "colgroup", "tbody", "tfoot", "thead",
+          "tr"), "startTagTableOther")
+    ]
+
+    endTagMethods = [
+        ("tr", "endTagTr"),
+        ("table", "endTagTable"),
+        (("tbody", "tfoot", "thead"), "endTagTableRowGroup"),
+        (("body", "caption", "col", "colgroup", "html", "td", "th"),
+          "endTagIgnore")
+    ]
 
     # helper methods (XXX unify this with other table helper methods)
     def clearStackToTableRowContext(self):
@@ -1773,7 +2090,7 @@ class InRowPhase(Phase):
             self.parser.phase.processEndTag(token)
 
     def endTagTableRowGroup(self, token):
-        if self.tree.elementInScope(token["name"], True):
+        if self.tree.elementInScope(token.name, True):
             self.endTagTr("tr")
             self.parser.phase.processEndTag(token)
         else:
@@ -1782,28 +2099,24 @@ class InRowPhase(Phase):
 
     def endTagIgnore(self, token):
         self.parser.parseError("unexpected-end-tag-in-table-row",
-            {"name": token["name"]})
+            {"name": token.name})
 
     def endTagOther(self, token):
         self.parser.phases["inTable"].processEndTag(token)
 
 class InCellPhase(Phase):
     # http://www.whatwg.org/specs/web-apps/current-work/#in-cell
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            (("caption", "col", "colgroup", "tbody", "td", "tfoot", "th",
-              "thead", "tr"), self.startTagTableOther)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self.endTagHandler = utils.MethodDispatcher([
-            (("td", "th"), self.endTagTableCell),
-            (("body", "caption", "col", "colgroup", "html"), self.endTagIgnore),
-            (("table", "tbody", "tfoot", "thead", "tr"), self.endTagImply)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        (("caption", "col", "colgroup", "tbody", "td", "tfoot", "th",
+          "thead", "tr"), "startTagTableOther")
+    ]
+
+    endTagMethods = [
+        (("td", "th"), "endTagTableCell"),
+        (("body", "caption", "col", "colgroup", "html"), "endTagIgnore"),
+        (("table", "tbody", "tfoot", "thead", "tr"), "endTagImply")
+    ]
 
     # helper
     def closeCell(self):
@@ -1830,33 +2143,29 @@ class InCellPhase(Phase):
 
     def startTagOther(self, token):
         self.parser.phases["inBody"].processStartTag(token)
-        # Optimize this for subsequent invocations. Can't do this initially
-        # because self.phases doesn't really exist at that point.
-        self.startTagHandler.default =\
-          self.parser.phases["inBody"].processStartTag
 
     def endTagTableCell(self, token):
-        if self.tree.elementInScope(token["name"], True):
-            self.tree.generateImpliedEndTags(token["name"])
-            if self.tree.openElements[-1].name != token["name"]:
+        if self.tree.elementInScope(token.name, True):
+            self.tree.generateImpliedEndTags(token.name)
+            if self.tree.openElements[-1].name != token.name:
                 self.parser.parseError("unexpected-cell-end-tag",
-                  {"name": token["name"]})
+                  {"name": token.name})
                 while True:
                     node = self.tree.openElements.pop()
-                    if node.name == token["name"]:
+                    if node.name == token.name:
                         break
             else:
                 self.tree.openElements.pop()
             self.tree.clearActiveFormattingElements()
             self.parser.phase = self.parser.phases["inRow"]
         else:
-            self.parser.parseError("unexpected-end-tag", {"name": token["name"]})
+            self.parser.parseError("unexpected-end-tag", {"name": token.name})
 
     def endTagIgnore(self, token):
-        self.parser.parseError("unexpected-end-tag", {"name": token["name"]})
+        self.parser.parseError("unexpected-end-tag", {"name": token.name})
 
     def endTagImply(self, token):
-        if self.tree.elementInScope(token["name"], True):
+        if self.tree.elementInScope(token.name, True):
             self.closeCell()
             self.parser.phase.processEndTag(token)
         else:
@@ -1865,34 +2174,26 @@ class InCellPhase(Phase):
 
     def endTagOther(self, token):
         self.parser.phases["inBody"].processEndTag(token)
-        # Optimize this for subsequent invocations. Can't do this initially
-        # because self.phases doesn't really exist at that point.
-        self.endTagHandler.default = self.parser.phases["inBody"].processEndTag
 
 
 class InSelectPhase(Phase):
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("option", self.startTagOption),
-            ("optgroup", self.startTagOptgroup),
-            ("select", self.startTagSelect),
-            ("input", self.startTagInput)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self.endTagHandler = utils.MethodDispatcher([
-            ("option", self.endTagOption),
-            ("optgroup", self.endTagOptgroup),
-            ("select", self.endTagSelect),
-            (("caption", "table", "tbody", "tfoot", "thead", "tr", "td",
-              "th"), self.endTagTableElements)
-        ])
-        self.endTagHandler.default = self.endTagOther
-
     # http://www.whatwg.org/specs/web-apps/current-work/#in-select
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("option", "startTagOption"),
+        ("optgroup", "startTagOptgroup"),
+        ("select", "startTagSelect"),
+        ("input", "startTagInput")
+    ]
+
+    endTagMethods = [
+        ("option", "endTagOption"),
+        ("optgroup", "endTagOptgroup"),
+        ("select", "endTagSelect"),
+        (("caption", "table", "tbody", "tfoot", "thead", "tr", "td",
+          "th"), "endTagTableElements")
+    ]
+
     def processEOF(self):
         if self.tree.openElements[-1].name != "html":
             self.parser.parseError("eof-in-select")
@@ -1900,7 +2201,7 @@ class InSelectPhase(Phase):
             assert self.parser.innerHtml
 
     def processCharacters(self, token):
-        self.tree.insertText(token["data"])
+        self.tree.insertText(token.data)
 
     def startTagOption(self, token):
         # We need to imply </option> if <option> is the current node.
@@ -1926,7 +2227,7 @@ class InSelectPhase(Phase):
 
     def startTagOther(self, token):
         self.parser.parseError("unexpected-start-tag-in-select",
-          {"name": token["name"]})
+          {"name": token.name})
 
     def endTagOption(self, token):
         if self.tree.openElements[-1].name == "option":
@@ -1960,29 +2261,24 @@ class InSelectPhase(Phase):
 
     def endTagTableElements(self, token):
         self.parser.parseError("unexpected-end-tag-in-select",
-          {"name": token["name"]})
-        if self.tree.elementInScope(token["name"], True):
+          {"name": token.name})
+        if self.tree.elementInScope(token.name, True):
             self.endTagSelect("select")
             self.parser.phase.processEndTag(token)
 
     def endTagOther(self, token):
         self.parser.parseError("unexpected-end-tag-in-select",
-          {"name": token["name"]})
+          {"name": token.name})
 
 
 class InSelectInTablePhase(Phase):
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-            (("caption", "table", "tbody", "tfoot", "thead", "tr", "td", "th"), self.startTagTable)
-        ])
-        self.startTagHandler.default = self.startTagOther
+    startTagMethods = [
+        (("caption", "table", "tbody", "tfoot", "thead", "tr", "td", "th"), "startTagTable")
+    ]
 
-        self.endTagHandler = utils.MethodDispatcher([
-            (("caption", "table", "tbody", "tfoot", "thead", "tr", "td", "th"), self.endTagTable)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    endTagMethods = [
+        (("caption", "table", "tbody", "tfoot", "thead", "tr", "td", "th"), "endTagTable")
+    ]
 
     def processEOF(self):
         self.parser.phases["inSelect"].processEOF()
@@ -1991,7 +2287,7 @@ class InSelectInTablePhase(Phase):
         self.parser.phases["inSelect"].processCharacters(token)
     
     def startTagTable(self, token):
-        self.parser.parseError("unexpected-table-element-start-tag-in-select-in-table", {"name": token["name"]})
+        self.parser.parseError("unexpected-table-element-start-tag-in-select-in-table", {"name": token.name})
         self.endTagOther(impliedTagToken("select"))
         self.parser.phase.processStartTag(token)
 
@@ -1999,8 +2295,8 @@ class InSelectInTablePhase(Phase):
         self.parser.phases["inSelect"].processStartTag(token)
 
     def endTagTable(self, token):
-        self.parser.parseError("unexpected-table-element-end-tag-in-select-in-table", {"name": token["name"]})
-        if self.tree.elementInScope(token["name"]):
+        self.parser.parseError("unexpected-table-element-end-tag-in-select-in-table", {"name": token.name})
+        if self.tree.elementInScope(token.name):
             self.endTagOther(impliedTgToken("select"))
             self.parser.phase.processEndTag(token)
 
@@ -2024,16 +2320,11 @@ class InForeignContentPhase(Phase):
             self.endTagHandler.default = self.endTagOther
 
 class AfterBodyPhase(Phase):
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-                ("html", self.startTagHtml)
-                ])
-        self.startTagHandler.default = self.startTagOther
+    startTagMethods = [
+        ("html", "startTagHtml")
+    ]
 
-        self.endTagHandler = utils.MethodDispatcher([("html", self.endTagHtml)])
-        self.endTagHandler.default = self.endTagOther
+    endTagMethods = [("html", "endTagHtml")]
 
     def processEOF(self):
         #Stop parsing
@@ -2054,7 +2345,7 @@ class AfterBodyPhase(Phase):
 
     def startTagOther(self, token):
         self.parser.parseError("unexpected-start-tag-after-body",
-          {"name": token["name"]})
+          {"name": token.name})
         self.parser.phase = self.parser.phases["inBody"]
         self.parser.phase.processStartTag(token)
 
@@ -2066,28 +2357,23 @@ class AfterBodyPhase(Phase):
 
     def endTagOther(self, token):
         self.parser.parseError("unexpected-end-tag-after-body",
-          {"name": token["name"]})
+          {"name": token.name})
         self.parser.phase = self.parser.phases["inBody"]
         self.parser.phase.processEndTag(token)
 
 class InFramesetPhase(Phase):
     # http://www.whatwg.org/specs/web-apps/current-work/#in-frameset
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("frameset", self.startTagFrameset),
-            ("frame", self.startTagFrame),
-            ("noframes", self.startTagNoframes)
-        ])
-        self.startTagHandler.default = self.startTagOther
-
-        self.endTagHandler = utils.MethodDispatcher([
-            ("frameset", self.endTagFrameset),
-            ("noframes", self.endTagNoframes)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("frameset", "startTagFrameset"),
+        ("frame", "startTagFrame"),
+        ("noframes", "startTagNoframes")
+    ]
+
+    endTagMethods = [
+        ("frameset", "endTagFrameset"),
+        ("noframes", "endTagNoframes")
+    ]
 
     def processEOF(self):
         if self.tree.openElements[-1].name != "html":
@@ -2110,7 +2396,7 @@ class InFramesetPhase(Phase):
 
     def startTagOther(self, token):
         self.parser.parseError("unexpected-start-tag-in-frameset",
-          {"name": token["name"]})
+          {"name": token.name})
 
     def endTagFrameset(self, token):
         if self.tree.openElements[-1].name == "html":
@@ -2129,24 +2415,19 @@ class InFramesetPhase(Phase):
 
     def endTagOther(self, token):
         self.parser.parseError("unexpected-end-tag-in-frameset",
-          {"name": token["name"]})
+          {"name": token.name})
 
 
 class AfterFramesetPhase(Phase):
     # http://www.whatwg.org/specs/web-apps/current-work/#after3
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("noframes", self.startTagNoframes)
-        ])
-        self.startTagHandler.default = self.startTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("noframes", "startTagNoframes")
+    ]
 
-        self.endTagHandler = utils.MethodDispatcher([
-            ("html", self.endTagHtml)
-        ])
-        self.endTagHandler.default = self.endTagOther
+    endTagMethods = [
+        ("html", "endTagHtml")
+    ]
 
     def processEOF(self):
         #Stop parsing
@@ -2160,24 +2441,20 @@ class AfterFramesetPhase(Phase):
 
     def startTagOther(self, token):
         self.parser.parseError("unexpected-start-tag-after-frameset",
-          {"name": token["name"]})
+          {"name": token.name})
 
     def endTagHtml(self, token):
         self.parser.phase = self.parser.phases["afterAfterFrameset"]
 
     def endTagOther(self, token):
         self.parser.parseError("unexpected-end-tag-after-frameset",
-          {"name": token["name"]})
+          {"name": token.name})
 
 
 class AfterAfterBodyPhase(Phase):
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml)
-        ])
-        self.startTagHandler.default = self.startTagOther
+    startTagMethods = [
+        ("html", "startTagHtml")
+    ]
 
     def processEOF(self):
         pass
@@ -2198,25 +2475,21 @@ class AfterAfterBodyPhase(Phase):
 
     def startTagOther(self, token):
         self.parser.parseError("expected-eof-but-got-start-tag",
-          {"name": token["name"]})
+          {"name": token.name})
         self.parser.phase = self.parser.phases["inBody"]
         self.parser.phase.processStartTag(token)
 
     def processEndTag(self, token):
         self.parser.parseError("expected-eof-but-got-end-tag",
-          {"name": token["name"]})
+          {"name": token.name})
         self.parser.phase = self.parser.phases["inBody"]
         self.parser.phase.processEndTag(token)
 
 class AfterAfterFramesetPhase(Phase):
-    def __init__(self, parser, tree):
-        Phase.__init__(self, parser, tree)
-
-        self.startTagHandler = utils.MethodDispatcher([
-            ("html", self.startTagHtml),
-            ("noframes", self.startTagNoFrames)
-        ])
-        self.startTagHandler.default = self.startTagOther
+    startTagMethods = [
+        ("html", "startTagHtml"),
+        ("noframes", "startTagNoFrames")
+    ]
 
     def processEOF(self):
         pass
@@ -2240,13 +2513,13 @@ class AfterAfterFramesetPhase(Phase):
 
     def startTagOther(self, token):
         self.parser.parseError("expected-eof-but-got-start-tag",
-          {"name": token["name"]})
+          {"name": token.name})
         self.parser.phase = self.parser.phases["inBody"]
         self.parser.phase.processStartTag(token)
 
     def processEndTag(self, token):
         self.parser.parseError("expected-eof-but-got-end-tag",
-          {"name": token["name"]})
+          {"name": token.name})
         self.parser.phase = self.parser.phases["inBody"]
         self.parser.phase.processEndTag(token)
 
@@ -2254,8 +2527,8 @@ def impliedTagToken(name, type="EndTag", attributes = None,
                     selfClosing = False):
     if attributes is None:
         attributes = {}
-    return {"type":tokenTypes[type], "name":name, "data":attributes,
-            "selfClosing":selfClosing}
+    return Token(tokenTypes[type], attributes, name=name,
+                 selfClosing=selfClosing)
 
 class ParseError(Exception):
     """Error in parsed document"""
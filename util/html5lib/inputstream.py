@@ -1,10 +1,14 @@
 import codecs
+import io
+import mmap
 import re
 import types
 import sys
+from bisect import bisect_left
+from collections import deque
 
 from .constants import EOF, spaceCharacters, asciiLetters, asciiUppercase
-from .constants import encodings, ReparseException
+from .constants import encodings, ReparseException, NeedDataException
 
 #Non-unicode versions of constants for use in the pre-parser
 spaceCharactersBytes = [str(item) for item in spaceCharacters]
@@ -13,6 +17,9 @@ asciiUppercaseBytes = [str(item) for item in asciiUppercase]
 
 invalid_unicode_re = re.compile("[\u0001-\u0008\u000B\u000E-\u001F\u007F-\u009F\uD800-\uDFFF\uFDD0-\uFDDF\uFFFE\uFFFF\U0001FFFE\U0001FFFF\U0002FFFE\U0002FFFF\U0003FFFE\U0003FFFF\U0004FFFE\U0004FFFF\U0005FFFE\U0005FFFF\U0006FFFE\U0006FFFF\U0007FFFE\U0007FFFF\U0008FFFE\U0008FFFF\U0009FFFE\U0009FFFF\U000AFFFE\U000AFFFF\U000BFFFE\U000BFFFF\U000CFFFE\U000CFFFF\U000DFFFE\U000DFFFF\U000EFFFE\U000EFFFF\U000FFFFE\U000FFFFF\U0010FFFE\U0010FFFF]")
 
+# The characters that are parse errors in the input stream
+stream_error_re = re.compile("\u0000|" + invalid_unicode_re.pattern)
+
 ascii_punctuation_re = re.compile(r"[\u0009-\u000D\u0020-\u002F\u003A-\u0040\u005B-\u0060\u007B-\u007E]")
 
 # Cache for charsUntil()
@@ -21,78 +28,131 @@ charsUntilRegEx = {}
 class BufferedStream:
     """Buffering for streams that do not have buffering of their own
 
-    The buffer is implemented as a list of chunks on the assumption that 
-    joining many strings will be slow since it is O(n**2)
+    Everything read from the stream is kept in a single bytearray, so that
+    the encoding detection can seek back to the start. Reads from the buffer
+    go through a memoryview, so each read copies its data only once.
     """
     
     def __init__(self, stream):
         self.stream = stream
-        self.buffer = []
-        self.position = [-1,0] #chunk number, offset
+        self.buffer = bytearray()
+        self.position = 0
 
     def tell(self):
-        pos = 0
-        for chunk in self.buffer[:self.position[0]]:
-            pos += len(chunk)
-        pos += self.position[1]
-        return pos
+        return self.position
 
     def seek(self, pos):
-        assert pos < self._bufferedBytes()
-        offset = pos
-        i = 0
-        while len(self.buffer[i]) < offset:
-            offset -= pos
-            i += 1
-        self.position = [i, offset]
-
-    def read(self, bytes):
-        if not self.buffer:
-            return self._readStream(bytes)
-        elif (self.position[0] == len(self.buffer) and
-              self.position[1] == len(self.buffer[-1])):
-            return self._readStream(bytes)
-        else:
-            return self._readFromBuffer(bytes)
-    
-    def _bufferedBytes(self):
-        return sum([len(item) for item in self.buffer])
+        assert pos <= len(self.buffer)
+        self.position = pos
+
+    def read(self, bytes=-1):
+        rv = self._readFromBuffer(bytes)
+        if bytes < 0:
+            rv += self._readStream(-1)
+        elif len(rv) < bytes:
+            rv += self._readStream(bytes - len(rv))
+        return rv
 
     def _readStream(self, bytes):
         data = self.stream.read(bytes)
-        self.buffer.append(data)
-        self.position[0] += 1
-        self.position[1] = len(data)
+        self.buffer += data
+        self.position = len(self.buffer)
         return data
 
     def _readFromBuffer(self, bytes):
-        remainingBytes = bytes
-        rv = []
-        bufferIndex = self.position[0]
-        bufferOffset = self.position[1]
-        while bufferIndex < len(self.buffer) and remainingBytes != 0:
-            assert remainingBytes > 0
-            bufferedData = self.buffer[bufferIndex]
-            
-            if remainingBytes <= len(bufferedData) - bufferOffset:
-                bytesToRead = remainingBytes
-                self.position = [bufferIndex, bufferOffset + bytesToRead]
-            else:
-                bytesToRead = len(bufferedData) - bufferOffset
-                self.position = [bufferIndex, len(bufferedData)]
-                bufferIndex += 1
-            data = rv.append(bufferedData[bufferOffset: 
-                                          bufferOffset + bytesToRead])
-            remainingBytes -= bytesToRead
+        end = len(self.buffer)
+        if bytes >= 0:
+            end = min(self.position + bytes, end)
+        # The view goes away with the statement, before the buffer has to
+        # grow again, which it can't while a view of it exists
+        rv = memoryview(self.buffer)[self.position:end].tobytes()
+        self.position = end
+        return rv
 
-            bufferOffset = 0
+class StringStream:
+    """Stream for a source that is already a string
 
-        if remainingBytes:
-            rv.append(self._readStream(remainingBytes))
-        
-        return "".join(rv)
-        
+    A string needs no decoding, so this is used directly as the dataStream
+    of a HTMLInputStream. The first read returns all of the string,
+    whatever the size asked for, so that it makes a single chunk.
+    """
 
+    def __init__(self, string):
+        self.string = string
+        self.position = 0
+
+    def tell(self):
+        return self.position
+
+    def seek(self, pos):
+        self.position = pos
+
+    def read(self, chars=-1):
+        rv = self.string[self.position:]
+        self.position = len(self.string)
+        return rv
+
+class MappedStream:
+    """Stream for a file that can be memory mapped
+
+    read() works like it does for files and is used by the encoding
+    sniffers. The decoding of the document is done by MappedReader straight
+    from memoryview slices of the mapping, so the file's bytes are never
+    copied into buffers of their own.
+    """
+
+    def __init__(self, fileobj):
+        # Only files read from the start are mapped, the others are read
+        # from where they are the way other file objects are
+        if fileobj.tell() != 0:
+            raise ValueError("file is not at its start")
+        self.map = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        self.position = 0
+
+    def close(self):
+        """Unmap the file, after which nothing more can be read"""
+        self.view = None
+        try:
+            self.map.close()
+        except BufferError:
+            # A slice handed out by readView is still alive, and the file
+            # is unmapped when it is collected
+            pass
+
+    def tell(self):
+        return self.position
+
+    def seek(self, pos):
+        self.position = pos
+
+    def readView(self, bytes=-1):
+        if bytes < 0:
+            end = len(self.view)
+        else:
+            end = min(self.position + bytes, len(self.view))
+        rv = self.view[self.position:end]
+        self.position = end
+        return rv
+
+    def read(self, bytes=-1):
+        return self.readView(bytes).tobytes()
+
+class MappedReader:
+    """Reader decoding a MappedStream, for use as the dataStream of a
+    HTMLInputStream"""
+
+    def __init__(self, stream, encoding):
+        self.stream = stream
+        self.decoder = codecs.getincrementaldecoder(encoding)('replace')
+
+    def read(self, bytes=-1):
+        while True:
+            data = self.stream.readView(bytes)
+            # Once the data runs out, flush any incomplete byte sequence
+            rv = self.decoder.decode(data, not data)
+            if rv or not data:
+                return rv
 
 class HTMLInputStream:
     """Provides a unicode stream of characters to the HTMLTokenizer.
@@ -104,6 +164,10 @@ class HTMLInputStream:
 
     _defaultChunkSize = 10240
 
+    # Whether the last charsUntil stopped because the data fed so far ran
+    # out, which only happens with a HTMLPushInputStream
+    ranOut = False
+
     def __init__(self, source, encoding=None, parseMeta=True, chardet=True):
         """Initialises the HTMLInputStream.
 
@@ -120,11 +184,11 @@ class HTMLInputStream:
         parseMeta - Look for a <meta> element containing encoding information
 
         """
-        # List of where new lines occur
-        self.newLines = [0]
-
         self.charEncoding = (codecName(encoding), "certain")
 
+        # Check each chunk for characters that are parse errors?
+        self.reportErrors = True
+
         # Raw Stream - for string objects this will encode to utf-8 and set
         #              self.charEncoding as appropriate
         self.rawStream = self.openStream(source)
@@ -145,25 +209,44 @@ class HTMLInputStream:
         self.reset()
 
     def reset(self):
-        self.dataStream = codecs.getreader(self.charEncoding[0])(self.rawStream,
-                                                                 'replace')
+        if isinstance(self.rawStream, StringStream):
+            self.dataStream = self.rawStream
+        elif isinstance(self.rawStream, MappedStream):
+            self.dataStream = MappedReader(self.rawStream,
+                                           self.charEncoding[0])
+        else:
+            self.dataStream = codecs.getreader(self.charEncoding[0])(self.rawStream,
+                                                                     'replace')
 
         self.chunk = ""
         self.chunkSize = 0
         self.chunkOffset = 0
-        self.errors = []
-
-        # Remember the current position in the document
-        self.positionLine = 1
-        self.positionCol = 0
-        # Remember the length of the last line, so unget("\n") can restore
-        # positionCol. (Only one character can be ungot at once, so we only
-        # need to remember the single last line.)
-        self.lastLineLength = None
+        # The parse errors found in the chunks read so far that the
+        # tokenizer has not handed out yet, see findErrors
+        self.errors = deque()
+
+        # The position is only worked out when it is asked for, from the
+        # offset in the chunk and the number of lines and columns before the
+        # chunk started
+        self.prevNumLines = 0
+        self.prevNumCols = 0
+        # Number of characters before the chunk started
+        self.prevNumChars = 0
+        # Offsets of the newlines in the chunk, found on first use
+        self.newLines = None
+        # Offset of the next occurrence of each character charsUntil has
+        # looked for in the chunk
+        self.nextOffsets = {}
         
         #Flag to indicate we may have a CR LF broken across a data chunk
         self._lastChunkEndsWithCR = False
 
+    def release(self):
+        """Let go of what the stream holds on to once it has been read, which
+        is the memory map of a file"""
+        if isinstance(self.rawStream, MappedStream):
+            self.rawStream.close()
+
     def openStream(self, source):
         """Produces a file object from source.
 
@@ -177,20 +260,24 @@ class HTMLInputStream:
             #produce bytes. We also need a good way to deal with the ones 
             #that produce strings, in particular getting the replacement 
             #characters right.
-            if not hasattr(source, 'encoding'):
-                stream = source
-            else:
+            if hasattr(source, 'encoding'):
                 raise NotImplementedError("Files not opened in binary mode not yet supported")
+            try:
+                return MappedStream(source)
+            except (AttributeError, EnvironmentError, ValueError):
+                # Not a regular file (e.g. a pipe, or in memory), or empty
+                stream = source
+        elif isinstance(source, str):
+            # Strings are already decoded, so keep them as they are
+            self.charEncoding = ("utf-8", "certain")
+            return StringStream(source)
         else:
             # Otherwise treat source as a string and convert to a file object
-            if isinstance(source, str):
-                source = source.encode('utf-8')
-                self.charEncoding = ("utf-8", "certain")
-            import io
             stream = io.BytesIO(bytes(source))
 
         if (not(hasattr(stream, "tell") and hasattr(stream, "seek")) or
-            stream is sys.stdin):
+            stream is sys.stdin or
+            (hasattr(stream, "seekable") and not stream.seekable())):
             stream = BufferedStream(stream)
 
         return stream
@@ -246,10 +333,11 @@ class HTMLInputStream:
         elif newEncoding == self.charEncoding[0]:
             self.charEncoding = (self.charEncoding[0], "certian")
         else:
+            oldEncoding = self.charEncoding[0]
             self.rawStream.seek(0)
-            self.reset()
             self.charEncoding = (newEncoding, "certian")
-            raise ReparseException("Encoding changed from %s to %s"%(self.charEncoding[0], newEncoding))
+            self.reset()
+            raise ReparseException("Encoding changed from %s to %s"%(oldEncoding, newEncoding))
             
     def detectBOM(self):
         """Attempts to detect at BOM at the start of the stream. If
@@ -296,33 +384,23 @@ class HTMLInputStream:
 
         return encoding
 
-    def updatePosition(self, chars):
-        # Update the position attributes to correspond to some sequence of
-        # read characters
-
-        # Find the last newline character
-        idx = chars.rfind("\n")
-        if idx == -1:
-            # No newlines in chars
-            self.positionCol += len(chars)
-        else:
-            # Find the last-but-one newline character
-            idx2 = chars.rfind("\n", 0, idx)
-            if idx2 == -1:
-                # Only one newline in chars
-                self.positionLine += 1
-                self.lastLineLength = self.positionCol + idx
-                self.positionCol = len(chars) - (idx + 1)
-            else:
-                # At least two newlines in chars
-                newlines = chars.count("\n")
-                self.positionLine += newlines
-                self.lastLineLength = idx - (idx2 + 1)
-                self.positionCol = len(chars) - (idx + 1)
+    def _position(self, offset):
+        if self.newLines is None:
+            self.newLines = [m.start() for m in re.finditer("\n", self.chunk)]
+        nLines = bisect_left(self.newLines, offset)
+        if nLines == 0:
+            return (self.prevNumLines, self.prevNumCols + offset)
+        return (self.prevNumLines + nLines,
+                offset - self.newLines[nLines - 1] - 1)
 
     def position(self):
         """Returns (line, col) of the current position in the stream."""
-        return (self.positionLine, self.positionCol)
+        line, col = self._position(self.chunkOffset)
+        return (line + 1, col)
+
+    def offset(self):
+        """Returns the number of characters read from the stream so far"""
+        return self.prevNumChars + self.chunkOffset
 
     def char(self):
         """ Read one character from the stream or queue if available. Return
@@ -336,47 +414,81 @@ class HTMLInputStream:
         char = self.chunk[self.chunkOffset]
         self.chunkOffset += 1
 
-        # Update the position attributes
-        if char == "\n":
-            self.lastLineLength = self.positionCol
-            self.positionCol = 0
-            self.positionLine += 1
-        elif char is not EOF:
-            self.positionCol += 1
-
         return char
 
+    def keptOffset(self):
+        """Offset in the current chunk from which readChunk keeps the data
+        in the next chunk"""
+        # Keep the last character, so that unget() can always step back
+        # over it
+        return max(self.chunkSize - 1, 0)
+
     def readChunk(self, chunkSize=_defaultChunkSize):
-        self.chunk = ""
-        self.chunkSize = 0
-        self.chunkOffset = 0
+        keptOffset = self.keptOffset()
+        if self.newLines is None:
+            # No position was asked for in this chunk, so its newlines have
+            # not been found, and only those before keptOffset are counted
+            nLines = self.chunk.count("\n", 0, keptOffset)
+            if nLines:
+                self.prevNumLines += nLines
+                self.prevNumCols = (keptOffset -
+                                    self.chunk.rfind("\n", 0, keptOffset) - 1)
+            else:
+                self.prevNumCols += keptOffset
+        else:
+            self.prevNumLines, self.prevNumCols = self._position(keptOffset)
+        self.prevNumChars += keptOffset
+        self.newLines = None
+        self.nextOffsets = {}
+
+        kept = self.chunk[keptOffset:]
+        self.chunk = kept
+        self.chunkSize = len(kept)
+        self.chunkOffset = len(kept)
 
         data = self.dataStream.read(chunkSize)
 
         if not data:
             return False
-        #Replace null characters
-        for i in range(data.count("\u0000")):
-            self.errors.append("null-character")
-        for i in range(len(invalid_unicode_re.findall(data))):
-            self.errors.append("invalid-codepoint")
 
-        data = data.replace("\u0000", "\ufffd")
         #Check for CR LF broken across chunks
         if (self._lastChunkEndsWithCR and data[0] == "\n"):
             data = data[1:]
             # Stop if the chunk is now empty
             if not data:
+                self._lastChunkEndsWithCR = False
                 return False
         self._lastChunkEndsWithCR = data[-1] == "\r"
         data = data.replace("\r\n", "\n")
         data = data.replace("\r", "\n")
 
-        self.chunk = data
-        self.chunkSize = len(data)
+        self.chunk = kept + data
+        self.chunkSize = len(self.chunk)
+
+        if self.reportErrors:
+            self.findErrors(len(kept))
+
+        #Replace null characters
+        if "\u0000" in data:
+            self.chunk = kept + data.replace("\u0000", "\ufffd")
 
         return True
 
+    def findErrors(self, start):
+        """Add the characters from start on in the chunk that are parse
+        errors to self.errors, as (offset, position, errorcode) with the
+        offset in the document of the character and the position just after
+        it, where the tokenizer is once it has read the character"""
+        for match in stream_error_re.finditer(self.chunk, start):
+            offset = match.start()
+            if match.group() == "\u0000":
+                errorcode = "null-character"
+            else:
+                errorcode = "invalid-codepoint"
+            line, col = self._position(offset + 1)
+            self.errors.append((self.prevNumChars + offset, (line + 1, col),
+                                errorcode))
+
     def charsUntil(self, characters, opposite = False):
         """ Returns a string of characters from the stream up to but not
         including any character in 'characters' or EOF. 'characters' must be
@@ -384,6 +496,28 @@ class HTMLInputStream:
         characters.
         """
 
+        # Text normally stops at one of a few markup characters, so jump
+        # straight to the nearest of them if it is in this chunk. The offset
+        # of the next occurrence of each character is remembered until the
+        # stream moves past it, so however rare a character is, each
+        # occurrence is found with a single scan of the chunk.
+        if not opposite and len(characters) <= 4:
+            offset = self.chunkOffset
+            end = self.chunkSize
+            nextOffsets = self.nextOffsets
+            for c in characters:
+                next = nextOffsets.get(c, -1)
+                if next < offset:
+                    next = self.chunk.find(c, offset)
+                    if next == -1:
+                        next = self.chunkSize
+                    nextOffsets[c] = next
+                if next < end:
+                    end = next
+            if end < self.chunkSize:
+                self.chunkOffset = end
+                return self.chunk[offset:end]
+
         # Use a cache of regexps to find the required characters
         try:
             chars = charsUntilRegEx[(characters, opposite)]
@@ -419,36 +553,147 @@ class HTMLInputStream:
                 # Reached EOF
                 break
 
-        r = "".join(rv)
-        self.updatePosition(r)
-        return r
+        return "".join(rv)
+
+    def matchChunk(self, pattern):
+        """ Match a compiled regular expression at the current position,
+        without looking past the end of the current chunk. Returns the match
+        object or None; the stream position is not changed until the match
+        is passed to consumeMatch.
+        """
+        if self.chunkOffset >= self.chunkSize:
+            if not self.readChunk():
+                return None
+        return pattern.match(self.chunk, self.chunkOffset)
+
+    def consumeMatch(self, match):
+        """ Advance the stream past a match returned by matchChunk. """
+        assert match.start() == self.chunkOffset
+        self.chunkOffset = match.end()
 
     def unget(self, char):
         # Only one character is allowed to be ungotten at once - it must
         # be consumed again before any further call to unget
 
         if char is not None:
-            if self.chunkOffset == 0:
-                # unget is called quite rarely, so it's a good idea to do
-                # more work here if it saves a bit of work in the frequently
-                # called char and charsUntil.
-                # So, just prepend the ungotten character onto the current
-                # chunk:
-                self.chunk = char + self.chunk
-                self.chunkSize += 1
-            else:
-                self.chunkOffset -= 1
-                assert self.chunk[self.chunkOffset] == char
-
-            # Update the position attributes
-            if char == "\n":
-                assert self.positionLine >= 1
-                assert self.lastLineLength is not None
-                self.positionLine -= 1
-                self.positionCol = self.lastLineLength
-                self.lastLineLength = None
+            # readChunk keeps the last character of the previous chunk, so
+            # the character is always still in the current one
+            self.chunkOffset -= 1
+            assert self.chunk[self.chunkOffset] == char
+            # The character may be the next occurrence of itself now
+            self.nextOffsets.pop(char, None)
+
+class FeedBuffer:
+    """File-like object holding the bytes fed to a HTMLPushInputStream that
+    have not been read yet. Unlike with a file an empty read does not mean
+    the end of the data, only that nothing more has been fed so far.
+    """
+
+    def __init__(self):
+        self.buffer = deque()
+        self.offset = 0
+
+    def feed(self, data):
+        if data:
+            self.buffer.append(data)
+
+    def read(self, bytes=-1):
+        rv = []
+        while self.buffer and bytes != 0:
+            data = self.buffer[0]
+            end = len(data)
+            if 0 <= bytes < end - self.offset:
+                end = self.offset + bytes
+            rv.append(data[self.offset:end])
+            if bytes > 0:
+                bytes -= end - self.offset
+            if end == len(data):
+                self.buffer.popleft()
+                self.offset = 0
             else:
-                self.positionCol -= 1
+                self.offset = end
+        return b"".join(rv)
+
+class HTMLPushInputStream(HTMLInputStream):
+    """HTMLInputStream for documents that arrive in pieces, e.g. from a pipe
+    or a socket.
+
+    Data is added with feed() as it arrives and close() is called after the
+    last piece. Until then running out of data does not mean EOF: reading
+    raises NeedDataException instead, and the reader is expected to go back
+    to the last mark() with rewind() and try again once more data has been
+    fed. Pieces may be split anywhere, including inside a CR LF pair or a
+    multi-byte character.
+
+    charsUntil is the exception: running out of data only stops the
+    characters it returns there, and sets ranOut, so that a long run of
+    text can be read a piece at a time instead of from its start each time.
+
+    Encoding detection would need the start of the document before parsing
+    could begin, so the encoding is fixed: bytes are decoded with the given
+    encoding, or UTF-8 if there is none, and strings are encoded with it.
+    """
+
+    def __init__(self, encoding=None):
+        self.closed = False
+        # Whether readChunk stops charsUntil rather than raising, and the
+        # arguments of the last call to charsUntil and whether it stopped
+        # that way
+        self.readingChars = False
+        self.lastCharsUntil = None
+        self.ranOut = False
+        HTMLInputStream.__init__(self, FeedBuffer(), encoding or "utf-8")
+
+    def openStream(self, source):
+        return source
+
+    def reset(self):
+        HTMLInputStream.reset(self)
+        self.mark()
+
+    def feed(self, data):
+        """Add the next piece of the document, a string or bytes"""
+        if isinstance(data, str):
+            data = data.encode(self.charEncoding[0])
+        self.rawStream.feed(data)
+
+    def close(self):
+        """Mark the end of the document, so that running out of data
+        now means EOF"""
+        self.closed = True
+
+    def mark(self):
+        """Remember the current position for rewind()"""
+        self.markOffset = self.chunkOffset
+
+    def rewind(self):
+        """Go back to the position saved by the last call to mark()"""
+        self.chunkOffset = self.markOffset
+        self.nextOffsets = {}
+
+    def keptOffset(self):
+        # Keep everything from the mark on, so that rewind() can still go
+        # back to it
+        return self.markOffset
+
+    def readChunk(self, chunkSize=HTMLInputStream._defaultChunkSize):
+        rv = HTMLInputStream.readChunk(self, chunkSize)
+        self.markOffset = 0
+        if not rv and not self.closed:
+            if self.readingChars:
+                self.ranOut = True
+                return False
+            raise NeedDataException
+        return rv
+
+    def charsUntil(self, characters, opposite=False):
+        self.lastCharsUntil = (characters, opposite)
+        self.ranOut = False
+        self.readingChars = True
+        try:
+            return HTMLInputStream.charsUntil(self, characters, opposite)
+        finally:
+            self.readingChars = False
 
 class EncodingBytes(bytes):
     """Bytes-like object with an assosiated position and various extra methods
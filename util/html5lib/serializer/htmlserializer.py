@@ -101,9 +101,9 @@ class HTMLSerializer(object):
             from html5lib.filters.optionaltags import Filter
             treewalker = Filter(treewalker)
         for token in treewalker:
-            type = token["type"]
+            type = token.type
             if type == "Doctype":
-                doctype = "<!DOCTYPE %s>" % token["name"]
+                doctype = "<!DOCTYPE %s>" % token.name
                 if encoding:
                     yield doctype.encode(encoding)
                 else:
@@ -111,24 +111,24 @@ class HTMLSerializer(object):
 
             elif type in ("Characters", "SpaceCharacters"):
                 if type == "SpaceCharacters" or in_cdata:
-                    if in_cdata and token["data"].find("</") >= 0:
+                    if in_cdata and token.data.find("</") >= 0:
                         self.serializeError(_("Unexpected </ in CDATA"))
                     if encoding:
-                        yield token["data"].encode(encoding, "strict")
+                        yield token.data.encode(encoding, "strict")
                     else:
-                        yield token["data"]
+                        yield token.data
                 elif encoding:
-                    yield encode(escape(token["data"]), encoding)
+                    yield encode(escape(token.data), encoding)
                 else:
-                    yield escape(token["data"])
+                    yield escape(token.data)
 
             elif type in ("StartTag", "EmptyTag"):
-                name = token["name"]
+                name = token.name
                 if name in rcdataElements and not self.escape_rcdata:
                     in_cdata = True
                 elif in_cdata:
                     self.serializeError(_("Unexpected child element of a CDATA element"))
-                attrs = token["data"]
+                attrs = token.data
                 if hasattr(attrs, "items"):
                     attrs = list(attrs.items())
                 attrs.sort()
@@ -182,7 +182,7 @@ class HTMLSerializer(object):
                     yield "<%s%s>" % (name, "".join(attributes))
 
             elif type == "EndTag":
-                name = token["name"]
+                name = token.name
                 if name in rcdataElements:
                     in_cdata = False
                 elif in_cdata:
@@ -193,16 +193,16 @@ class HTMLSerializer(object):
                 yield end_tag
 
             elif type == "Comment":
-                data = token["data"]
+                data = token.data
                 if data.find("--") >= 0:
                     self.serializeError(_("Comment contains --"))
-                comment = "<!--%s-->" % token["data"]
+                comment = "<!--%s-->" % token.data
                 if encoding:
                     comment = comment.encode(encoding, unicode_encode_errors)
                 yield comment
 
             else:
-                self.serializeError(token["data"])
+                self.serializeError(token.data)
 
     def render(self, treewalker, encoding=None):
         if encoding:
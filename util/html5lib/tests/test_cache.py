@@ -0,0 +1,52 @@
+import shutil
+import tempfile
+import unittest
+
+import html5lib
+from html5lib import cache
+
+class CacheTest(unittest.TestCase):
+    """Parsing with a cache.ParseCache"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = cache.ParseCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testKeyVersion(self):
+        # Entries written for another version of the format are not used
+        key = self.cache.key(b"<p>", ("str",))
+        version = cache.version
+        cache.version = version + 1
+        try:
+            self.assertNotEqual(self.cache.key(b"<p>", ("str",)), key)
+        finally:
+            cache.version = version
+
+    def testKeySources(self):
+        # Entries written by another version of html5lib are not used
+        key = self.cache.key(b"<p>", ("str",))
+        sourceDigest = cache.getSourceDigest()
+        cache.sourceDigest = "0" * 64
+        try:
+            self.assertNotEqual(self.cache.key(b"<p>", ("str",)), key)
+        finally:
+            cache.sourceDigest = sourceDigest
+
+    def testHit(self):
+        source = "<p>a<b>b</p>c"
+        parser = html5lib.HTMLParser(cache=self.cache)
+        expected = parser.parse(source).printTree()
+        errors = parser.errors
+        self.assertTrue(parser.tokenizer is not None)
+        parser.parse("<table>")
+        document = parser.parse(source)
+        self.assertEqual(document.printTree(), expected)
+        self.assertEqual(parser.errors, errors)
+        # The state of the parse of "<table>" is not left over
+        self.assertTrue(parser.tokenizer is None)
+
+if __name__ == "__main__":
+    unittest.main()
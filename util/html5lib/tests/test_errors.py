@@ -0,0 +1,67 @@
+import io
+import unittest
+
+import html5lib
+
+class ErrorPositionTest(unittest.TestCase):
+    """The positions parse errors are reported at"""
+
+    def errors(self, source):
+        parser = html5lib.HTMLParser()
+        parser.parse(source)
+        return [(position, errorcode)
+                for position, errorcode, datavars in parser.errors]
+
+    def testStreamErrorAfterTag(self):
+        # Errors the input stream finds are reported where the character is,
+        # in order with the errors of the tokens around it
+        self.assertEqual(self.errors("<body>\x00"),
+                         [((1, 6), "expected-doctype-but-got-start-tag"),
+                          ((1, 7), "null-character")])
+
+    def testStreamErrorsAfterText(self):
+        self.assertEqual(self.errors("a\x00<a href=x>\x01</a>"),
+                         [((1, 2), "null-character"),
+                          ((1, 2), "expected-doctype-but-got-chars"),
+                          ((1, 13), "invalid-codepoint")])
+
+    def testStreamErrorLine(self):
+        # A string is read as a single chunk, and the errors in it are still
+        # reported on their own line
+        source = "<!doctype html>\n<p>a\r\nb \x00c\n"
+        self.assertEqual(self.errors(source), [((3, 3), "null-character")])
+
+    def testStreamErrorLineInFile(self):
+        source = io.BytesIO(b"<!doctype html>" + b"x" * 20000 +
+                            b"\n\n\x01\x00")
+        self.assertEqual(self.errors(source),
+                         [((3, 1), "invalid-codepoint"),
+                          ((3, 2), "null-character")])
+
+    def testPositionAcrossChunks(self):
+        # Lines and columns carry on from one chunk of a file to the next
+        source = "<!doctype html>" + "<p>x</p>\n" * 3000 + "a </x>"
+        expected = [((3001, 6), "unexpected-end-tag")]
+        self.assertEqual(self.errors(source), expected)
+        self.assertEqual(self.errors(io.BytesIO(source.encode("utf-8"))),
+                         expected)
+
+class NoErrorsTest(unittest.TestCase):
+    """HTMLParser(collectErrors=False)"""
+
+    source = "<p a=1 a=2>&#0;</p x>&amp<\x00/p>"
+
+    def testNoErrorTokens(self):
+        # The tokenizer does not make tokens for errors nobody records
+        parser = html5lib.HTMLParser(collectErrors=False, collectStats=True)
+        parser.parse(self.source)
+        self.assertEqual(parser.errors, [])
+        self.assertFalse("ParseError" in parser.stats["tokens"])
+
+    def testStrict(self):
+        parser = html5lib.HTMLParser(collectErrors=False, strict=True)
+        self.assertRaises(html5lib.html5parser.ParseError, parser.parse,
+                          "<!doctype html>" + self.source)
+
+if __name__ == "__main__":
+    unittest.main()
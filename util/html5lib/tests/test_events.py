@@ -0,0 +1,38 @@
+import unittest
+
+import html5lib
+
+def eventNames(events):
+    rv = []
+    for event, node in events:
+        if event in ("start", "end"):
+            rv.append((event, node.name))
+        else:
+            rv.append((event, str(node)))
+    return rv
+
+class EventsTest(unittest.TestCase):
+    """Parsing with parseEvents"""
+
+    def testLateCharsetMeta(self):
+        # The <meta> makes the parse start over in its encoding, and the
+        # events from before that are not handed out
+        source = (b"<!doctype html><title>x</title><p>a</p>"
+                  b"<meta charset=iso-8859-2><p>\xb1\xe6</p>")
+        events = eventNames(html5lib.parseEvents(source))
+        self.assertEqual(events[0][0], "doctype")
+        self.assertEqual(len([event for event in events
+                              if event[0] == "doctype"]), 1)
+        self.assertEqual([event for event in events if event[0] == "text"],
+                         [("text", "x"), ("text", "a"),
+                          ("text", "ąć")])
+
+    def testCharsetMetaPastPrescan(self):
+        # Once events have been handed out the encoding is taken as certain
+        source = (b"<p>x</p>" * 200 + b"<meta charset=iso-8859-2>"
+                  b"<p>\xb1</p>")
+        events = eventNames(html5lib.parseEvents(source))
+        self.assertEqual(events[-4], ("text", "\xb1"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+import html5lib
+
+def feedParse(source, size):
+    parser = html5lib.HTMLParser()
+    for i in range(0, len(source), size):
+        parser.feed(source[i:i + size])
+    return parser, parser.close()
+
+class FeedTest(unittest.TestCase):
+    """Parsing with feed() and close()"""
+
+    def assertSameParse(self, source, size):
+        parser = html5lib.HTMLParser()
+        expected = parser.parse(source)
+        fedParser, document = feedParse(source, size)
+        self.assertEqual(document.printTree(), expected.printTree())
+        self.assertEqual(fedParser.errors, parser.errors)
+
+    def testErrorPositions(self):
+        # The parse errors, and where they are, are the same as with parse(),
+        # however the document is split up
+        for source in ("<?xx?>hello", "<p a=1 a=2>x",
+                       "<table>a<tr>\n<td>b</table></p>",
+                       "<!doctype html><title>x</title><!-- a -- b -->\n"
+                       "<script>a<b</script><p>c &amp d &e; </div>"):
+            for size in (len(source), 1, 3):
+                self.assertSameParse(source, size)
+
+    def testLongText(self):
+        for source in ("<p>" + "word, " * 5000,
+                       "<!--" + "a-b -" * 5000 + "-->",
+                       "<script>" + "if (a<b) c--;\n" * 5000 + "</script>",
+                       "<textarea>" + "a &amp; b\n" * 5000 + "</textarea>"):
+            self.assertSameParse(source, 100)
+
+    def rewoundChars(self, source, size):
+        """Feed source in pieces of size characters, and count the
+        characters the tokenizer went back over to read again"""
+        parser = html5lib.HTMLParser()
+        parser.feed("")
+        stream = parser.pushStream
+        rewind = stream.rewind
+        counts = []
+        def countingRewind():
+            counts.append(stream.chunkOffset - stream.markOffset)
+            rewind()
+        stream.rewind = countingRewind
+        for i in range(0, len(source), size):
+            parser.feed(source[i:i + size])
+        parser.close()
+        return sum(counts)
+
+    def testLinearTime(self):
+        # Text fed a piece at a time is read once, not from its start again
+        # with every piece. Only the token cut off by the end of a piece is
+        # read again
+        for before, run, after in (("<p>", "word ", ""),
+                                   ("<!--", "a-b ", "-->"),
+                                   ("<script>", "x<y; ", "</script>"),
+                                   ("<textarea>", "a &amp; b\n",
+                                    "</textarea>"),
+                                   ("<p>", "<b>x</b> ", "")):
+            source = before + run * 20000 + after
+            pieces = len(source) // 1000 + 1
+            rewound = self.rewoundChars(source, 1000)
+            self.assertTrue(rewound <= len(run) * pieces,
+                            "%r: %d characters read again in %d pieces" %
+                            (before, rewound, pieces))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import io
+import os
+import tempfile
+import unittest
+
+import html5lib
+from html5lib.inputstream import HTMLInputStream, MappedStream
+
+source = b"<!DOCTYPE html><p>a<b>b</p>c\n" * 100
+
+class MappedStreamTest(unittest.TestCase):
+    """Files read through a memory map"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".html")
+        os.write(fd, source)
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testSameTree(self):
+        parser = html5lib.HTMLParser()
+        expected = parser.parse(io.BytesIO(source)).printTree()
+        expectedErrors = parser.errors
+        f = open(self.path, "rb")
+        try:
+            self.assertEqual(parser.parse(f).printTree(), expected)
+        finally:
+            f.close()
+        self.assertEqual(parser.errors, expectedErrors)
+
+    def testNotAtStart(self):
+        # A file that has been read from already is not mapped
+        f = open(self.path, "rb")
+        try:
+            self.assertTrue(isinstance(HTMLInputStream(f).rawStream,
+                                       MappedStream))
+            f.seek(15)
+            self.assertTrue(HTMLInputStream(f).rawStream is f)
+        finally:
+            f.close()
+
+    def testUnmapped(self):
+        # The map is closed once the parse is done, also for a fragment
+        parser = html5lib.HTMLParser()
+        f = open(self.path, "rb")
+        try:
+            parser.parse(f)
+            self.assertTrue(parser.tokenizer.stream.rawStream.map.closed)
+            f.seek(0)
+            parser.parseFragment(f)
+            self.assertTrue(parser.tokenizer.stream.rawStream.map.closed)
+        finally:
+            f.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+
+import html5lib
+from html5lib import html5parser
+from html5lib.treebuilders._base import ElementStack
+
+# Cells with content the in cell phase hands on to the in body phase
+cells = "<table><tr><td><p>a<b>b</td><td>c<i>d</table>e"
+
+class DispatchTest(unittest.TestCase):
+    """The tag dispatch tables are built once per phase class, and shared
+    by all parsers"""
+
+    def tables(self):
+        rv = []
+        for cls in (html5parser.InCellPhase, html5parser.InBodyPhase):
+            for handler in (cls.startTagHandler, cls.endTagHandler):
+                rv.append((dict(handler), handler.default))
+        return rv
+
+    def testInCellDelegation(self):
+        parser = html5lib.HTMLParser()
+        expected = parser.parse(cells).printTree()
+        expectedErrors = parser.errors
+        tables = self.tables()
+        # A parser half way through a cell, while another one parses
+        first = html5lib.HTMLParser()
+        first.feed(cells[:18])
+        second = html5lib.HTMLParser()
+        self.assertEqual(second.parse(cells).printTree(), expected)
+        self.assertEqual(second.errors, expectedErrors)
+        first.feed(cells[18:])
+        self.assertEqual(first.close().printTree(), expected)
+        self.assertEqual(first.errors, expectedErrors)
+        self.assertEqual(self.tables(), tables)
+        # Each phase works on the parser it belongs to
+        for parser in (first, second):
+            for phase in parser.phases.values():
+                self.assertTrue(phase.parser is parser)
+
+# Documents that leave the parser in different states: quirks mode, a <pre>
+# whose leading newline is dropped, a frameset, an open table and a select
+documents = [
+    "<!DOCTYPE html PUBLIC \"-//W3C//DTD HTML 4.0//EN\"><p>a<table>",
+    "<!doctype html><pre>\nx</pre><pre>",
+    "<!doctype html><frameset><frame></frameset>",
+    cells,
+    "<select><option>a<option>b",
+    "<p>a<b>b<p>c</b>d",
+]
+
+class ReuseTest(unittest.TestCase):
+    """A parser reused for another document gives the same results as a new
+    one"""
+
+    def results(self, parser, document):
+        tree = parser.parse(document).printTree()
+        return tree, parser.errors, parser.compatMode
+
+    def testReset(self):
+        expected = [self.results(html5lib.HTMLParser(), document)
+                    for document in documents]
+        parser = html5lib.HTMLParser()
+        for order in (documents, list(reversed(documents))):
+            for document in order:
+                self.assertEqual(self.results(parser, document),
+                                 expected[documents.index(document)])
+        # Also after a document that was only fed in part
+        parser.feed("<pre><table><tr><td>")
+        parser.reset()
+        self.assertEqual(parser.errors, [])
+        self.assertEqual(self.results(parser, documents[1]), expected[1])
+
+    def testGetParser(self):
+        parser = html5parser.getParser()
+        self.assertTrue(html5parser.getParser() is parser)
+        expected = [html5lib.HTMLParser().parse(document).printTree()
+                    for document in documents]
+        trees = html5parser.parseMany(documents + documents)
+        self.assertEqual([tree.printTree() for tree in trees],
+                         expected + expected)
+
+class ElementStackTest(unittest.TestCase):
+    """The index of the stack of open elements stays right when elements are
+    taken out of the middle of it"""
+
+    def assertIndexed(self, stack):
+        fresh = ElementStack(list(stack))
+        # Names no longer on the stack may be left with no positions
+        positions = dict((name, value)
+                         for name, value in stack.positions.items() if value)
+        self.assertEqual(positions, fresh.positions)
+        self.assertEqual(stack.scopeBoundaries, fresh.scopeBoundaries)
+        self.assertEqual(stack.tableScopeBoundaries,
+                         fresh.tableScopeBoundaries)
+        self.assertEqual(stack.counts, fresh.counts)
+        for node in stack:
+            self.assertTrue(node in stack)
+            for tableVariant in (False, True):
+                self.assertEqual(stack.inScope(node.name, tableVariant),
+                                 fresh.inScope(node.name, tableVariant))
+
+    def testAdoptionAgency(self):
+        for source in ("<p><b>x<p>y</b>", "<a>1<div>2<b>3</a>4",
+                       "<b>1<table><tr><td>2</b>3",
+                       "<i>1<p>2<b>3<div>4</i>5</b>"):
+            parser = html5lib.HTMLParser()
+            parser.feed(source)
+            self.assertIndexed(parser.tree.openElements)
+            parser.feed("<p><em>z")
+            self.assertIndexed(parser.tree.openElements)
+
+    def testHeadRemoved(self):
+        # The head is put back on the stack for elements after it, and taken
+        # out again from under them
+        for source in ("<head></head><script>x", "<head></head><title>x",
+                       "<head></head><style>x</style><p>"):
+            parser = html5lib.HTMLParser()
+            parser.feed(source)
+            self.assertIndexed(parser.tree.openElements)
+
+if __name__ == "__main__":
+    unittest.main()
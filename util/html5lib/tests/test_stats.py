@@ -0,0 +1,41 @@
+import json
+import unittest
+
+import html5lib
+
+class StatsTest(unittest.TestCase):
+    """HTMLParser(collectStats=True)"""
+
+    def testCounts(self):
+        parser = html5lib.HTMLParser(collectStats=True)
+        parser.parse("<p><b>x<p>y</b>z</p><i>w")
+        stats = parser.stats
+        self.assertEqual(sorted(stats.keys()),
+                         ["adoptionAgency", "maxOpenElements", "phaseTime",
+                          "reconstructActiveFormattingElements",
+                          "tokenizerStates", "tokens"])
+        self.assertEqual(stats["tokens"],
+                         {"StartTag": 4, "EndTag": 2, "Characters": 4})
+        self.assertEqual(stats["adoptionAgency"], 1)
+        self.assertEqual(stats["maxOpenElements"], 4)
+        self.assertTrue(stats["reconstructActiveFormattingElements"] > 0)
+        self.assertTrue("InBodyPhase" in stats["phaseTime"])
+        self.assertTrue(stats["tokenizerStates"]["data"]["calls"] > 0)
+        # Only dicts, strings and numbers
+        json.dumps(stats)
+
+    def testReset(self):
+        # The stats are those of the last document parsed
+        parser = html5lib.HTMLParser(collectStats=True)
+        parser.parse("<p><b>x<p>y</b>z</p><i>w")
+        parser.parse("<p>")
+        self.assertEqual(parser.stats["tokens"], {"StartTag": 1})
+        self.assertEqual(parser.stats["adoptionAgency"], 0)
+
+    def testNoStats(self):
+        parser = html5lib.HTMLParser()
+        parser.parse("<p>")
+        self.assertTrue(parser.stats is None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import html5lib
+from html5lib.tokenizer import HTMLTokenizer
+
+class SlowTokenizer(HTMLTokenizer):
+    def __init__(self, *args, **kwargs):
+        kwargs["bulkScan"] = False
+        HTMLTokenizer.__init__(self, *args, **kwargs)
+
+# Well-formed and malformed tags, duplicate attributes, character references
+# in attribute values and text, and tags split over lines
+sources = [
+    '<!DOCTYPE html><html lang=it><head><title>T</title></head>'
+    '<body class="a b"><p id=x>text <a href="/x?a=1&amp;b=2">link</a></p>',
+    '<p a=1 a=2 b=\'3\' B=4>x</p><br/><img src=x alt="">',
+    '<a href="&copy;&copy">x</a><a title=&amp;>y</a><a b="&#x41;&#65">',
+    '<p <div>x</div class=y><p/ a><p a="b"c><p a=">"></p',
+    '<td\nclass="x"\n>a\n</td\n><a\thref=x\t/>< p><p =a><p a==b>',
+    '<P ID=X>x</P><DiV ClAsS=Y>y</dIv><p a b c=d>&lt;&gt;&nbsp;&unknown;',
+    '<script>a<b && c</script><style>p>a{}</style><textarea>&amp;<p>'
+    '</textarea><title>a&amp;b<i></title>',
+    '<p\x00 a=\x01b>\x00</p><p a="\x00">',
+]
+
+class BulkScanTest(unittest.TestCase):
+    """HTMLTokenizer gives the same tokens with and without bulkScan"""
+
+    def testTokens(self):
+        for source in sources:
+            expected = list(HTMLTokenizer(source, bulkScan=False))
+            self.assertEqual(list(HTMLTokenizer(source)), expected)
+
+    def testErrors(self):
+        # And the same parse errors at the same positions
+        for source in sources:
+            parser = html5lib.HTMLParser(tokenizer=SlowTokenizer)
+            expected = parser.parse(source).printTree()
+            expectedErrors = parser.errors
+            parser = html5lib.HTMLParser()
+            self.assertEqual(parser.parse(source).printTree(), expected)
+            self.assertEqual(parser.errors, expectedErrors)
+
+class RawTextTest(unittest.TestCase):
+    """Script, style, textarea and title text comes in few tokens"""
+
+    def countTokens(self, source, tokenType):
+        parser = html5lib.HTMLParser(collectStats=True)
+        parser.parse(source)
+        return parser.stats["tokens"].get(tokenType, 0)
+
+    def testScript(self):
+        # "<" and "&" only end the text at the end tag
+        self.assertEqual(
+            self.countTokens("<script>a<b && c</script>", "Characters"), 1)
+        self.assertEqual(
+            self.countTokens("<script>a</b></scripts></script>",
+                             "Characters"), 1)
+
+    def testTextarea(self):
+        source = "<textarea>\nx&amp;y<p>z</ textarea></TEXTAREA>"
+        self.assertEqual(self.countTokens(source, "Characters"), 1)
+        self.assertEqual(self.countTokens(source, "SpaceCharacters"), 1)
+
+if __name__ == "__main__":
+    unittest.main()
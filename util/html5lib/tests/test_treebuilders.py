@@ -0,0 +1,137 @@
+import gc
+import pickle
+import unittest
+import weakref
+import xml.etree.ElementTree as ElementTree
+
+import html5lib
+from html5lib import treebuilders, treewalkers
+from html5lib.serializer import HTMLSerializer
+from html5lib.treewalkers import simpletree
+
+# Foster parented text, and the adoption agency moving elements that have
+# text in and after them
+misnested = ("<table>a<tr>b<td>c</table><b>x<p>y</b>z"
+             "<i>q<div>r</i>s<a>1<table>2<a>3</table>4")
+
+class TextBufferTest(unittest.TestCase):
+    """Text buffered by the tree builders ends up where it was inserted"""
+
+    def testMoveWithBufferedTail(self):
+        builder = treebuilders.getTreeBuilder("etree", ElementTree)(True)
+        first = builder.elementClass("div")
+        second = builder.elementClass("div")
+        node = builder.elementClass("b")
+        first.appendChild(node)
+        builder.insertText("a", first)
+        first.removeChild(node)
+        # The text after node is its tail, which goes with it
+        self.assertEqual(node._element.tail, "a")
+        second.appendChild(node)
+        builder.insertText("b", second)
+        builder.flushText()
+        self.assertEqual(node._element.tail, "ab")
+
+    def testMisnestedDom(self):
+        parser = html5lib.HTMLParser()
+        expected = parser.tree.testSerializer(parser.parse(misnested))
+        parser = html5lib.HTMLParser(tree=treebuilders.getTreeBuilder("dom"))
+        self.assertEqual(parser.tree.testSerializer(parser.parse(misnested)),
+                         expected)
+
+class SimpletreeTest(unittest.TestCase):
+    """The nodes of the simpletree builder"""
+
+    def testChildNodesReadOnly(self):
+        document = html5lib.parse("<p>a<b>b</b>c")
+        p = document.childNodes[0].childNodes[1].childNodes[0]
+        children = p.childNodes
+        self.assertEqual([str(child) for child in children],
+                         ['"a"', "<b>", '"c"'])
+        def remove():
+            del children[0]
+        self.assertRaises(TypeError, remove)
+        # Changes made through the node show in childNodes
+        p.removeChild(children[1])
+        self.assertEqual([str(child) for child in p.childNodes],
+                         ['"a"', '"c"'])
+        self.assertEqual(len(children), 3)
+
+# Doctype, comments, attributes, namespaced elements and the text of raw
+# text elements, along with the misnested markup
+documents = [
+    misnested,
+    '<!DOCTYPE html><!--a--><html lang=en><title>a&amp;b</title>'
+    '<p class="x" id=y>1<br>2<!--b--><svg><circle r=1></svg><math><mi>x',
+    "<script>a<b</script><pre>\nx</pre><select><option>1<option>2",
+]
+
+class FlatTest(unittest.TestCase):
+    """The flat tree builder and walker"""
+
+    def parsers(self):
+        return (html5lib.HTMLParser(),
+                html5lib.HTMLParser(tree=treebuilders.getTreeBuilder("flat")))
+
+    def testTree(self):
+        # The same tree as simpletree's, also once pickled
+        for document in documents:
+            simple, flat = self.parsers()
+            expected = simple.parse(document).printTree()
+            tree = flat.parse(document)
+            self.assertEqual(tree.printTree(), expected)
+            tree = pickle.loads(pickle.dumps(tree))
+            self.assertEqual(tree.printTree(), expected)
+            self.assertEqual(flat.errors, simple.errors)
+
+    def testFragment(self):
+        for document in documents:
+            simple, flat = self.parsers()
+            self.assertEqual(flat.parseFragment(document).printTree(),
+                             simple.parseFragment(document).printTree())
+
+    def testWalker(self):
+        walker = treewalkers.getTreeWalker("flat")
+        for document in documents:
+            simple, flat = self.parsers()
+            expected = HTMLSerializer().render(
+                simpletree.TreeWalker(simple.parse(document)))
+            tree = pickle.loads(pickle.dumps(flat.parse(document)))
+            self.assertEqual(HTMLSerializer().render(walker(tree)), expected)
+
+class NativeETreeTest(unittest.TestCase):
+    """The etree builder with native=True"""
+
+    def parser(self):
+        return html5lib.HTMLParser(tree=treebuilders.getTreeBuilder(
+            "etree", ElementTree, native=True, fullTree=True))
+
+    def testPickle(self):
+        # The tree pickles as plain elements
+        document = self.parser().parse(misnested)
+        copy = pickle.loads(pickle.dumps(document))
+        self.assertTrue(type(copy) is ElementTree.Element)
+        self.assertTrue(type(copy[0]) is ElementTree.Element)
+        self.assertEqual(ElementTree.tostring(copy),
+                         ElementTree.tostring(document))
+
+    def testWalker(self):
+        # The native walker gives the same tokens as simpletree's
+        expected = HTMLSerializer().render(
+            simpletree.TreeWalker(html5lib.parse(misnested)))
+        document = self.parser().parse(misnested)
+        walker = treewalkers.getTreeWalker("etree", native=True)
+        self.assertEqual(HTMLSerializer().render(walker(document)), expected)
+
+    def testBuilderReleased(self):
+        # The tree does not keep the TreeBuilder alive
+        parser = self.parser()
+        document = parser.parse(misnested)
+        builder = weakref.ref(parser.tree)
+        del parser
+        gc.collect()
+        self.assertTrue(builder() is None)
+        self.assertTrue(type(document).builder is None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,17 +1,102 @@
+import re
 from collections import deque
     
 from .constants import contentModelFlags, spaceCharacters
 from .constants import entitiesWindows1252, entities
 from .constants import asciiLowercase, asciiLetters, asciiUpper2Lower
 from .constants import digits, hexDigits, EOF
-from .constants import tokenTypes
-
-from .inputstream import HTMLInputStream
-
-# Group entities by their first character, for faster lookups
-entitiesByFirstChar = {}
+from .constants import tokenTypes, NeedDataException
+from .constants import voidElements, scopingElements, formattingElements
+from .constants import specialElements, cdataElements, rcdataElements
+from .constants import headingElements, tableInsertModeElements
+from .constants import booleanAttributes
+from .utils import Token
+
+from .inputstream import HTMLInputStream, HTMLPushInputStream
+
+# Prefix tree of entity names, so that the longest named entity can be found
+# in a single pass over the input. Each node maps a character to the node for
+# the next one; nodes that complete an entity name also map "" to that name.
+entitiesTrie = {}
 for e in entities:
-    entitiesByFirstChar.setdefault(e[0], []).append(e)
+    node = entitiesTrie
+    for c in e:
+        node = node.setdefault(c, {})
+    node[""] = e
+
+# Canonical string objects for tag and attribute names. Tokens, and the tree
+# nodes built from them, then share a single string for each name, and
+# looking names up in the sets in constants is quicker when they are the very
+# strings those sets hold. loweredNames maps each spelling of a name that has
+# been seen to the canonical lowercase one. The tables stop growing at
+# maxInternedNames entries, so documents full of made up names can't make
+# them grow without bound.
+internedNames = {}
+for names in (voidElements, scopingElements, formattingElements,
+              specialElements, cdataElements, rcdataElements, headingElements,
+              tableInsertModeElements, booleanAttributes):
+    for name in names:
+        internedNames[name] = name
+for names in booleanAttributes.values():
+    for name in names:
+        internedNames[name] = name
+loweredNames = dict(internedNames)
+maxInternedNames = 10000
+
+def internName(name):
+    """Return the canonical string object for name"""
+    try:
+        return internedNames[name]
+    except KeyError:
+        if len(internedNames) < maxInternedNames:
+            internedNames[name] = name
+        return name
+
+def internLowerName(name):
+    """Return the canonical string object for name in lowercase"""
+    try:
+        return loweredNames[name]
+    except KeyError:
+        lowered = internName(name.translate(asciiUpper2Lower))
+        if len(loweredNames) < maxInternedNames:
+            loweredNames[name] = lowered
+        return lowered
+
+# Patterns used by the bulk scanning states. They only match well-formed
+# markup that lies entirely within the current chunk of the input stream; any
+# other input is left to the character-by-character states, which take care
+# of error reporting and recovery.
+_spaces = r"\t\n\x0c\r "
+spaceCharactersString = "".join(spaceCharacters)
+# What can follow the name of an end tag in CDATA and RCDATA
+endTagFollowers = spaceCharacters | frozenset((">", "/"))
+_attribute = (r"""[%(s)s]+(%(g)s[^%(s)s/>"'=]+)(?:[%(s)s]*=[%(s)s]*"""
+              r"""(?:"(%(g)s[^"&]*)"|'(%(g)s[^'&]*)'|(%(g)s[^%(s)s&>"'=]+)))?""")
+attributeRe = re.compile(_attribute % {"s": _spaces, "g": ""})
+startTagRe = re.compile(r"([a-zA-Z][^%s/>]*)((?:%s)*)[%s]*(/?)>" % (
+    _spaces, _attribute % {"s": _spaces, "g": "?:"}, _spaces))
+endTagRe = re.compile(r"/([a-zA-Z][^%(s)s/>]*)[%(s)s]*>" % {"s": _spaces})
+
+# Patterns for the characters that stop a run of CDATA or RCDATA text in
+# consumeRawTextBulk, by the name of the element the text is in
+rawTextStopRes = {}
+
+def rawTextStopRe(name):
+    """The pattern for a "&", or a "<" with what closeTagOpenState reads
+    after it when the text is in an element called name: the "/" and as
+    much of the name as follows it, and then the next three characters"""
+    try:
+        return rawTextStopRes[name]
+    except KeyError:
+        prefix = ""
+        for c in reversed(name or ""):
+            prefix = "(?:[%s%s]%s)?" % (re.escape(c), re.escape(c.upper()),
+                                        prefix)
+        pattern = re.compile(r"&|<(/%s)?(?=([\s\S]{3}|[\s\S]{0,2}\Z))" %
+                             prefix)
+        if len(rawTextStopRes) < maxInternedNames:
+            rawTextStopRes[name] = pattern
+        return pattern
 
 class HTMLTokenizer:
     """ This class takes care of tokenizing HTML.
@@ -32,12 +117,24 @@ class HTMLTokenizer:
     # XXX need to fix documentation
 
     def __init__(self, stream, encoding=None, parseMeta=True, useChardet=True,
-                 lowercaseElementName=True, lowercaseAttrName=True):
-        self.stream = HTMLInputStream(stream, encoding, parseMeta, useChardet)
+                 lowercaseElementName=True, lowercaseAttrName=True,
+                 bulkScan=True):
+        if isinstance(stream, HTMLInputStream):
+            self.stream = stream
+        else:
+            self.stream = HTMLInputStream(stream, encoding, parseMeta,
+                                          useChardet)
         
         #Perform case conversions?
         self.lowercaseElementName = lowercaseElementName
         self.lowercaseAttrName = lowercaseAttrName
+
+        #Scan well-formed tags and text in one go where possible?
+        self.bulkScan = bulkScan
+
+        #Queue ParseError tokens? The parser turns this off when it does not
+        #collect errors
+        self.reportErrors = True
         
         self.states = {
             "data":self.dataState,
@@ -74,8 +171,12 @@ class HTMLTokenizer:
             "doctypeSystemIdentifierDoubleQuoted":self.doctypeSystemIdentifierDoubleQuotedState,
             "doctypeSystemIdentifierSingleQuoted":self.doctypeSystemIdentifierSingleQuotedState,
             "afterDoctypeSystemIdentifier":self.afterDoctypeSystemIdentifierState,
-            "bogusDoctype":self.bogusDoctypeState
+            "bogusDoctype":self.bogusDoctypeState,
+            "textRun":self.textRunState
         }
+        if bulkScan:
+            self.states["data"] = self.dataStateBulk
+            self.states["tagOpen"] = self.tagOpenStateBulk
 
         # Setup the initial tokenizer state
         self.contentModelFlag = contentModelFlags["PCDATA"]
@@ -87,6 +188,13 @@ class HTMLTokenizer:
         # The current token being created
         self.currentToken = None
 
+        # Used by pushTokens: the run of text that has been cut short by the
+        # end of the data fed so far, the pieces of the text of the comment
+        # being read, and the position of the token last handed out
+        self.textRun = None
+        self.commentParts = []
+        self.tokenPosition = None
+
     def __iter__(self):
         """ This is where the magic happens.
 
@@ -95,18 +203,138 @@ class HTMLTokenizer:
         is requested.
         """
         self.tokenQueue = deque([])
+        if isinstance(self.stream, HTMLPushInputStream):
+            for token in self.pushTokens():
+                yield token
+            return
+        stream = self.stream
         # Start processing. When EOF is reached self.state will return False
         # instead of True and the loop will terminate.
         while self.state():
-            while self.stream.errors:
-                yield {"type": tokenTypes["ParseError"], "data": self.stream.errors.pop(0)}
+            if stream.errors:
+                for token in self.streamErrors():
+                    yield token
             while self.tokenQueue:
                 yield self.tokenQueue.popleft()
+        if stream.errors:
+            for token in self.streamErrors():
+                yield token
+
+    def streamErrors(self):
+        """Hand out the errors the stream has found in the characters read
+        so far, each at its own position"""
+        stream = self.stream
+        errors = stream.errors
+        offset = stream.offset()
+        while errors and errors[0][0] < offset:
+            errorOffset, self.tokenPosition, errorcode = errors.popleft()
+            yield Token(tokenTypes["ParseError"], errorcode)
+        self.tokenPosition = None
+
+    def pushTokens(self):
+        """ Tokenize as much of the data fed to a HTMLPushInputStream as
+        possible, pausing when the stream runs out of data.
+
+        The stream can run out in the middle of a tag, an entity, a comment
+        or a run of text. So the stream position, and the state kept from
+        one token to the next, are marked whenever the data state or one of
+        the states inside a comment is entered, and tokens are held back
+        until the next mark. When the stream runs out, the tokenizer goes back to the last
+        mark and throws away everything after it; it is tokenized again when
+        this is next called.
+
+        Text and comments can be long, and are not read again from their
+        start: the text of the comment read up to a mark is set aside in
+        commentParts, and a run of text that reaches the end of the data is
+        held in textRun and carried on by the textRun state.
+
+        Since the tokens are handed out later than the stream reads them,
+        the position of each token is kept with it for position().
+        """
+        dataState = self.states["data"]
+        textRunState = self.states["textRun"]
+        # The states inside a comment that reading can go on from
+        commentStates = (self.states["comment"], self.states["commentEndDash"],
+                         self.states["commentEnd"])
+        textTypes = (tokenTypes["Characters"], tokenTypes["SpaceCharacters"])
+        stream = self.stream
+        tokens = []
+        streamErrors = []
+        while True:
+            if (self.state is dataState or self.state is textRunState or
+                self.state in commentStates):
+                # The parser may change the content model flag when it
+                # processes these tokens, so mark only after yielding them
+                for token, self.tokenPosition in tokens:
+                    yield token
+                tokens = []
+                streamErrors = []
+                if self.state in commentStates and self.currentToken.data:
+                    self.commentParts.append(self.currentToken.data)
+                    self.currentToken.data = ""
+                stream.mark()
+                mark = (self.state, self.contentModelFlag, self.escapeFlag,
+                        self.lastFourChars[:])
+            stream.ranOut = False
+            try:
+                more = self.state()
+            except NeedDataException:
+                stream.rewind()
+                (self.state, self.contentModelFlag, self.escapeFlag,
+                 self.lastFourChars) = mark
+                if self.state in commentStates:
+                    self.currentToken.data = ""
+                # The errors in what is read again are handed out then
+                stream.errors.extendleft(reversed(streamErrors))
+                self.tokenQueue.clear()
+                self.tokenPosition = None
+                return
+            if (stream.ranOut and self.state is dataState and
+                self.tokenQueue and self.tokenQueue[-1].type in textTypes):
+                # The text may go on in data not fed yet
+                token = self.tokenQueue.pop()
+                self.textRun = (token, [token.data], stream.lastCharsUntil)
+                self.state = textRunState
+            if stream.reportErrors:
+                position = stream.position()
+            else:
+                position = None
+            errors = stream.errors
+            offset = stream.offset()
+            while errors and errors[0][0] < offset:
+                error = errors.popleft()
+                streamErrors.append(error)
+                tokens.append((Token(tokenTypes["ParseError"], error[2]),
+                               error[1]))
+            for token in self.tokenQueue:
+                if self.commentParts and token is self.currentToken:
+                    token.data = "".join(self.commentParts) + token.data
+                    self.commentParts = []
+                tokens.append((token, position))
+            self.tokenQueue.clear()
+            if not more:
+                for token, self.tokenPosition in tokens:
+                    yield token
+                self.tokenPosition = None
+                return
+
+    def position(self):
+        """Return (line, col) of the token being handed out: where the
+        stream was when it was read"""
+        if self.tokenPosition is not None:
+            return self.tokenPosition
+        return self.stream.position()
+
+    def parseError(self, errorcode, **kwargs):
+        """Queue a ParseError token, unless nothing is listening for them"""
+        if self.reportErrors:
+            self.tokenQueue.append(Token(tokenTypes["ParseError"], errorcode,
+                                         **kwargs))
 
     def consumeNumberEntity(self, isHex):
         """This function returns either U+FFFD or the character based on the
         decimal or hexadecimal representation. It also discards ";" if present.
-        If not present self.tokenQueue.append({"type": tokenTypes["ParseError"]}) is invoked.
+        If not present a ParseError token is queued.
         """
 
         allowed = digits
@@ -128,14 +356,12 @@ class HTMLTokenizer:
         charAsInt = int("".join(charStack), radix)
 
         if charAsInt == 13:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "incorrect-cr-newline-entity"})
+            self.parseError("incorrect-cr-newline-entity")
             charAsInt = 10
         elif 127 < charAsInt < 160:
             # If the integer is between 127 and 160 (so 128 and bigger and 159
             # and smaller) we need to do the "windows trick".
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "illegal-windows-1252-entity"})
+            self.parseError("illegal-windows-1252-entity")
 
             charAsInt = entitiesWindows1252[charAsInt - 128]
 
@@ -146,9 +372,9 @@ class HTMLTokenizer:
          or (charAsInt & 0xFFFE == 0xFFFE) # catch all U+?FFFE and U+?FFFF, where ? is 0..10
          or (0x10FFFF < charAsInt)):
             char = "\uFFFD"
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
+            self.parseError(
               "illegal-codepoint-for-numeric-entity",
-              "datavars": {"charAsInt": charAsInt}})
+              datavars={"charAsInt": charAsInt})
         else:
             try:
                 # XXX We should have a separate function that does "int" to
@@ -159,15 +385,14 @@ class HTMLTokenizer:
                 try:
                     char = eval("u'\\U%08x'" % charAsInt)
                 except:
-                    self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
+                    self.parseError(
                       "cant-convert-numeric-entity",
-                      "datavars": {"charAsInt": charAsInt}})
+                      datavars={"charAsInt": charAsInt})
 
         # Discard the ; if present. Otherwise, put it back on the queue and
         # invoke parseError on parser.
         if c != ";":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "numeric-entity-without-semicolon"})
+            self.parseError("numeric-entity-without-semicolon")
             self.stream.unget(c)
 
         return char
@@ -197,8 +422,7 @@ class HTMLTokenizer:
                 output = self.consumeNumberEntity(hex)
             else:
                 # No digits found
-                self.tokenQueue.append({"type": tokenTypes["ParseError"],
-                    "data": "expected-numeric-entity"})
+                self.parseError("expected-numeric-entity")
                 self.stream.unget(charStack.pop())
                 output = "&" + "".join(charStack)
 
@@ -206,33 +430,21 @@ class HTMLTokenizer:
             # At this point in the process might have named entity. Entities
             # are stored in the global variable "entities".
             #
-            # Consume characters and compare to these to a substring of the
-            # entity names in the list until the substring no longer matches.
-            filteredEntityList = entitiesByFirstChar.get(charStack[0], [])
-
-            def entitiesStartingWith(name):
-                return [e for e in filteredEntityList if e.startswith(name)]
-
-            while charStack[-1] is not EOF and\
-              entitiesStartingWith("".join(charStack)):
-                charStack.append(self.stream.char())
-
-            # At this point we have a string that starts with some characters
-            # that may match an entity
+            # Walk down the prefix tree of entity names while the consumed
+            # characters still match, remembering the longest complete entity
+            # name seen on the way to take care of &noti for instance.
             entityName = None
-
-            # Try to find the longest entity the string will match to take care
-            # of &noti for instance.
-            for entityLength in range(len(charStack)-1, 1, -1):
-                possibleEntityName = "".join(charStack[:entityLength])
-                if possibleEntityName in entities:
-                    entityName = possibleEntityName
-                    break
+            node = entitiesTrie
+            while charStack[-1] is not EOF and charStack[-1] in node:
+                node = node[charStack[-1]]
+                if "" in node:
+                    entityName = node[""]
+                    entityLength = len(charStack)
+                charStack.append(self.stream.char())
 
             if entityName is not None:
                 if entityName[-1] != ";":
-                    self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-                      "named-entity-without-semicolon"})
+                    self.parseError("named-entity-without-semicolon")
                 if entityName[-1] != ";" and fromAttribute and \
                   (charStack[entityLength] in asciiLetters
                   or charStack[entityLength] in digits):
@@ -243,15 +455,14 @@ class HTMLTokenizer:
                     self.stream.unget(charStack.pop())
                     output += "".join(charStack[entityLength:])
             else:
-                self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-                  "expected-named-entity"})
+                self.parseError("expected-named-entity")
                 self.stream.unget(charStack.pop())
                 output = "&" + "".join(charStack)
 
         if fromAttribute:
-            self.currentToken["data"][-1][1] += output
+            self.currentToken.data[-1][1] += output
         else:
-            self.tokenQueue.append({"type": tokenTypes["Characters"], "data": output})
+            self.tokenQueue.append(Token(tokenTypes["Characters"], output))
 
     def processEntityInAttribute(self, allowedChar):
         """This method replaces the need for "entityInAttributeValueState".
@@ -265,17 +476,17 @@ class HTMLTokenizer:
         """
         token = self.currentToken
         # Add token to the queue to be yielded
-        if (token["type"] in (tokenTypes["StartTag"], tokenTypes["EndTag"], 
+        if (token.type in (tokenTypes["StartTag"], tokenTypes["EndTag"], 
                               tokenTypes["EmptyTag"])):
             if self.lowercaseElementName:
-                token["name"] = token["name"].translate(asciiUpper2Lower)
-            if token["type"] == tokenTypes["EndTag"]:
-                if token["data"]:
-                    self.tokenQueue.append({"type":tokenTypes["ParseError"],
-                                            "data":"attributes-in-end-tag"})
-                if token["selfClosing"]:
-                    self.tokenQueue.append({"type":tokenTypes["ParseError"],
-                                            "data":"self-closing-flag-on-end-tag"})
+                token.name = internLowerName(token.name)
+            else:
+                token.name = internName(token.name)
+            if token.type == tokenTypes["EndTag"]:
+                if token.data:
+                    self.parseError("attributes-in-end-tag")
+                if token.selfClosing:
+                    self.parseError("self-closing-flag-on-end-tag")
         self.tokenQueue.append(token)
         self.state = self.states["data"]
 
@@ -302,8 +513,8 @@ class HTMLTokenizer:
               (contentModelFlags["CDATA"], contentModelFlags["RCDATA"]) and 
               not self.escapeFlag and "".join(self.lastFourChars) == "<!--"):
             self.escapeFlag = True
-            self.tokenQueue.append({"type": tokenTypes["Characters"], 
-                                    "data":data})
+            self.tokenQueue.append(Token(tokenTypes["Characters"],
+                                          data))
         elif (data == "<" and (self.contentModelFlag == 
                                contentModelFlags["PCDATA"]
                                or (self.contentModelFlag in
@@ -315,7 +526,7 @@ class HTMLTokenizer:
               (contentModelFlags["CDATA"], contentModelFlags["RCDATA"]) and
               self.escapeFlag and "".join(self.lastFourChars)[1:] == "-->"):
             self.escapeFlag = False
-            self.tokenQueue.append({"type": tokenTypes["Characters"], "data":data})
+            self.tokenQueue.append(Token(tokenTypes["Characters"], data))
         elif data is EOF:
             # Tokenization ends.
             return False
@@ -323,8 +534,8 @@ class HTMLTokenizer:
             # Directly after emitting a token you switch back to the "data
             # state". At that point spaceCharacters are important so they are
             # emitted separately.
-            self.tokenQueue.append({"type": tokenTypes["SpaceCharacters"], "data":
-              data + self.stream.charsUntil(spaceCharacters, True)})
+            self.tokenQueue.append(Token(tokenTypes["SpaceCharacters"],
+              data + self.stream.charsUntil(spaceCharacters, True)))
             # No need to update lastFourChars here, since the first space will
             # have already been appended to lastFourChars and will have broken
             # any <!-- or --> sequences
@@ -336,8 +547,223 @@ class HTMLTokenizer:
                 self.lastFourChars = self.lastFourChars[-4:]
             else:
                 chars = self.stream.charsUntil(("&", "<"))
-            self.tokenQueue.append({"type": tokenTypes["Characters"], "data": 
-              data + chars})
+            self.tokenQueue.append(Token(tokenTypes["Characters"],
+              data + chars))
+        return True
+
+    def dataStateBulk(self):
+        # The data state specialised for PCDATA content, which is where
+        # nearly all of a document is spent, and for runs of plain CDATA and
+        # RCDATA text
+        if self.contentModelFlag != contentModelFlags["PCDATA"]:
+            if (self.contentModelFlag == contentModelFlags["PLAINTEXT"] or
+                not self.consumeRawTextBulk()):
+                return self.dataState()
+            return True
+
+        data = self.stream.char()
+        if data == "<":
+            if not self.consumeTagBulk():
+                self.state = self.states["tagOpen"]
+        elif data == "&":
+            self.state = self.states["entityData"]
+        elif data is EOF:
+            # Tokenization ends.
+            return False
+        elif data in spaceCharacters:
+            self.tokenQueue.append(Token(tokenTypes["SpaceCharacters"],
+              data + self.stream.charsUntil(spaceCharacters, True)))
+        else:
+            self.tokenQueue.append(Token(tokenTypes["Characters"],
+              data + self.stream.charsUntil(("&", "<"))))
+        return True
+
+    def tagOpenStateBulk(self):
+        if (self.contentModelFlag != contentModelFlags["PCDATA"] or
+            not self.consumeTagBulk()):
+            return self.tagOpenState()
+        return True
+
+    def consumeTagBulk(self):
+        """Try to read a whole well-formed start or end tag, the opening "<"
+        having already been consumed. Returns False, leaving the stream
+        untouched, if the tag needs the character-by-character states.
+        """
+        match = self.stream.matchChunk(startTagRe)
+        if match is not None:
+            name, attributes, selfClosing = match.groups()
+            data = []
+            if attributes:
+                seen = set()
+                for attribute in attributeRe.finditer(attributes):
+                    attrName = attribute.group(1)
+                    if self.lowercaseAttrName:
+                        attrName = internLowerName(attrName)
+                    else:
+                        attrName = internName(attrName)
+                    if attrName in seen:
+                        # Let the slow path report the duplicate attribute
+                        return False
+                    seen.add(attrName)
+                    value = [v for v in attribute.groups()[1:] if v is not None]
+                    data.append([attrName, value and value[0] or ""])
+            self.currentToken = Token(tokenTypes["StartTag"], data,
+                                      name=name,
+                                      selfClosing=bool(selfClosing),
+                                      selfClosingAcknowledged=False)
+        else:
+            match = self.stream.matchChunk(endTagRe)
+            if match is None:
+                return False
+            self.currentToken = Token(tokenTypes["EndTag"], [],
+                                      name=match.group(1), selfClosing=False)
+        self.stream.consumeMatch(match)
+        self.emitCurrentToken()
+        return True
+
+    def consumeRawTextBulk(self):
+        """Try to read a run of CDATA or RCDATA text as a single token, up to
+        the end tag of the element it is in, the "<!--" and "-->" escapes,
+        a character reference that is a parse error, or the end of the
+        chunk. Returns False, having read nothing, if the next character
+        needs the character-by-character data state.
+
+        Characters are added to lastFourChars as the data state would add
+        them, which leaves out what closeTagOpenState reads after a "<" and
+        what a character reference is made of.
+        """
+        for c in self.lastFourChars:
+            # Part of an escape may have been read already
+            if c in ("<", "!", "-"):
+                return False
+        stream = self.stream
+        if self.escapeFlag:
+            chars = stream.charsUntil(("-",))
+            if not chars:
+                return False
+            self.lastFourChars += chars[-4:]
+            self.lastFourChars = self.lastFourChars[-4:]
+            self.emitRawText(chars)
+            return True
+
+        if self.contentModelFlag == contentModelFlags["RCDATA"]:
+            stops = ("&", "<")
+        else:
+            stops = ("<",)
+        if self.currentToken:
+            name = self.currentToken.name.lower()
+        else:
+            name = None
+        stopRe = rawTextStopRe(name)
+        # The text read, and the characters the data state would have added
+        # to lastFourChars, in pieces
+        parts = []
+        added = []
+        while True:
+            chars = stream.charsUntil(stops)
+            if chars:
+                added.append(chars)
+                if len(added) == 1:
+                    # The text starts here, and leading space characters are
+                    # kept apart
+                    text = chars.lstrip(spaceCharactersString)
+                    if len(text) < len(chars):
+                        self.tokenQueue.append(Token(
+                            tokenTypes["SpaceCharacters"],
+                            chars[:len(chars) - len(text)]))
+                    chars = text
+                parts.append(chars)
+            if stream.ranOut:
+                break
+            match = stream.matchChunk(stopRe)
+            if match is None:
+                break
+            if match.group() == "&":
+                stream.consumeMatch(match)
+                added.append("&")
+                queued = len(self.tokenQueue)
+                self.consumeEntity()
+                entity = self.tokenQueue.pop()
+                if len(self.tokenQueue) == queued:
+                    parts.append(entity.data)
+                    continue
+                # The errors are reported after the text before the
+                # character reference, at the position after it
+                errors = []
+                while len(self.tokenQueue) > queued:
+                    errors.append(self.tokenQueue.pop())
+                errors.reverse()
+                text = "".join(parts)
+                if text:
+                    self.tokenQueue.append(Token(tokenTypes["Characters"],
+                                                 text))
+                self.tokenQueue.extend(errors)
+                self.tokenQueue.append(entity)
+                parts = None
+                break
+            slashName, following = match.groups()
+            if (name is not None and slashName is not None and
+                len(slashName) == len(name) + 1 and following and
+                following[0] in endTagFollowers):
+                # The end tag of the element
+                break
+            if len(following) < 3 or following == "!--":
+                # The chunk ends too soon to tell, or "<!--" starts
+                break
+            stream.consumeMatch(match)
+            parts.append(match.group())
+            added.append("<")
+        if not added:
+            return False
+        if parts is not None:
+            text = "".join(parts)
+            if text:
+                self.tokenQueue.append(Token(tokenTypes["Characters"], text))
+        if added:
+            self.lastFourChars += "".join(added[-4:])[-4:]
+            self.lastFourChars = self.lastFourChars[-4:]
+        return True
+
+    def emitRawText(self, chars):
+        # Leading space characters are kept apart, as the data state does,
+        # since e.g. a newline at the start of a textarea is dropped
+        text = chars.lstrip(spaceCharactersString)
+        if len(text) < len(chars):
+            self.tokenQueue.append(Token(tokenTypes["SpaceCharacters"],
+                                         chars[:len(chars) - len(text)]))
+        if text:
+            self.tokenQueue.append(Token(tokenTypes["Characters"], text))
+
+    def textRunState(self):
+        # Go on with the run of text in self.textRun, which was cut short by
+        # the end of the data fed to a HTMLPushInputStream, reading the same
+        # characters as the state that started it
+        token, parts, (characters, opposite) = self.textRun
+        chars = self.stream.charsUntil(characters, opposite)
+        if self.stream.ranOut and not chars:
+            raise NeedDataException
+        if (self.contentModelFlag in
+            (contentModelFlags["CDATA"], contentModelFlags["RCDATA"])):
+            self.lastFourChars += chars[-4:]
+            self.lastFourChars = self.lastFourChars[-4:]
+        if token.type == tokenTypes["SpaceCharacters"]:
+            # Only raw text has anything but space characters after them,
+            # which starts a token of its own
+            text = chars.lstrip(spaceCharactersString)
+            parts.append(chars[:len(chars) - len(text)])
+            if text:
+                token.data = "".join(parts)
+                self.tokenQueue.append(token)
+                token = Token(tokenTypes["Characters"], text)
+                parts = [text]
+                self.textRun = (token, parts, (characters, opposite))
+        else:
+            parts.append(chars)
+        if not self.stream.ranOut:
+            token.data = "".join(parts)
+            self.tokenQueue.append(token)
+            self.textRun = None
+            self.state = self.states["data"]
         return True
 
     def entityDataState(self):
@@ -353,30 +779,26 @@ class HTMLTokenizer:
             elif data == "/":
                 self.state = self.states["closeTagOpen"]
             elif data in asciiLetters:
-                self.currentToken = {"type": tokenTypes["StartTag"], 
-                                     "name": data, "data": [],
-                                     "selfClosing": False,
-                                     "selfClosingAcknowledged": False}
+                self.currentToken = Token(tokenTypes["StartTag"], [],
+                                          name=data, selfClosing=False,
+                                          selfClosingAcknowledged=False)
                 self.state = self.states["tagName"]
             elif data == ">":
                 # XXX In theory it could be something besides a tag name. But
                 # do we really care?
-                self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-                  "expected-tag-name-but-got-right-bracket"})
-                self.tokenQueue.append({"type": tokenTypes["Characters"], "data": "<>"})
+                self.parseError("expected-tag-name-but-got-right-bracket")
+                self.tokenQueue.append(Token(tokenTypes["Characters"], "<>"))
                 self.state = self.states["data"]
             elif data == "?":
                 # XXX In theory it could be something besides a tag name. But
                 # do we really care?
-                self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-                  "expected-tag-name-but-got-question-mark"})
+                self.parseError("expected-tag-name-but-got-question-mark")
                 self.stream.unget(data)
                 self.state = self.states["bogusComment"]
             else:
                 # XXX
-                self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-                  "expected-tag-name"})
-                self.tokenQueue.append({"type": tokenTypes["Characters"], "data": "<"})
+                self.parseError("expected-tag-name")
+                self.tokenQueue.append(Token(tokenTypes["Characters"], "<"))
                 self.stream.unget(data)
                 self.state = self.states["data"]
         else:
@@ -386,7 +808,7 @@ class HTMLTokenizer:
             if data == "/":
                 self.state = self.states["closeTagOpen"]
             else:
-                self.tokenQueue.append({"type": tokenTypes["Characters"], "data": "<"})
+                self.tokenQueue.append(Token(tokenTypes["Characters"], "<"))
                 self.stream.unget(data)
                 self.state = self.states["data"]
         return True
@@ -401,7 +823,7 @@ class HTMLTokenizer:
                 # whether the next few characters match the name of last emitted
                 # start tag which also happens to be the currentToken.
                 matched = True
-                for expected in self.currentToken["name"].lower():
+                for expected in self.currentToken.name.lower():
                     charStack.append(self.stream.char())
                     if charStack[-1] not in (expected, expected.upper()):
                         matched = False
@@ -417,10 +839,9 @@ class HTMLTokenizer:
                         # in the next state
                         self.stream.unget(charStack.pop())
                         # The remaining characters in charStack are the tag name
-                        self.currentToken = {"type": tokenTypes["EndTag"],
-                                             "name": "".join(charStack), 
-                                             "data": [],
-                                             "selfClosing":False}
+                        self.currentToken = Token(tokenTypes["EndTag"], [],
+                                                  name="".join(charStack),
+                                                  selfClosing=False)
                         self.state = self.states["tagName"]
                         return True
 
@@ -431,29 +852,27 @@ class HTMLTokenizer:
             # The remaining characters are a prefix of the tag name, so they're
             # just letters and digits, so they can be output as character
             # tokens immediately
-            self.tokenQueue.append({"type": tokenTypes["Characters"], "data": "</" + "".join(charStack)})
+            self.tokenQueue.append(Token(tokenTypes["Characters"], "</" + "".join(charStack)))
             self.state = self.states["data"]
             return True
 
         data = self.stream.char()
         if data in asciiLetters:
-            self.currentToken = {"type": tokenTypes["EndTag"], "name": data,
-                                 "data": [], "selfClosing":False}
+            self.currentToken = Token(tokenTypes["EndTag"], [],
+                                      name=data, selfClosing=False)
             self.state = self.states["tagName"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "expected-closing-tag-but-got-right-bracket"})
+            self.parseError("expected-closing-tag-but-got-right-bracket")
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "expected-closing-tag-but-got-eof"})
-            self.tokenQueue.append({"type": tokenTypes["Characters"], "data": "</"})
+            self.parseError("expected-closing-tag-but-got-eof")
+            self.tokenQueue.append(Token(tokenTypes["Characters"], "</"))
             self.state = self.states["data"]
         else:
             # XXX data can be _'_...
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
+            self.parseError(
               "expected-closing-tag-but-got-char",
-              "datavars": {"data": data}})
+              datavars={"data": data})
             self.stream.unget(data)
             self.state = self.states["bogusComment"]
         return True
@@ -465,13 +884,12 @@ class HTMLTokenizer:
         elif data == ">":
             self.emitCurrentToken()
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-tag-name"})
+            self.parseError("eof-in-tag-name")
             self.emitCurrentToken()
         elif data == "/":
             self.state = self.states["selfClosingStartTag"]
         else:
-            self.currentToken["name"] += data
+            self.currentToken.name += data
             # (Don't use charsUntil here, because tag names are
             # very short and it's faster to not do anything fancy)
         return True
@@ -481,23 +899,21 @@ class HTMLTokenizer:
         if data in spaceCharacters:
             self.stream.charsUntil(spaceCharacters, True)
         elif data in asciiLetters:
-            self.currentToken["data"].append([data, ""])
+            self.currentToken.data.append([data, ""])
             self.state = self.states["attributeName"]
         elif data == ">":
             self.emitCurrentToken()
         elif data == "/":
             self.state = self.states["selfClosingStartTag"]
         elif data == "'" or data == '"' or data == "=":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "invalid-character-in-attribute-name"})
-            self.currentToken["data"].append([data, ""])
+            self.parseError("invalid-character-in-attribute-name")
+            self.currentToken.data.append([data, ""])
             self.state = self.states["attributeName"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "expected-attribute-name-but-got-eof"})
+            self.parseError("expected-attribute-name-but-got-eof")
             self.emitCurrentToken()
         else:
-            self.currentToken["data"].append([data, ""])
+            self.currentToken.data.append([data, ""])
             self.state = self.states["attributeName"]
         return True
 
@@ -508,7 +924,7 @@ class HTMLTokenizer:
         if data == "=":
             self.state = self.states["beforeAttributeValue"]
         elif data in asciiLetters:
-            self.currentToken["data"][-1][0] += data +\
+            self.currentToken.data[-1][0] += data +\
               self.stream.charsUntil(asciiLetters, True)
             leavingThisState = False
         elif data == ">":
@@ -521,17 +937,15 @@ class HTMLTokenizer:
         elif data == "/":
             self.state = self.states["selfClosingStartTag"]
         elif data == "'" or data == '"':
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "invalid-character-in-attribute-name"})
-            self.currentToken["data"][-1][0] += data
+            self.parseError("invalid-character-in-attribute-name")
+            self.currentToken.data[-1][0] += data
             leavingThisState = False
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-attribute-name"})
+            self.parseError("eof-in-attribute-name")
             self.state = self.states["data"]
             emitToken = True
         else:
-            self.currentToken["data"][-1][0] += data
+            self.currentToken.data[-1][0] += data
             leavingThisState = False
 
         if leavingThisState:
@@ -539,12 +953,14 @@ class HTMLTokenizer:
             # start tag token is emitted so values can still be safely appended
             # to attributes, but we do want to report the parse error in time.
             if self.lowercaseAttrName:
-                self.currentToken["data"][-1][0] = (
-                    self.currentToken["data"][-1][0].translate(asciiUpper2Lower))
-            for name, value in self.currentToken["data"][:-1]:
-                if self.currentToken["data"][-1][0] == name:
-                    self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-                      "duplicate-attribute"})
+                self.currentToken.data[-1][0] = (
+                    internLowerName(self.currentToken.data[-1][0]))
+            else:
+                self.currentToken.data[-1][0] = (
+                    internName(self.currentToken.data[-1][0]))
+            for name, value in self.currentToken.data[:-1]:
+                if self.currentToken.data[-1][0] == name:
+                    self.parseError("duplicate-attribute")
                     break
             # XXX Fix for above XXX
             if emitToken:
@@ -560,21 +976,19 @@ class HTMLTokenizer:
         elif data == ">":
             self.emitCurrentToken()
         elif data in asciiLetters:
-            self.currentToken["data"].append([data, ""])
+            self.currentToken.data.append([data, ""])
             self.state = self.states["attributeName"]
         elif data == "/":
             self.state = self.states["selfClosingStartTag"]
         elif data == "'" or data == '"':
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "invalid-character-after-attribute-name"})
-            self.currentToken["data"].append([data, ""])
+            self.parseError("invalid-character-after-attribute-name")
+            self.currentToken.data.append([data, ""])
             self.state = self.states["attributeName"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "expected-end-of-tag-but-got-eof"})
+            self.parseError("expected-end-of-tag-but-got-eof")
             self.emitCurrentToken()
         else:
-            self.currentToken["data"].append([data, ""])
+            self.currentToken.data.append([data, ""])
             self.state = self.states["attributeName"]
         return True
 
@@ -590,20 +1004,17 @@ class HTMLTokenizer:
         elif data == "'":
             self.state = self.states["attributeValueSingleQuoted"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "expected-attribute-value-but-got-right-bracket"})
+            self.parseError("expected-attribute-value-but-got-right-bracket")
             self.emitCurrentToken()
         elif data == "=":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "equals-in-unquoted-attribute-value"})
-            self.currentToken["data"][-1][1] += data
+            self.parseError("equals-in-unquoted-attribute-value")
+            self.currentToken.data[-1][1] += data
             self.state = self.states["attributeValueUnQuoted"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "expected-attribute-value-but-got-eof"})
+            self.parseError("expected-attribute-value-but-got-eof")
             self.emitCurrentToken()
         else:
-            self.currentToken["data"][-1][1] += data
+            self.currentToken.data[-1][1] += data
             self.state = self.states["attributeValueUnQuoted"]
         return True
 
@@ -614,11 +1025,10 @@ class HTMLTokenizer:
         elif data == "&":
             self.processEntityInAttribute('"')
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-attribute-value-double-quote"})
+            self.parseError("eof-in-attribute-value-double-quote")
             self.emitCurrentToken()
         else:
-            self.currentToken["data"][-1][1] += data +\
+            self.currentToken.data[-1][1] += data +\
               self.stream.charsUntil(("\"", "&"))
         return True
 
@@ -629,11 +1039,10 @@ class HTMLTokenizer:
         elif data == "&":
             self.processEntityInAttribute("'")
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-attribute-value-single-quote"})
+            self.parseError("eof-in-attribute-value-single-quote")
             self.emitCurrentToken()
         else:
-            self.currentToken["data"][-1][1] += data +\
+            self.currentToken.data[-1][1] += data +\
               self.stream.charsUntil(("'", "&"))
         return True
 
@@ -646,15 +1055,13 @@ class HTMLTokenizer:
         elif data == ">":
             self.emitCurrentToken()
         elif data == '"' or data == "'" or data == "=":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-character-in-unquoted-attribute-value"})
-            self.currentToken["data"][-1][1] += data
+            self.parseError("unexpected-character-in-unquoted-attribute-value")
+            self.currentToken.data[-1][1] += data
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-attribute-value-no-quotes"})
+            self.parseError("eof-in-attribute-value-no-quotes")
             self.emitCurrentToken()
         else:
-            self.currentToken["data"][-1][1] += data + self.stream.charsUntil( \
+            self.currentToken.data[-1][1] += data + self.stream.charsUntil( \
               frozenset(("&", ">", "<", "=", "'", '"')) | spaceCharacters)
         return True
 
@@ -667,14 +1074,12 @@ class HTMLTokenizer:
         elif data == "/":
             self.state = self.states["selfClosingStartTag"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-EOF-after-attribute-value"})
+            self.parseError("unexpected-EOF-after-attribute-value")
             self.emitCurrentToken()
             self.stream.unget(data)
             self.state = self.states["data"]
         else:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-character-after-attribute-value"})
+            self.parseError("unexpected-character-after-attribute-value")
             self.stream.unget(data)
             self.state = self.states["beforeAttributeName"]
         return True
@@ -682,18 +1087,15 @@ class HTMLTokenizer:
     def selfClosingStartTagState(self):
         data = self.stream.char()
         if data == ">":
-            self.currentToken["selfClosing"] = True
+            self.currentToken.selfClosing = True
             self.emitCurrentToken()
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], 
-                                    "data":
-                                        "unexpected-EOF-after-solidus-in-tag"})
+            self.parseError("unexpected-EOF-after-solidus-in-tag")
             self.emitCurrentToken()
             self.stream.unget(data)
             self.state = self.states["data"]
         else:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-character-after-soldius-in-tag"})
+            self.parseError("unexpected-character-after-soldius-in-tag")
             self.stream.unget(data)
             self.state = self.states["beforeAttributeName"]
         return True
@@ -703,7 +1105,7 @@ class HTMLTokenizer:
         # until the first > or EOF (charsUntil checks for EOF automatically)
         # and emit it.
         self.tokenQueue.append(
-          {"type": tokenTypes["Comment"], "data": self.stream.charsUntil(">")})
+          Token(tokenTypes["Comment"], self.stream.charsUntil(">")))
 
         # Eat the character directly after the bogus comment which is either a
         # ">" or an EOF.
@@ -714,7 +1116,7 @@ class HTMLTokenizer:
     def bogusCommentContinuationState(self):
         # Like bogusCommentState, but the caller must create the comment token
         # and this state just adds more characters to it
-        self.currentToken["data"] += self.stream.charsUntil(">")
+        self.currentToken.data += self.stream.charsUntil(">")
         self.tokenQueue.append(self.currentToken)
 
         # Eat the character directly after the bogus comment which is either a
@@ -728,7 +1130,7 @@ class HTMLTokenizer:
         if charStack[-1] == "-":
             charStack.append(self.stream.char())
             if charStack[-1] == "-":
-                self.currentToken = {"type": tokenTypes["Comment"], "data": ""}
+                self.currentToken = Token(tokenTypes["Comment"], "")
                 self.state = self.states["commentStart"]
                 return True
         elif charStack[-1] in ('d', 'D'):
@@ -740,21 +1142,20 @@ class HTMLTokenizer:
                     matched = False
                     break
             if matched:
-                self.currentToken = {"type": tokenTypes["Doctype"],
-                                     "name": "",
-                                     "publicId": None, "systemId": None, 
-                                     "correct": True}
+                self.currentToken = Token(tokenTypes["Doctype"],
+                                          name="",
+                                          publicId=None, systemId=None,
+                                          correct=True)
                 self.state = self.states["doctype"]
                 return True
 
-        self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-          "expected-dashes-or-doctype"})
+        self.parseError("expected-dashes-or-doctype")
         # charStack[:-2] consists of 'safe' characters ('-', 'd', 'o', etc)
         # so they can be copied directly into the bogus comment data, and only
         # the last character might be '>' or EOF and needs to be ungetted
         self.stream.unget(charStack.pop())
-        self.currentToken = {"type": tokenTypes["Comment"], 
-                             "data": "".join(charStack)}
+        self.currentToken = Token(tokenTypes["Comment"],
+                             "".join(charStack))
         self.state = self.states["bogusCommentContinuation"]
         return True
 
@@ -763,17 +1164,15 @@ class HTMLTokenizer:
         if data == "-":
             self.state = self.states["commentStartDash"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "incorrect-comment"})
+            self.parseError("incorrect-comment")
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-comment"})
+            self.parseError("eof-in-comment")
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["data"] += data + self.stream.charsUntil("-")
+            self.currentToken.data += data + self.stream.charsUntil("-")
             self.state = self.states["comment"]
         return True
     
@@ -782,17 +1181,15 @@ class HTMLTokenizer:
         if data == "-":
             self.state = self.states["commentEnd"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "incorrect-comment"})
+            self.parseError("incorrect-comment")
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-comment"})
+            self.parseError("eof-in-comment")
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["data"] += "-" + data + self.stream.charsUntil("-")
+            self.currentToken.data += "-" + data + self.stream.charsUntil("-")
             self.state = self.states["comment"]
         return True
 
@@ -802,12 +1199,11 @@ class HTMLTokenizer:
         if data == "-":
             self.state = self.states["commentEndDash"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-comment"})
+            self.parseError("eof-in-comment")
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["data"] += data + self.stream.charsUntil("-")
+            self.currentToken.data += data + self.stream.charsUntil("-")
         return True
 
     def commentEndDashState(self):
@@ -815,12 +1211,11 @@ class HTMLTokenizer:
         if data == "-":
             self.state = self.states["commentEnd"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-comment-end-dash"})
+            self.parseError("eof-in-comment-end-dash")
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["data"] += "-" + data +\
+            self.currentToken.data += "-" + data +\
               self.stream.charsUntil("-")
             # Consume the next character which is either a "-" or an EOF as
             # well so if there's a "-" directly after the "-" we go nicely to
@@ -834,19 +1229,16 @@ class HTMLTokenizer:
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data == "-":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-             "unexpected-dash-after-double-dash-in-comment"})
-            self.currentToken["data"] += data
+            self.parseError("unexpected-dash-after-double-dash-in-comment")
+            self.currentToken.data += data
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-comment-double-dash"})
+            self.parseError("eof-in-comment-double-dash")
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
             # XXX
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-char-in-comment"})
-            self.currentToken["data"] += "--" + data
+            self.parseError("unexpected-char-in-comment")
+            self.currentToken.data += "--" + data
             self.state = self.states["comment"]
         return True
 
@@ -855,8 +1247,7 @@ class HTMLTokenizer:
         if data in spaceCharacters:
             self.state = self.states["beforeDoctypeName"]
         else:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "need-space-after-doctype"})
+            self.parseError("need-space-after-doctype")
             self.stream.unget(data)
             self.state = self.states["beforeDoctypeName"]
         return True
@@ -866,40 +1257,37 @@ class HTMLTokenizer:
         if data in spaceCharacters:
             pass
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "expected-doctype-name-but-got-right-bracket"})
-            self.currentToken["correct"] = False
+            self.parseError("expected-doctype-name-but-got-right-bracket")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "expected-doctype-name-but-got-eof"})
-            self.currentToken["correct"] = False
+            self.parseError("expected-doctype-name-but-got-eof")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["name"] = data
+            self.currentToken.name = data
             self.state = self.states["doctypeName"]
         return True
 
     def doctypeNameState(self):
         data = self.stream.char()
         if data in spaceCharacters:
-            self.currentToken["name"] = self.currentToken["name"].translate(asciiUpper2Lower)
+            self.currentToken.name = self.currentToken.name.translate(asciiUpper2Lower)
             self.state = self.states["afterDoctypeName"]
         elif data == ">":
-            self.currentToken["name"] = self.currentToken["name"].translate(asciiUpper2Lower)
+            self.currentToken.name = self.currentToken.name.translate(asciiUpper2Lower)
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype-name"})
-            self.currentToken["correct"] = False
-            self.currentToken["name"] = self.currentToken["name"].translate(asciiUpper2Lower)
+            self.parseError("eof-in-doctype-name")
+            self.currentToken.correct = False
+            self.currentToken.name = self.currentToken.name.translate(asciiUpper2Lower)
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["name"] += data
+            self.currentToken.name += data
         return True
 
     def afterDoctypeNameState(self):
@@ -910,10 +1298,9 @@ class HTMLTokenizer:
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.currentToken["correct"] = False
+            self.currentToken.correct = False
             self.stream.unget(data)
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype"})
+            self.parseError("eof-in-doctype")
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
@@ -945,10 +1332,10 @@ class HTMLTokenizer:
             # discarded; only the latest character might be '>' or EOF
             # and needs to be ungetted
             self.stream.unget(data)
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-                "expected-space-or-right-bracket-in-doctype", "datavars":
-                {"data": data}})
-            self.currentToken["correct"] = False
+            self.parseError(
+                "expected-space-or-right-bracket-in-doctype",
+                datavars={"data": data})
+            self.currentToken.correct = False
             self.state = self.states["bogusDoctype"]
 
         return True
@@ -958,27 +1345,24 @@ class HTMLTokenizer:
         if data in spaceCharacters:
             pass
         elif data == "\"":
-            self.currentToken["publicId"] = ""
+            self.currentToken.publicId = ""
             self.state = self.states["doctypePublicIdentifierDoubleQuoted"]
         elif data == "'":
-            self.currentToken["publicId"] = ""
+            self.currentToken.publicId = ""
             self.state = self.states["doctypePublicIdentifierSingleQuoted"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-end-of-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("unexpected-end-of-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("eof-in-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-char-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("unexpected-char-in-doctype")
+            self.currentToken.correct = False
             self.state = self.states["bogusDoctype"]
         return True
 
@@ -987,19 +1371,17 @@ class HTMLTokenizer:
         if data == "\"":
             self.state = self.states["afterDoctypePublicIdentifier"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-end-of-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("unexpected-end-of-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("eof-in-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["publicId"] += data
+            self.currentToken.publicId += data
         return True
 
     def doctypePublicIdentifierSingleQuotedState(self):
@@ -1007,19 +1389,17 @@ class HTMLTokenizer:
         if data == "'":
             self.state = self.states["afterDoctypePublicIdentifier"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-end-of-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("unexpected-end-of-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("eof-in-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["publicId"] += data
+            self.currentToken.publicId += data
         return True
 
     def afterDoctypePublicIdentifierState(self):
@@ -1027,24 +1407,22 @@ class HTMLTokenizer:
         if data in spaceCharacters:
             pass
         elif data == "\"":
-            self.currentToken["systemId"] = ""
+            self.currentToken.systemId = ""
             self.state = self.states["doctypeSystemIdentifierDoubleQuoted"]
         elif data == "'":
-            self.currentToken["systemId"] = ""
+            self.currentToken.systemId = ""
             self.state = self.states["doctypeSystemIdentifierSingleQuoted"]
         elif data == ">":
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("eof-in-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-char-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("unexpected-char-in-doctype")
+            self.currentToken.correct = False
             self.state = self.states["bogusDoctype"]
         return True
     
@@ -1053,27 +1431,24 @@ class HTMLTokenizer:
         if data in spaceCharacters:
             pass
         elif data == "\"":
-            self.currentToken["systemId"] = ""
+            self.currentToken.systemId = ""
             self.state = self.states["doctypeSystemIdentifierDoubleQuoted"]
         elif data == "'":
-            self.currentToken["systemId"] = ""
+            self.currentToken.systemId = ""
             self.state = self.states["doctypeSystemIdentifierSingleQuoted"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-char-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("unexpected-char-in-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("eof-in-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-char-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("unexpected-char-in-doctype")
+            self.currentToken.correct = False
             self.state = self.states["bogusDoctype"]
         return True
 
@@ -1082,19 +1457,17 @@ class HTMLTokenizer:
         if data == "\"":
             self.state = self.states["afterDoctypeSystemIdentifier"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-end-of-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("unexpected-end-of-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("eof-in-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["systemId"] += data
+            self.currentToken.systemId += data
         return True
 
     def doctypeSystemIdentifierSingleQuotedState(self):
@@ -1102,19 +1475,17 @@ class HTMLTokenizer:
         if data == "'":
             self.state = self.states["afterDoctypeSystemIdentifier"]
         elif data == ">":
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-end-of-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("unexpected-end-of-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("eof-in-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.currentToken["systemId"] += data
+            self.currentToken.systemId += data
         return True
 
     def afterDoctypeSystemIdentifierState(self):
@@ -1125,14 +1496,12 @@ class HTMLTokenizer:
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         elif data is EOF:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "eof-in-doctype"})
-            self.currentToken["correct"] = False
+            self.parseError("eof-in-doctype")
+            self.currentToken.correct = False
             self.tokenQueue.append(self.currentToken)
             self.state = self.states["data"]
         else:
-            self.tokenQueue.append({"type": tokenTypes["ParseError"], "data":
-              "unexpected-char-in-doctype"})
+            self.parseError("unexpected-char-in-doctype")
             self.state = self.states["bogusDoctype"]
         return True
 
@@ -36,7 +36,8 @@ def getTreeBuilder(treeType, implementation=None, **kwargs):
     """Get a TreeBuilder class for various types of tree with built-in support
     
     treeType - the name of the tree type required (case-insensitive). Supported
-               values are "simpletree", "dom", "etree" and "beautifulsoup"
+               values are "simpletree", "dom", "etree", "beautifulsoup",
+               "null", "events" and "flat"
                
                "simpletree" - a built-in DOM-ish tree type with support for some
                               more pythonic idioms.
@@ -46,8 +47,16 @@ def getTreeBuilder(treeType, implementation=None, **kwargs):
                         builder called "dom" that was a minidom implemenation).
                 "etree" - A generic builder for tree implementations exposing an
                           elementtree-like interface (known to work with
-                          ElementTree, cElementTree and lxml.etree).
+                          ElementTree, cElementTree and lxml.etree). With
+                          native=True the tree is built directly out of the
+                          implementation's elements, see etree_native
                 "beautifulsoup" - Beautiful soup (if installed)
+                "null" - No tree at all, only the bookkeeping needed to find
+                         parse errors
+                "events" - A simpletree that is handed out piece by piece by
+                           HTMLParser.parseEvents
+                "flat" - The whole tree in a few arrays, with a node for each
+                         index
                
     implementation - (Currently applies to the "etree" and "dom" tree types). A
                       module implementing the tree type e.g.
@@ -69,6 +78,15 @@ def getTreeBuilder(treeType, implementation=None, **kwargs):
         elif treeType == "beautifulsoup":
             from . import soup
             treeBuilderCache[treeType] = soup.TreeBuilder
+        elif treeType == "null":
+            from . import null
+            treeBuilderCache[treeType] = null.TreeBuilder
+        elif treeType == "events":
+            from . import events
+            treeBuilderCache[treeType] = events.TreeBuilder
+        elif treeType == "flat":
+            from . import flat
+            treeBuilderCache[treeType] = flat.TreeBuilder
         elif treeType == "lxml":
             from . import etree_lxml
             treeBuilderCache[treeType] = etree_lxml.TreeBuilder
@@ -79,7 +97,10 @@ def getTreeBuilder(treeType, implementation=None, **kwargs):
                 except:
                     import xml.etree.ElementTree as etree
                 implementation = etree
-            from . import etree
+            if kwargs.pop("native", False):
+                from . import etree_native as etree
+            else:
+                from . import etree
             # XXX: NEVER cache here, caching is done in the etree submodule
             return etree.getETreeModule(implementation, **kwargs).TreeBuilder
     return treeBuilderCache.get(treeType)
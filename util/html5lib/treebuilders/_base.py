@@ -1,16 +1,124 @@
 #print(__name__)
 from html5lib import constants 
 from ..constants import scopingElements, tableInsertModeElements
+from ..utils import Token
 
 # The scope markers are inserted when entering buttons, object elements,
 # marquees, table cells, and table captions, and are used to prevent formatting
 # from "leaking" into tables, buttons, object elements, and marquees.
 Marker = None
 
+# The elements that end the scope looked at by elementInScope, without and
+# with tableVariant
+scopeBoundaryElements = scopingElements | frozenset(("table", "html"))
+tableScopeBoundaryElements = frozenset(("table", "html"))
+
+class ElementStack(list):
+    """The stack of open elements, indexed so that membership tests and
+    elementInScope take constant time however deep the stack is.
+
+    positions maps each tag name to the stack positions of the elements with
+    that name, and scopeBoundaries and tableScopeBoundaries hold the
+    positions of the elements that end a scope, all in increasing order.
+    Pushing and popping the top of the stack update the index as they go;
+    any other change to the stack, which only happens in rare cases like the
+    adoption agency algorithm, rebuilds it from scratch.
+    """
+
+    def __init__(self, elements=()):
+        list.__init__(self, elements)
+        self.reindex()
+
+    def reindex(self):
+        self.positions = {}
+        self.scopeBoundaries = []
+        self.tableScopeBoundaries = []
+        # Elements in the stack by id(), since nodes may not be hashable
+        self.counts = {}
+        for i, node in enumerate(self):
+            self._add(node, i)
+
+    def _add(self, node, i):
+        name = node.name
+        try:
+            self.positions[name].append(i)
+        except KeyError:
+            self.positions[name] = [i]
+        if name in scopeBoundaryElements:
+            self.scopeBoundaries.append(i)
+            if name in tableScopeBoundaryElements:
+                self.tableScopeBoundaries.append(i)
+        key = id(node)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _removeTop(self, node):
+        name = node.name
+        self.positions[name].pop()
+        if name in scopeBoundaryElements:
+            self.scopeBoundaries.pop()
+            if name in tableScopeBoundaryElements:
+                self.tableScopeBoundaries.pop()
+        key = id(node)
+        if self.counts[key] == 1:
+            del self.counts[key]
+        else:
+            self.counts[key] -= 1
+
+    def __contains__(self, node):
+        return id(node) in self.counts
+
+    def append(self, node):
+        self._add(node, len(self))
+        list.append(self, node)
+
+    def pop(self, i=-1):
+        if i == -1 or i == len(self) - 1:
+            node = list.pop(self)
+            self._removeTop(node)
+        else:
+            node = list.pop(self, i)
+            self.reindex()
+        return node
+
+    # Changes anywhere but at the top of the stack
+
+    def insert(self, i, node):
+        list.insert(self, i, node)
+        self.reindex()
+
+    def remove(self, node):
+        list.remove(self, node)
+        self.reindex()
+
+    def extend(self, nodes):
+        list.extend(self, nodes)
+        self.reindex()
+
+    def __setitem__(self, i, node):
+        list.__setitem__(self, i, node)
+        self.reindex()
+
+    def __delitem__(self, i):
+        list.__delitem__(self, i)
+        self.reindex()
+
+    def inScope(self, name, tableVariant=False):
+        """Whether an element called name is on the stack above the nearest
+        element that ends the scope, or is that element itself"""
+        positions = self.positions.get(name)
+        if not positions:
+            return False
+        if tableVariant:
+            boundaries = self.tableScopeBoundaries
+        else:
+            boundaries = self.scopeBoundaries
+        return not boundaries or positions[-1] >= boundaries[-1]
+
 #XXX - TODO; make the default interface more ElementTree-like
 #            rather than DOM-like
 
 class Node(object):
+    __slots__ = ()
     def __init__(self, name):
         """Node representing an item in the tree.
         name - The tag name associated with the node
@@ -116,7 +224,7 @@ class TreeBuilder(object):
         self.reset()
     
     def reset(self):
-        self.openElements = []
+        self.openElements = ElementStack()
         self.activeFormattingElements = []
 
         #XXX - rename these to headElement, formElement
@@ -128,20 +236,7 @@ class TreeBuilder(object):
         self.document = self.documentClass()
 
     def elementInScope(self, target, tableVariant=False):
-        # Exit early when possible.
-        if self.openElements[-1].name == target:
-            return True
-
-        for node in reversed(self.openElements):
-            if node.name == target:
-                return True
-            elif node.name == "table":
-                return False
-            elif not tableVariant and node.name in scopingElements:
-                return False
-            elif node.name == "html":
-                return False
-        assert False # We should never reach this point
+        return self.openElements.inScope(target, tableVariant)
 
     def reconstructActiveFormattingElements(self):
         # Within this algorithm the order of steps described in the
@@ -176,10 +271,9 @@ class TreeBuilder(object):
             clone = self.activeFormattingElements[i].cloneNode()
 
             # Step 9
-            element = self.insertElement({"type":"StartTag", 
-                                          "name":clone.name, 
-                                          "namespace":clone.namespace, 
-                                          "data":clone.attributes})
+            element = self.insertElement(Token("StartTag", clone.attributes,
+                                               name=clone.name,
+                                               namespace=clone.namespace))
 
             # Step 10
             self.activeFormattingElements[i] = element
@@ -198,7 +292,7 @@ class TreeBuilder(object):
         formatting elements and the last marker. If it does, return it, else
         return false"""
 
-        for item in self.activeFormattingElements[::-1]:
+        for item in reversed(self.activeFormattingElements):
             # Check for Marker first because if it's a Marker it doesn't have a
             # name attribute.
             if item == Marker:
@@ -213,9 +307,9 @@ class TreeBuilder(object):
         self.document.appendChild(element)
 
     def insertDoctype(self, token):
-        name = token["name"]
-        publicId = token["publicId"]
-        systemId = token["systemId"]
+        name = token.name
+        publicId = token.publicId
+        systemId = token.systemId
 
         doctype = self.doctypeClass(name, publicId, systemId)
         self.document.appendChild(doctype)
@@ -223,14 +317,14 @@ class TreeBuilder(object):
     def insertComment(self, token, parent=None):
         if parent is None:
             parent = self.openElements[-1]
-        parent.appendChild(self.commentClass(token["data"]))
+        parent.appendChild(self.commentClass(token.data))
                            
     def createElement(self, token):
         """Create an element but don't insert it anywhere"""
-        name = token["name"]
-        namespace = token.get("namespace", self.defaultNamespace)
+        name = token.name
+        namespace = getattr(token, "namespace", self.defaultNamespace)
         element = self.elementClass(name, namespace)
-        element.attributes = token["data"]
+        element.attributes = token.data
         return element
 
     def _getInsertFromTable(self):
@@ -248,10 +342,10 @@ class TreeBuilder(object):
     insertFromTable = property(_getInsertFromTable, _setInsertFromTable)
         
     def insertElementNormal(self, token):
-        name = token["name"]
-        namespace = token.get("namespace", self.defaultNamespace)
+        name = token.name
+        namespace = getattr(token, "namespace", self.defaultNamespace)
         element = self.elementClass(name, namespace)
-        element.attributes = token["data"]
+        element.attributes = token.data
         self.openElements[-1].appendChild(element)
         self.openElements.append(element)
         return element
@@ -273,7 +367,7 @@ class TreeBuilder(object):
         return element
 
     def insertText(self, data, parent=None):
-        """Insert text data."""
+        """Insert text data. Return the node it was inserted in"""
         if parent is None:
             parent = self.openElements[-1]
 
@@ -286,6 +380,7 @@ class TreeBuilder(object):
             # special magic element rearranging
             parent, insertBefore = self.getTableMisnestedNodePosition()
             parent.insertText(data, insertBefore)
+        return parent
             
     def getTableMisnestedNodePosition(self):
         """Get the foster parent element, and sibling to insert before
@@ -296,7 +391,7 @@ class TreeBuilder(object):
         lastTable=None
         fosterParent = None
         insertBefore = None
-        for elm in self.openElements[::-1]:
+        for elm in reversed(self.openElements):
             if elm.name == "table":
                 lastTable = elm
                 break
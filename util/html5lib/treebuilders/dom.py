@@ -39,33 +39,67 @@ def getDomBuilder(DomImplementation):
         def __init__(self, element):
             _base.Node.__init__(self, element.localName)
             self.element = element
+            # Text still to be added to textNode, see insertText
+            self.textNode = None
+            self.textBuffer = None
 
         namespace = property(lambda self:(hasattr(self.element, "namespace")
                                           and self.element.namespace 
                                           or None))
 
         def appendChild(self, node):
+            # Buffered text is added before the nodes it is between move
+            self.flushText()
+            node.flushText()
             node.parent = self
             self.element.appendChild(node.element)
     
         def insertText(self, data, insertBefore=None):
             data=illegal_xml_chars.sub('\uFFFD',data)
-            text = self.element.ownerDocument.createTextNode(data)
             if insertBefore:
-                self.element.insertBefore(text, insertBefore.element)
+                previous = insertBefore.element.previousSibling
             else:
-                self.element.appendChild(text)
+                previous = self.element.lastChild
+            # Runs of text at the same place are collected in textBuffer and
+            # added to the text node in one go by flushText
+            if previous is not None and previous is self.textNode:
+                self.textBuffer.append(data)
+                return
+            self.flushText()
+            if previous is not None and previous.nodeType == Node.TEXT_NODE:
+                self.textNode = previous
+                self.textBuffer = [data]
+            else:
+                text = self.element.ownerDocument.createTextNode(data)
+                if insertBefore:
+                    self.element.insertBefore(text, insertBefore.element)
+                else:
+                    self.element.appendChild(text)
+                self.textNode = text
+                self.textBuffer = []
+
+        def flushText(self):
+            if self.textBuffer:
+                self.textNode.appendData("".join(self.textBuffer))
+            self.textNode = None
+            self.textBuffer = None
     
         def insertBefore(self, node, refNode):
+            self.flushText()
+            node.flushText()
             self.element.insertBefore(node.element, refNode.element)
             node.parent = self
     
         def removeChild(self, node):
+            self.flushText()
+            node.flushText()
             if node.element.parentNode == self.element:
                 self.element.removeChild(node.element)
             node.parent = None
     
         def reparentChildren(self, newParent):
+            self.flushText()
+            newParent.flushText()
             while self.element.hasChildNodes():
                 child = self.element.firstChild
                 self.element.removeChild(child)
@@ -90,14 +124,25 @@ def getDomBuilder(DomImplementation):
             return self.element.hasChildNodes()
     
     class TreeBuilder(_base.TreeBuilder):
+        def reset(self):
+            # The NodeBuilders that text went into, in order, which may have
+            # some of it still to flush
+            self.bufferedNodes = []
+            _base.TreeBuilder.reset(self)
+
+        def flushText(self):
+            for node in self.bufferedNodes:
+                node.flushText()
+            self.bufferedNodes = []
+
         def documentClass(self):
             self.dom = Dom.getDOMImplementation().createDocument(None,None,None)
             return self
     
         def insertDoctype(self, token):
-            name = token["name"]
-            publicId = token["publicId"]
-            systemId = token["systemId"]
+            name = token.name
+            publicId = token.publicId
+            systemId = token.systemId
 
             domimpl = Dom.getDOMImplementation()
             doctype = domimpl.createDocumentType(name, publicId, systemId)
@@ -123,18 +168,25 @@ def getDomBuilder(DomImplementation):
             self.dom.appendChild(node.element)
     
         def testSerializer(self, element):
+            self.flushText()
             return testSerializer(element)
     
         def getDocument(self):
+            self.flushText()
             return self.dom
         
         def getFragment(self):
-            return _base.TreeBuilder.getFragment(self).element
+            fragment = _base.TreeBuilder.getFragment(self)
+            self.flushText()
+            return fragment.element
     
         def insertText(self, data, parent=None):
             data=illegal_xml_chars.sub('\uFFFD',data)
             if parent != self:
-                _base.TreeBuilder.insertText(self, data, parent)
+                node = _base.TreeBuilder.insertText(self, data, parent)
+                if (not self.bufferedNodes or
+                    self.bufferedNodes[-1] is not node):
+                    self.bufferedNodes.append(node)
             else:
                 # HACK: allow text nodes as children of the document node
                 if hasattr(self.dom, '_child_node_types'):
@@ -19,6 +19,11 @@ def getETreeModule(ElementTreeImplementation, fullTree=False):
 def getETreeBuilder(ElementTreeImplementation, fullTree=False):
     ElementTree = ElementTreeImplementation
     class Element(_base.Node):
+        # Text still to be added, as a list of strings, and the element and
+        # the attribute, "text" or "tail", to add it to. See insertText
+        _textBuffer = None
+        _textTarget = None
+
         def __init__(self, name, namespace=None):
             if namespace is None:
                 etree_tag = name
@@ -66,44 +71,62 @@ def getETreeBuilder(ElementTreeImplementation, fullTree=False):
     
         def hasContent(self):
             """Return true if the node has children or text"""
-            return bool(self._element.text or self._element.getchildren())
+            return bool(self._element.text or self._textBuffer or
+                        self._element.getchildren())
     
         def appendChild(self, node):
+            # Buffered text is added before the nodes it is between move
+            self.flushText()
+            node.flushText()
             self._childNodes.append(node)
             self._element.append(node._element)
             node.parent = self
     
         def insertBefore(self, node, refNode):
+            self.flushText()
+            node.flushText()
             index = self._element.getchildren().index(refNode._element)
             self._element.insert(index, node._element)
             node.parent = self
     
         def removeChild(self, node):
+            self.flushText()
+            node.flushText()
             self._element.remove(node._element)
             node.parent=None
     
         def insertText(self, data, insertBefore=None):
             if not(len(self._element)):
-                if not self._element.text:
-                    self._element.text = ""
-                self._element.text += data
+                target = (self._element, "text")
             elif insertBefore is None:
                 #Insert the text as the tail of the last child element
-                if not self._element[-1].tail:
-                    self._element[-1].tail = ""
-                self._element[-1].tail += data
+                target = (self._element[-1], "tail")
             else:
                 #Insert the text before the specified node
                 children = self._element.getchildren()
                 index = children.index(insertBefore._element)
                 if index > 0:
-                    if not self._element[index-1].tail:
-                        self._element[index-1].tail = ""
-                    self._element[index-1].tail += data
+                    target = (self._element[index-1], "tail")
                 else:
-                    if not self._element.text:
-                        self._element.text = ""
-                    self._element.text += data
+                    target = (self._element, "text")
+            # Runs of text going to the same place are collected and added
+            # in one go by flushText
+            if (self._textBuffer is not None and
+                target[0] is self._textTarget[0] and
+                target[1] == self._textTarget[1]):
+                self._textBuffer.append(data)
+            else:
+                self.flushText()
+                self._textTarget = target
+                self._textBuffer = [data]
+
+        def flushText(self):
+            if self._textBuffer is not None:
+                element, attribute = self._textTarget
+                setattr(element, attribute, (getattr(element, attribute) or "")
+                        + "".join(self._textBuffer))
+                self._textTarget = None
+                self._textBuffer = None
     
         def cloneNode(self):
             element = Element(self.name)
@@ -112,6 +135,8 @@ def getETreeBuilder(ElementTreeImplementation, fullTree=False):
             return element
     
         def reparentChildren(self, newParent):
+            self.flushText()
+            newParent.flushText()
             if newParent.childNodes:
                 newParent.childNodes[-1]._element.tail += self._element.text
             else:
@@ -274,17 +299,37 @@ def getETreeBuilder(ElementTreeImplementation, fullTree=False):
         elementClass = Element
         commentClass = Comment
         fragmentClass = DocumentFragment
+
+        def reset(self):
+            # The Elements that text went into, in order, which may have some
+            # of it still to flush
+            self.bufferedNodes = []
+            _base.TreeBuilder.reset(self)
+
+        def insertText(self, data, parent=None):
+            node = _base.TreeBuilder.insertText(self, data, parent)
+            if not self.bufferedNodes or self.bufferedNodes[-1] is not node:
+                self.bufferedNodes.append(node)
+
+        def flushText(self):
+            for node in self.bufferedNodes:
+                node.flushText()
+            self.bufferedNodes = []
     
         def testSerializer(self, element):
+            self.flushText()
             return testSerializer(element)
     
         def getDocument(self):
+            self.flushText()
             if fullTree:
                 return self.document._element
             else:
                 return self.document._element.find("html")
         
         def getFragment(self):
-            return _base.TreeBuilder.getFragment(self)._element
+            fragment = _base.TreeBuilder.getFragment(self)
+            self.flushText()
+            return fragment._element
         
     return locals()
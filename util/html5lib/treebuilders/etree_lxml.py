@@ -221,21 +221,37 @@ class TreeBuilder(_base.TreeBuilder):
         _base.TreeBuilder.__init__(self, namespaceHTMLElements)
     
     def reset(self):
+        # The Elements that text went into, in order, which may have some of
+        # it still to flush, see etree.Element.insertText
+        self.bufferedNodes = []
         _base.TreeBuilder.reset(self)
         self.insertComment = self.insertCommentInitial
         self.initial_comments = []
         self.doctype = None
 
+    def insertText(self, data, parent=None):
+        node = _base.TreeBuilder.insertText(self, data, parent)
+        if not self.bufferedNodes or self.bufferedNodes[-1] is not node:
+            self.bufferedNodes.append(node)
+
+    def flushText(self):
+        for node in self.bufferedNodes:
+            node.flushText()
+        self.bufferedNodes = []
+
     def testSerializer(self, element):
+        self.flushText()
         return testSerializer(element)
 
     def getDocument(self):
+        self.flushText()
         if fullTree:
             return self.document._elementTree
         else:
             return self.document._elementTree.getroot()
     
     def getFragment(self):
+        self.flushText()
         fragment = []
         element = self.openElements[0]._element
         if element.text:
@@ -246,9 +262,9 @@ class TreeBuilder(_base.TreeBuilder):
         return fragment
 
     def insertDoctype(self, token):
-        name = token["name"]
-        publicId = token["publicId"]
-        systemId = token["systemId"]
+        name = token.name
+        publicId = token.publicId
+        systemId = token.systemId
 
         if not name or ihatexml.nonXmlBMPRegexp.search(name):
             warnings.warn("lxml cannot represent null or non-xml doctype", DataLossWarning)
@@ -282,15 +298,15 @@ class TreeBuilder(_base.TreeBuilder):
         
         #Append the initial comments:
         for comment_token in self.initial_comments:
-            root.addprevious(etree.Comment(comment_token["data"]))
+            root.addprevious(etree.Comment(comment_token.data))
         
         #Create the root document and add the ElementTree to it
         self.document = self.documentClass()
         self.document._elementTree = root.getroottree()
         
         #Add the root element to the internal child/open data structures
-        namespace = token.get("namespace", None)
-        root_element = self.elementClass(token["name"], namespace)
+        namespace = getattr(token, "namespace", None)
+        root_element = self.elementClass(token.name, namespace)
         root_element._element = root
         self.document._childNodes.append(root_element)
         self.openElements.append(root_element)
@@ -0,0 +1,309 @@
+"""A tree builder for ElementTree that builds the tree out of native elements.
+
+The etree builder wraps every element in a Node object with a list of its
+children of its own. This one doesn't: the elements the parser works on are
+the elements of the tree, instances of a subclass of the implementation's
+Element class that only adds the methods the tree construction algorithm
+calls. What else the algorithm needs to know about an element, its name,
+namespace, parent and flags, is kept by the TreeBuilder in a side table,
+which is dropped once the tree is handed out. The tree pickles as plain
+ElementTree elements.
+
+Use it with getTreeBuilder("etree", implementation, native=True), and
+walk the trees with treewalkers.etree_native.
+"""
+
+from . import _base
+
+moduleCache = {}
+
+def getETreeModule(ElementTreeImplementation, fullTree=False):
+    name = "_" + ElementTreeImplementation.__name__ + "nativebuilder"
+    if fullTree:
+        name += "full"
+    if name in moduleCache:
+        return moduleCache[name]
+    else:
+        mod = type(_base)(name)
+        objs = getETreeBuilder(ElementTreeImplementation, fullTree)
+        mod.__dict__.update(objs)
+        moduleCache[name] = mod
+        return mod
+
+def newElement(elementClass, tag, attributes, text, tail):
+    """Make an element for pickle, see Element.__reduce__"""
+    element = elementClass(tag, attributes)
+    element.text = text
+    element.tail = tail
+    return element
+
+# The indices of the items in the side table entry of an element
+NAME, NAMESPACE, PARENT, FLAGS, FORM = range(5)
+
+def getETreeBuilder(ElementTreeImplementation, fullTree=False):
+    ElementTree = ElementTreeImplementation
+
+    class Element(ElementTree.Element):
+        # The attributes of a subclass made for each TreeBuilder: the
+        # TreeBuilder, and its side table, which maps every element to a list
+        # of its name, namespace, parent, flags and form owner. Both are
+        # cleared once the tree is handed out
+        __slots__ = ()
+        builder = None
+        info = None
+
+        def __init__(self, name, namespace=None):
+            if namespace is None:
+                tag = name
+            else:
+                tag = "{%s}%s" % (namespace, name)
+            ElementTree.Element.__init__(self, tag)
+            self.info[self] = [name, namespace, None, None, None]
+
+        def __bool__(self):
+            # ElementTree elements are false when they have no children, and
+            # the parser tests nodes with "if node:"
+            return True
+
+        def __reduce__(self):
+            return (newElement, (ElementTree.Element, self.tag,
+                                 dict(self.attrib), self.text, self.tail),
+                    None, iter(self))
+
+        def _getName(self):
+            return self.info[self][NAME]
+
+        name = property(_getName)
+
+        def _getNamespace(self):
+            return self.info[self][NAMESPACE]
+
+        namespace = property(_getNamespace)
+
+        def _getParent(self):
+            return self.info[self][PARENT]
+
+        parent = property(_getParent)
+
+        def _getAttributes(self):
+            return self.attrib
+
+        def _setAttributes(self, attributes):
+            self.attrib = attributes
+
+        attributes = property(_getAttributes, _setAttributes)
+
+        def _getFlags(self):
+            entry = self.info[self]
+            if entry[FLAGS] is None:
+                entry[FLAGS] = []
+            return entry[FLAGS]
+
+        _flags = property(_getFlags)
+
+        def _getForm(self):
+            return self.info[self][FORM]
+
+        def _setForm(self, form):
+            self.info[self][FORM] = form
+
+        form = property(_getForm, _setForm)
+
+        def childIndex(self, child):
+            # Children are mostly looked for near the end
+            for i in range(len(self) - 1, -1, -1):
+                if self[i] is child:
+                    return i
+            raise ValueError("child is not a child of this element")
+
+        def appendChild(self, node):
+            self.append(node)
+            self.info[node][PARENT] = self
+
+        def insertBefore(self, node, refNode):
+            self.insert(self.childIndex(refNode), node)
+            self.info[node][PARENT] = self
+
+        def removeChild(self, node):
+            self.builder.flushText()
+            index = self.childIndex(node)
+            # The tail of node is text of this element, which stays here
+            if node.tail:
+                if index > 0:
+                    previous = self[index - 1]
+                    previous.tail = (previous.tail or "") + node.tail
+                else:
+                    self.text = (self.text or "") + node.tail
+                node.tail = None
+            del self[index]
+            self.info[node][PARENT] = None
+
+        def insertText(self, data, insertBefore=None):
+            if insertBefore is None:
+                if len(self):
+                    self.builder.addText(self[-1], "tail", data)
+                else:
+                    self.builder.addText(self, "text", data)
+            else:
+                index = self.childIndex(insertBefore)
+                if index > 0:
+                    self.builder.addText(self[index - 1], "tail", data)
+                else:
+                    self.builder.addText(self, "text", data)
+
+        def reparentChildren(self, newParent):
+            self.builder.flushText()
+            if self.text:
+                if len(newParent):
+                    last = newParent[-1]
+                    last.tail = (last.tail or "") + self.text
+                else:
+                    newParent.text = (newParent.text or "") + self.text
+                self.text = None
+            info = self.info
+            for child in self:
+                newParent.append(child)
+                info[child][PARENT] = newParent
+            del self[:]
+
+        def cloneNode(self):
+            entry = self.info[self]
+            element = type(self)(entry[NAME], entry[NAMESPACE])
+            element.attrib = dict(self.attrib)
+            return element
+
+        def hasContent(self):
+            """Return true if the node has children or text"""
+            self.builder.flushText()
+            return bool(self.text or len(self))
+
+    def localName(tag):
+        if tag[:1] == "{":
+            return tag[tag.index("}") + 1:]
+        return tag
+
+    def testSerializer(element):
+        """Serialize element in the format of simpletree's printTree"""
+        rv = []
+        if not(hasattr(element, "tag")):
+            element = element.getroot()
+        # Nodes still to do, and text to write, in reverse order
+        pending = [(element, 0)]
+        while pending:
+            node, indent = pending.pop()
+            if isinstance(node, str):
+                rv.append('|%s"%s"' % (' ' * indent, node))
+                continue
+            if node.tag == "<DOCUMENT_ROOT>":
+                rv.append("#document")
+            elif node.tag == "<DOCUMENT_FRAGMENT>":
+                rv.append("#document-fragment")
+            elif node.tag == "<!DOCTYPE>":
+                if node.get("publicId") or node.get("systemId"):
+                    rv.append('|%s<!DOCTYPE %s "%s" "%s">' % (
+                        ' ' * indent, node.text, node.get("publicId") or "",
+                        node.get("systemId") or ""))
+                else:
+                    rv.append("|%s<!DOCTYPE %s>" % (' ' * indent, node.text))
+                continue
+            elif not isinstance(node.tag, str):
+                rv.append("|%s<!-- %s -->" % (' ' * indent, node.text))
+                continue
+            else:
+                rv.append("|%s<%s>" % (' ' * indent, localName(node.tag)))
+                for name, value in node.attrib.items():
+                    rv.append('|%s%s="%s"' % (' ' * (indent + 2), name,
+                                                value))
+            for child in reversed(node):
+                if child.tail:
+                    pending.append((child.tail, indent + 2))
+                pending.append((child, indent + 2))
+            if node.text:
+                pending.append((node.text, indent + 2))
+        return "\n".join(rv)
+
+    class TreeBuilder(_base.TreeBuilder):
+        def __init__(self, namespaceHTMLElements):
+            self.elementClass = type("Element", (Element,),
+                                     {"__slots__": (), "info": {}})
+            _base.TreeBuilder.__init__(self, namespaceHTMLElements)
+
+        def reset(self):
+            self.elementClass.builder = self
+            self.elementClass.info = {}
+            # Text still to be added to the text or tail of an element, as a
+            # list of strings
+            self.textElement = None
+            self.textAttribute = None
+            self.textBuffer = None
+            _base.TreeBuilder.reset(self)
+
+        def addText(self, element, attribute, data):
+            """Add data to the text or tail of element, buffering runs of
+            text that go to the same place"""
+            if (element is self.textElement and
+                attribute == self.textAttribute):
+                self.textBuffer.append(data)
+            else:
+                self.flushText()
+                self.textElement = element
+                self.textAttribute = attribute
+                self.textBuffer = [data]
+
+        def flushText(self):
+            if self.textBuffer is not None:
+                element = self.textElement
+                text = "".join(self.textBuffer)
+                if self.textAttribute == "text":
+                    element.text = (element.text or "") + text
+                else:
+                    element.tail = (element.tail or "") + text
+                self.textElement = None
+                self.textAttribute = None
+                self.textBuffer = None
+
+        def documentClass(self):
+            return self.elementClass("<DOCUMENT_ROOT>")
+
+        def fragmentClass(self):
+            return self.elementClass("<DOCUMENT_FRAGMENT>")
+
+        def doctypeClass(self, name, publicId, systemId):
+            doctype = self.elementClass("<!DOCTYPE>")
+            doctype.text = name
+            if publicId is not None:
+                doctype.set("publicId", publicId)
+            if systemId is not None:
+                doctype.set("systemId", systemId)
+            return doctype
+
+        def commentClass(self, data):
+            comment = self.elementClass(ElementTree.Comment)
+            comment.text = data
+            return comment
+
+        def testSerializer(self, element):
+            self.flushText()
+            return testSerializer(element)
+
+        def getDocument(self):
+            self.flushText()
+            # The side table is not needed any more, and the elements handed
+            # out must not keep the TreeBuilder alive
+            self.elementClass.builder = None
+            self.elementClass.info = {}
+            if fullTree:
+                return self.document
+            for child in self.document:
+                if isinstance(child.tag, str) and child.tag != "<!DOCTYPE>":
+                    return child
+            return None
+
+        def getFragment(self):
+            fragment = _base.TreeBuilder.getFragment(self)
+            self.flushText()
+            self.elementClass.builder = None
+            self.elementClass.info = {}
+            return fragment
+
+    return locals()
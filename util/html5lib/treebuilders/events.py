@@ -0,0 +1,113 @@
+"""A tree builder for parsing a document into a stream of events.
+
+It builds a simpletree, but hands out the parts of it the tree construction
+algorithm is done with as (event, node) pairs and then drops them, so a
+large document can be gone through without ever being held in memory
+whole. Use it through HTMLParser.parseEvents or html5lib.parseEvents.
+
+The events are
+"start" - an Element, with its name and attributes
+"end" - the same Element, once all its content has been generated
+"text" - a string of text
+"comment" - the data of a comment
+"doctype" - a DocumentType, with its name, publicId and systemId
+
+A node is generated only when later input can no longer move it or insert
+anything before it. The adoption agency algorithm can rearrange what is
+inside an open formatting element, and misnested content in a table is
+moved before the table, so the content of an open formatting element and
+all of an open table are held back until they are closed. The one change
+that can't be waited for is the attributes of a misplaced <html> or <body>
+start tag, which are added to the element already generated.
+"""
+
+from . import simpletree
+from ._base import Marker
+
+class Element(simpletree.Element):
+    # Whether the "start" event has been generated
+    started = False
+    # Whether some of the children have been generated and dropped
+    flushed = False
+
+    def hasContent(self):
+        return self.firstChild is not None or self.flushed
+
+class Document(simpletree.Document):
+    flushed = False
+
+class TreeBuilder(simpletree.TreeBuilder):
+    documentClass = Document
+    elementClass = Element
+
+    def flushEvents(self, final=False):
+        """Return the events for the part of the document that can't change
+        any more, and drop it from the tree. With final, at the end of the
+        document, return the events for all the rest"""
+        events = []
+        # The open elements and everything they are in. Misnested formatting
+        # elements can be closed while elements inside them are still open
+        held = set()
+        for node in self.openElements:
+            while node is not None and id(node) not in held:
+                held.add(id(node))
+                node = node.parent
+        formatting = set([id(node) for node in self.activeFormattingElements
+                          if node is not Marker])
+        parent = self.document
+        while True:
+            child = parent.firstChild
+            while child is not None:
+                if not final:
+                    if id(child) in held:
+                        break
+                    # Text can still be added to the last text node
+                    if child.type == 4 and child.nextSibling is None:
+                        break
+                    # Elements can be put back in a <head> until the next
+                    # element after it comes along
+                    if child.name == "head":
+                        sibling = child.nextSibling
+                        while sibling is not None and sibling.type != 5:
+                            sibling = sibling.nextSibling
+                        if sibling is None:
+                            break
+                self.generateEvents(child, events)
+                next = child.nextSibling
+                parent.removeChild(child)
+                parent.flushed = True
+                child = next
+            if final or child is None:
+                return events
+            # Go on into the element that is still open, unless what is in it
+            # can still be moved around
+            if id(child) not in held or child.name == "table":
+                return events
+            if not child.started:
+                events.append(("start", child))
+                child.started = True
+            if id(child) in formatting:
+                return events
+            parent = child
+
+    def generateEvents(self, node, events):
+        """Append the events for node and everything in it to events"""
+        # Nodes still to do, and elements whose "end" is due, in reverse
+        # order
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, tuple):
+                events.append(node)
+            elif node.type == 5:
+                if not node.started:
+                    events.append(("start", node))
+                    node.started = True
+                pending.append(("end", node))
+                pending.extend(reversed(node.childNodes))
+            elif node.type == 4:
+                events.append(("text", node.value))
+            elif node.type == 6:
+                events.append(("comment", node.data))
+            elif node.type == 3:
+                events.append(("doctype", node))
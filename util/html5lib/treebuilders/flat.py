@@ -0,0 +1,498 @@
+"""A tree builder that keeps the whole document in a few flat arrays.
+
+The result of parsing is a Tree, in which every node is an integer: its
+index in parallel arrays of node kinds, names, parents, first children, next
+siblings and offsets into a single string holding all the text. The nodes
+are numbered in document order, so the descendants of a node are the nodes
+right after it, up to the end of its subtree. There is one object for the
+whole document rather than one for every node, so a Tree is much smaller
+than a simpletree, pickles quickly and can be gone through without chasing
+pointers from object to object. Use treewalkers.flat to serialize it.
+
+While the document is being parsed, the elements the tree construction
+algorithm holds on to are Node objects, which refer to the arrays of the
+TreeBuilder by index.
+"""
+
+from array import array
+
+from . import _base
+
+# The kinds of node, the same numbers as the types of simpletree nodes
+DOCUMENT = 1
+FRAGMENT = 2
+DOCTYPE = 3
+TEXT = 4
+ELEMENT = 5
+COMMENT = 6
+
+# No node, e.g. the parent of the root or the next sibling of a last child.
+# Also stands for no name and no namespace
+NONE = -1
+
+class Tree(object):
+    """A parsed document or fragment. Its nodes are the integers from 0, the
+    document or fragment itself, to len(tree) - 1.
+
+    kinds - the kind of each node, DOCUMENT, FRAGMENT, DOCTYPE, TEXT, ELEMENT
+            or COMMENT
+    names - for elements and doctypes the index of their name in nameTable,
+            else NONE
+    namespaces - for elements the index of their namespace in nameTable, or
+                 NONE
+    parents, firstChildren, nextSiblings - the node in that relation to each
+                                           node, or NONE
+    textOffsets - the value of a text node or the data of a comment node is
+                  text[textOffsets[node]:textOffsets[node + 1]]
+    elementAttributes - the attribute dicts of the elements that have
+                        attributes, by node
+    doctypeIds - the (publicId, systemId) pairs of the doctypes, by node
+    """
+
+    def __init__(self, kinds, names, namespaces, parents, firstChildren,
+                 nextSiblings, textOffsets, text, nameTable,
+                 elementAttributes, doctypeIds):
+        self.kinds = kinds
+        self.names = names
+        self.namespaces = namespaces
+        self.parents = parents
+        self.firstChildren = firstChildren
+        self.nextSiblings = nextSiblings
+        self.textOffsets = textOffsets
+        self.text = text
+        self.nameTable = nameTable
+        self.elementAttributes = elementAttributes
+        self.doctypeIds = doctypeIds
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def kind(self, node):
+        return self.kinds[node]
+
+    def name(self, node):
+        """The name of an element or doctype, else None"""
+        nameId = self.names[node]
+        if nameId == NONE:
+            return None
+        return self.nameTable[nameId]
+
+    def namespace(self, node):
+        namespaceId = self.namespaces[node]
+        if namespaceId == NONE:
+            return None
+        return self.nameTable[namespaceId]
+
+    def value(self, node):
+        """The value of a text node or the data of a comment, else an empty
+        string"""
+        return self.text[self.textOffsets[node]:self.textOffsets[node + 1]]
+
+    def attributes(self, node):
+        """The attributes of an element. The dict must not be modified"""
+        return self.elementAttributes.get(node, {})
+
+    def parent(self, node):
+        return self.parents[node]
+
+    def firstChild(self, node):
+        return self.firstChildren[node]
+
+    def nextSibling(self, node):
+        return self.nextSiblings[node]
+
+    def children(self, node):
+        child = self.firstChildren[node]
+        while child != NONE:
+            yield child
+            child = self.nextSiblings[child]
+
+    def subtreeEnd(self, node):
+        """The node after the last descendant of node, or len(self)"""
+        parents = self.parents
+        nextSiblings = self.nextSiblings
+        while node != NONE:
+            if nextSiblings[node] != NONE:
+                return nextSiblings[node]
+            node = parents[node]
+        return len(self.kinds)
+
+    def descendants(self, node=0):
+        """The descendants of node, in document order"""
+        return range(node + 1, self.subtreeEnd(node))
+
+    def textContent(self, node=0):
+        """The text of all the text nodes in node"""
+        kinds = self.kinds
+        offsets = self.textOffsets
+        return "".join([self.text[offsets[n]:offsets[n + 1]]
+                        for n in self.descendants(node) if kinds[n] == TEXT])
+
+    def getElementsByTagName(self, name):
+        """The elements called name, in document order"""
+        if name not in self.nameTable:
+            return []
+        nameId = self.nameTable.index(name)
+        kinds = self.kinds
+        return [node for node, n in enumerate(self.names)
+                if n == nameId and kinds[node] == ELEMENT]
+
+    def printTree(self, node=0):
+        """The subtree of node in the format of simpletree's printTree"""
+        kinds = self.kinds
+        lines = []
+        depth = {}
+        for n in range(node, self.subtreeEnd(node)):
+            if n == node:
+                indent = 0
+            else:
+                indent = depth[self.parents[n]] + 2
+            depth[n] = indent
+            kind = kinds[n]
+            if kind == ELEMENT:
+                lines.append("|%s<%s>" % (" " * indent, self.name(n)))
+                for name, value in self.attributes(n).items():
+                    lines.append('|%s%s="%s"' % (" " * (indent + 2), name,
+                                                 value))
+            elif kind == TEXT:
+                lines.append('|%s"%s"' % (" " * indent, self.value(n)))
+            elif kind == COMMENT:
+                lines.append("|%s<!-- %s -->" % (" " * indent, self.value(n)))
+            elif kind == DOCTYPE:
+                publicId, systemId = self.doctypeIds[n]
+                if publicId or systemId:
+                    lines.append('|%s<!DOCTYPE %s "%s" "%s">' % (
+                        " " * indent, self.name(n), publicId or "",
+                        systemId or ""))
+                else:
+                    lines.append("|%s<!DOCTYPE %s>" % (" " * indent,
+                                                       self.name(n)))
+            elif kind == DOCUMENT:
+                lines.append("#document")
+            else:
+                lines.append("#document-fragment")
+        return "\n".join(lines)
+
+class Node(_base.Node):
+    """A node of the tree being built, for the tree construction algorithm"""
+    # form is the form element owner of form controls, see
+    # InBodyPhase.startTagInput. It is not kept in the Tree
+    __slots__ = ("builder", "index", "form")
+
+    def __init__(self, builder, index):
+        self.builder = builder
+        self.index = index
+
+    def _getName(self):
+        nameId = self.builder.names[self.index]
+        if nameId == NONE:
+            return None
+        return self.builder.nameTable[nameId]
+
+    name = property(_getName)
+
+    def _getNamespace(self):
+        namespaceId = self.builder.namespaces[self.index]
+        if namespaceId == NONE:
+            return None
+        return self.builder.nameTable[namespaceId]
+
+    namespace = property(_getNamespace)
+
+    def _getAttributes(self):
+        elementAttributes = self.builder.elementAttributes
+        if self.index not in elementAttributes:
+            elementAttributes[self.index] = {}
+        return elementAttributes[self.index]
+
+    def _setAttributes(self, attributes):
+        if attributes:
+            self.builder.elementAttributes[self.index] = attributes
+        else:
+            self.builder.elementAttributes.pop(self.index, None)
+
+    attributes = property(_getAttributes, _setAttributes)
+
+    def _getParent(self):
+        parent = self.builder.parents[self.index]
+        if parent == NONE:
+            return None
+        return self.builder.getNode(parent)
+
+    parent = property(_getParent)
+
+    def _getFlags(self):
+        flags = self.builder.flags
+        if self.index not in flags:
+            flags[self.index] = []
+        return flags[self.index]
+
+    _flags = property(_getFlags)
+
+    def appendChild(self, node):
+        self.builder.appendNode(self.index, node.index)
+
+    def insertText(self, data, insertBefore=None):
+        if insertBefore is None:
+            self.builder.appendText(self.index, data)
+        else:
+            self.builder.appendText(self.index, data, insertBefore.index)
+
+    def insertBefore(self, node, refNode):
+        self.builder.appendNode(self.index, node.index, refNode.index)
+
+    def removeChild(self, node):
+        self.builder.removeNode(self.index, node.index)
+
+    def reparentChildren(self, newParent):
+        self.builder.moveChildren(self.index, newParent.index)
+
+    def cloneNode(self):
+        builder = self.builder
+        index = builder.newNode(ELEMENT, builder.names[self.index],
+                                builder.namespaces[self.index])
+        if self.index in builder.elementAttributes:
+            builder.elementAttributes[index] = \
+                builder.elementAttributes[self.index].copy()
+        return builder.getNode(index)
+
+    def hasContent(self):
+        """Return true if the node has children or text"""
+        return self.builder.firstChildren[self.index] != NONE
+
+class TreeBuilder(_base.TreeBuilder):
+    """Builds the nodes into arrays like those of Tree, with the last child
+    and previous sibling of each node as well so that nodes can be inserted
+    and removed anywhere, and with the text of each node as a list of
+    strings. getDocument and getFragment copy the nodes that are in the
+    document or fragment into a Tree, in document order"""
+
+    def reset(self):
+        self.kinds = array("b")
+        self.names = array("i")
+        self.namespaces = array("i")
+        self.parents = array("i")
+        self.firstChildren = array("i")
+        self.lastChildren = array("i")
+        self.nextSiblings = array("i")
+        self.previousSiblings = array("i")
+        # Lists of strings, by node
+        self.texts = {}
+        self.nameTable = []
+        self.nameIds = {}
+        self.elementAttributes = {}
+        self.doctypeIds = {}
+        self.flags = {}
+        # The Node objects handed out, by index, so that there is only one
+        # for each node
+        self.nodes = {}
+        _base.TreeBuilder.reset(self)
+
+    def documentClass(self):
+        return self.getNode(self.newNode(DOCUMENT, NONE, NONE))
+
+    def fragmentClass(self):
+        return self.getNode(self.newNode(FRAGMENT, NONE, NONE))
+
+    def getNode(self, index):
+        """The Node for index"""
+        node = self.nodes.get(index)
+        if node is None:
+            node = self.nodes[index] = Node(self, index)
+        return node
+
+    def nameId(self, name):
+        """The index of name in nameTable, adding it if needed"""
+        if name is None:
+            return NONE
+        nameId = self.nameIds.get(name)
+        if nameId is None:
+            nameId = self.nameIds[name] = len(self.nameTable)
+            self.nameTable.append(name)
+        return nameId
+
+    def newNode(self, kind, nameId, namespaceId):
+        """Add a node without a parent and return its index"""
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.names.append(nameId)
+        self.namespaces.append(namespaceId)
+        self.parents.append(NONE)
+        self.firstChildren.append(NONE)
+        self.lastChildren.append(NONE)
+        self.nextSiblings.append(NONE)
+        self.previousSiblings.append(NONE)
+        return index
+
+    def appendNode(self, parent, child, before=NONE):
+        """Insert child in parent before the child before, or at the end"""
+        if before == NONE:
+            previous = self.lastChildren[parent]
+            self.lastChildren[parent] = child
+        else:
+            previous = self.previousSiblings[before]
+            self.previousSiblings[before] = child
+        if previous == NONE:
+            self.firstChildren[parent] = child
+        else:
+            self.nextSiblings[previous] = child
+        self.previousSiblings[child] = previous
+        self.nextSiblings[child] = before
+        self.parents[child] = parent
+
+    def removeNode(self, parent, child):
+        previous = self.previousSiblings[child]
+        next = self.nextSiblings[child]
+        if previous == NONE:
+            self.firstChildren[parent] = next
+        else:
+            self.nextSiblings[previous] = next
+        if next == NONE:
+            self.lastChildren[parent] = previous
+        else:
+            self.previousSiblings[next] = previous
+        self.parents[child] = NONE
+        self.previousSiblings[child] = NONE
+        self.nextSiblings[child] = NONE
+
+    def appendText(self, parent, data, before=NONE):
+        """Insert data in parent before the child before, or at the end,
+        adding it to the text node already there if there is one"""
+        if before == NONE:
+            previous = self.lastChildren[parent]
+        else:
+            previous = self.previousSiblings[before]
+        if previous != NONE and self.kinds[previous] == TEXT:
+            self.texts[previous].append(data)
+        else:
+            index = self.newNode(TEXT, NONE, NONE)
+            self.texts[index] = [data]
+            self.appendNode(parent, index, before)
+
+    def moveChildren(self, parent, newParent):
+        """Move all the children of parent to the end of newParent"""
+        child = self.firstChildren[parent]
+        if child == NONE:
+            return
+        last = self.lastChildren[newParent]
+        if (last != NONE and self.kinds[last] == TEXT and
+            self.kinds[child] == TEXT):
+            self.texts[last].extend(self.texts[child])
+            next = self.nextSiblings[child]
+            self.removeNode(parent, child)
+            child = next
+            if child == NONE:
+                return
+        self.previousSiblings[child] = last
+        if last == NONE:
+            self.firstChildren[newParent] = child
+        else:
+            self.nextSiblings[last] = child
+        self.lastChildren[newParent] = self.lastChildren[parent]
+        self.firstChildren[parent] = NONE
+        self.lastChildren[parent] = NONE
+        while child != NONE:
+            self.parents[child] = newParent
+            child = self.nextSiblings[child]
+
+    def createElement(self, token):
+        """Create an element but don't insert it anywhere"""
+        namespace = getattr(token, "namespace", self.defaultNamespace)
+        index = self.newNode(ELEMENT, self.nameId(token.name),
+                             self.nameId(namespace))
+        if token.data:
+            self.elementAttributes[index] = token.data
+        return self.getNode(index)
+
+    def insertElementNormal(self, token):
+        element = self.createElement(token)
+        self.openElements[-1].appendChild(element)
+        self.openElements.append(element)
+        return element
+
+    def insertDoctype(self, token):
+        index = self.newNode(DOCTYPE, self.nameId(token.name), NONE)
+        self.doctypeIds[index] = (token.publicId, token.systemId)
+        self.appendNode(self.document.index, index)
+
+    def insertComment(self, token, parent=None):
+        if parent is None:
+            parent = self.openElements[-1]
+        index = self.newNode(COMMENT, NONE, NONE)
+        self.texts[index] = [token.data]
+        self.appendNode(parent.index, index)
+
+    def getDocument(self):
+        "Return the final tree"
+        return self.makeTree(self.document.index)
+
+    def getFragment(self):
+        "Return the final fragment"
+        fragment = self.fragmentClass()
+        self.openElements[0].reparentChildren(fragment)
+        return self.makeTree(fragment.index)
+
+    def makeTree(self, root):
+        """Copy root and everything in it into a Tree, numbering the nodes
+        in document order"""
+        firstChildren = self.firstChildren
+        nextSiblings = self.nextSiblings
+        parents = self.parents
+        order = []
+        node = root
+        while True:
+            order.append(node)
+            if firstChildren[node] != NONE:
+                node = firstChildren[node]
+                continue
+            while node != root and nextSiblings[node] == NONE:
+                node = parents[node]
+            if node == root:
+                break
+            node = nextSiblings[node]
+
+        # The new index of each node in the tree
+        newIndices = array("i", [NONE]) * len(self.kinds)
+        for newIndex, node in enumerate(order):
+            newIndices[node] = newIndex
+        # Relations to nodes out of the tree are dropped. NONE maps to
+        # newIndices[NONE], the last item, which is NONE too
+        newIndices.append(NONE)
+        parents = array("i", [newIndices[parents[node]] for node in order])
+        parents[0] = NONE
+        nextSiblings = array("i", [newIndices[nextSiblings[node]]
+                                   for node in order])
+        nextSiblings[0] = NONE
+        firstChildren = array("i", [newIndices[firstChildren[node]]
+                                    for node in order])
+
+        texts = self.texts
+        textParts = []
+        textOffsets = array("i")
+        offset = 0
+        for node in order:
+            textOffsets.append(offset)
+            if node in texts:
+                text = "".join(texts[node])
+                textParts.append(text)
+                offset += len(text)
+        textOffsets.append(offset)
+
+        elementAttributes = {}
+        for node, attributes in self.elementAttributes.items():
+            if attributes and newIndices[node] != NONE:
+                elementAttributes[newIndices[node]] = attributes
+        doctypeIds = {}
+        for node, ids in self.doctypeIds.items():
+            if newIndices[node] != NONE:
+                doctypeIds[newIndices[node]] = ids
+
+        return Tree(array("b", [self.kinds[node] for node in order]),
+                    array("i", [self.names[node] for node in order]),
+                    array("i", [self.namespaces[node] for node in order]),
+                    parents, firstChildren, nextSiblings, textOffsets,
+                    "".join(textParts), list(self.nameTable),
+                    elementAttributes, doctypeIds)
+
+    def testSerializer(self, node):
+        return node.printTree()
@@ -0,0 +1,68 @@
+"""A tree builder that doesn't build a tree.
+
+It keeps only what the tree construction algorithm itself looks at: the
+stack of open elements, the list of active formatting elements and the head
+and form pointers, with elements reduced to their name, namespace,
+attributes, parent and flags. Text, comments and doctypes are dropped as they
+arrive. This is enough for the parser to find every parse error, so it is
+the builder to use when only HTMLParser.errors matters, e.g. to validate
+documents.
+"""
+
+from . import _base
+
+class Element(_base.Node):
+    def __init__(self, name=None, namespace=None):
+        self.name = name
+        self.namespace = namespace
+        self.attributes = {}
+        self.parent = None
+        self._flags = []
+
+    def appendChild(self, node):
+        node.parent = self
+
+    def insertText(self, data, insertBefore=None):
+        pass
+
+    def insertBefore(self, node, refNode):
+        node.parent = self
+
+    def removeChild(self, node):
+        node.parent = None
+
+    def reparentChildren(self, newParent):
+        pass
+
+    def cloneNode(self):
+        newNode = Element(self.name, self.namespace)
+        newNode.attributes = self.attributes.copy()
+        return newNode
+
+    def hasContent(self):
+        # Without children the adoption agency algorithm never needs to
+        # clone a node, which makes no difference to the open elements or
+        # to the parse errors
+        return False
+
+class TreeBuilder(_base.TreeBuilder):
+    documentClass = Element
+    elementClass = Element
+    fragmentClass = Element
+
+    def insertDoctype(self, token):
+        pass
+
+    def insertComment(self, token, parent=None):
+        pass
+
+    def insertText(self, data, parent=None):
+        pass
+
+    def getDocument(self):
+        "There is no tree to return"
+        return None
+
+    def getFragment(self):
+        "There is no fragment to return"
+        return None
@@ -2,15 +2,75 @@ from . import _base
 from ..constants import voidElements
 from xml.sax.saxutils import escape
 
+# The childNodes of the nodes without children
+noChildren = ()
+
 # Really crappy basic implementation of a DOM-core like thing
+#
+# The nodes have __slots__ and create their lists and dicts only when they
+# need them, to keep a parsed document small. The children of a node are a
+# doubly linked list, from firstChild to lastChild through nextSibling and
+# previousSibling, so that a child can be inserted or removed anywhere
+# without going through the others
 class Node(_base.Node):
+    __slots__ = ("name", "parent", "value", "firstChild", "lastChild",
+                 "previousSibling", "nextSibling", "_childList", "_flagList")
     type = -1
     def __init__(self, name):
         self.name = name
         self.parent = None
         self.value = None
-        self.childNodes = []
-        self._flags = []
+        self.firstChild = None
+        self.lastChild = None
+        self.previousSibling = None
+        self.nextSibling = None
+        self._childList = None
+        self._flagList = None
+
+    def _getChildNodes(self):
+        """A tuple of the children, made when first asked for after a
+        change. It is read-only: children are added and removed through
+        appendChild, insertBefore and removeChild"""
+        if self._childList is None:
+            if self.firstChild is None:
+                return noChildren
+            childNodes = []
+            child = self.firstChild
+            while child is not None:
+                childNodes.append(child)
+                child = child.nextSibling
+            self._childList = tuple(childNodes)
+        return self._childList
+
+    childNodes = property(_getChildNodes)
+
+    def _getFlags(self):
+        if self._flagList is None:
+            self._flagList = []
+        return self._flagList
+
+    _flags = property(_getFlags)
+
+    def __getstate__(self):
+        # Pickle the children as a list rather than through the sibling
+        # links, which would go as deep as there are children
+        state = dict(getattr(self, "__dict__", {}))
+        for cls in type(self).__mro__:
+            for slot in cls.__dict__.get("__slots__", ()):
+                if slot not in linkSlots and hasattr(self, slot):
+                    state[slot] = getattr(self, slot)
+        state["childNodes"] = list(self.childNodes)
+        return state
+
+    def __setstate__(self, state):
+        childNodes = state.pop("childNodes")
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self.firstChild = self.lastChild = None
+        self.previousSibling = self.nextSibling = None
+        self._childList = None
+        for child in childNodes:
+            self.linkChild(child, None)
 
     def __iter__(self):
         for node in self.childNodes:
@@ -30,52 +90,100 @@ class Node(_base.Node):
             tree += child.printTree(indent + 2)
         return tree
 
-    def appendChild(self, node):
-        if (isinstance(node, TextNode) and self.childNodes and
-          isinstance(self.childNodes[-1], TextNode)):
-            self.childNodes[-1].value += node.value
+    def linkChild(self, node, refNode):
+        """Link node into the children before refNode, or at the end"""
+        if refNode is None:
+            previous = self.lastChild
+            self.lastChild = node
+        else:
+            previous = refNode.previousSibling
+            refNode.previousSibling = node
+        if previous is None:
+            self.firstChild = node
         else:
-            self.childNodes.append(node)
+            previous.nextSibling = node
+            if isinstance(previous, TextNode):
+                # Text is rarely added to a text node once it is no longer
+                # the last child
+                previous.joinFragments()
+        node.previousSibling = previous
+        node.nextSibling = refNode
         node.parent = self
+        self._childList = None
+
+    def appendChild(self, node):
+        last = self.lastChild
+        if (isinstance(node, TextNode) and
+          isinstance(last, TextNode)):
+            last.appendData(node.value)
+            node.parent = self
+        else:
+            self.linkChild(node, None)
 
     def insertText(self, data, insertBefore=None):
         if insertBefore is None:
-            self.appendChild(TextNode(data))
+            previous = self.lastChild
+        else:
+            previous = insertBefore.previousSibling
+        # Add to the text node already there rather than making one to
+        # merge into it
+        if isinstance(previous, TextNode):
+            previous.appendData(data)
         else:
-            self.insertBefore(TextNode(data), insertBefore)
+            self.linkChild(TextNode(data), insertBefore)
 
     def insertBefore(self, node, refNode):
-        index = self.childNodes.index(refNode)
-        if (isinstance(node, TextNode) and index > 0 and
-          isinstance(self.childNodes[index - 1], TextNode)):
-            self.childNodes[index - 1].value += node.value
+        if refNode.parent is not self:
+            raise ValueError("refNode is not a child of this node")
+        previous = refNode.previousSibling
+        if (isinstance(node, TextNode) and
+          isinstance(previous, TextNode)):
+            previous.appendData(node.value)
+            node.parent = self
         else:
-            self.childNodes.insert(index, node)
-        node.parent = self
+            self.linkChild(node, refNode)
 
     def removeChild(self, node):
-        try:
-            self.childNodes.remove(node)
-        except:
-            # XXX
-            raise
+        if node.parent is not self:
+            raise ValueError("node is not a child of this node")
+        previous = node.previousSibling
+        next = node.nextSibling
+        if previous is None:
+            self.firstChild = next
+        else:
+            previous.nextSibling = next
+        if next is None:
+            self.lastChild = previous
+        else:
+            next.previousSibling = previous
         node.parent = None
+        node.previousSibling = node.nextSibling = None
+        self._childList = None
+
+    def reparentChildren(self, newParent):
+        child = self.firstChild
+        self.firstChild = self.lastChild = None
+        self._childList = None
+        while child is not None:
+            next = child.nextSibling
+            newParent.appendChild(child)
+            child = next
 
     def cloneNode(self):
         newNode = type(self)(self.name)
-        if hasattr(self, 'namespace'):
-            newNode.namespace = self.namespace
-        if hasattr(self, 'attributes'):
-            for attr, value in self.attributes.items():
-                newNode.attributes[attr] = value
         newNode.value = self.value
         return newNode
 
     def hasContent(self):
         """Return true if the node has children or text"""
-        return bool(self.childNodes)
+        return self.firstChild is not None
+
+# The slots that __getstate__ leaves out
+linkSlots = frozenset(("firstChild", "lastChild", "previousSibling",
+                       "nextSibling", "_childList", "_fragments"))
 
 class Document(Node):
+    __slots__ = ()
     type = 1
     def __init__(self):
         Node.__init__(self, None)
@@ -105,11 +213,13 @@ class Document(Node):
         return tree
 
 class DocumentFragment(Document):
+    __slots__ = ()
     type = 2
     def __str__(self):
         return "#document-fragment"
 
 class DocumentType(Node):
+    __slots__ = ("publicId", "systemId")
     type = 3
     def __init__(self, name, publicId, systemId):
         Node.__init__(self, name)
@@ -133,11 +243,36 @@ class DocumentType(Node):
         return '<code class="markup doctype">&lt;!DOCTYPE %s></code>' % self.name
 
 class TextNode(Node):
+    # Text added to the node is kept as a list of fragments, joined into the
+    # value slot of Node only when the value is next asked for, so that a
+    # long run of character tokens doesn't copy the text over and over
+    __slots__ = ("_fragments",)
     type = 4
     def __init__(self, value):
         Node.__init__(self, None)
         self.value = value
 
+    def joinFragments(self):
+        if self._fragments is not None:
+            Node.value.__set__(self, "".join(self._fragments))
+            self._fragments = None
+
+    def _getValue(self):
+        self.joinFragments()
+        return Node.value.__get__(self, TextNode)
+
+    def _setValue(self, value):
+        self._fragments = None
+        Node.value.__set__(self, value)
+
+    value = property(_getValue, _setValue)
+
+    def appendData(self, data):
+        if self._fragments is None:
+            self._fragments = [Node.value.__get__(self, TextNode), data]
+        else:
+            self._fragments.append(data)
+
     def __str__(self):
         return "\"%s\"" % self.value
 
@@ -147,19 +282,39 @@ class TextNode(Node):
     hilite = toxml
 
 class Element(Node):
+    # form is the form element owner of form controls, see
+    # InBodyPhase.startTagInput
+    __slots__ = ("namespace", "_attributes", "form")
     type = 5
     def __init__(self, name, namespace=None):
         Node.__init__(self, name)
         self.namespace = namespace
-        self.attributes = {}
+        self._attributes = None
+
+    def _getAttributes(self):
+        if self._attributes is None:
+            self._attributes = {}
+        return self._attributes
+
+    def _setAttributes(self, attributes):
+        # Most elements have no attributes; they don't keep an empty dict
+        self._attributes = attributes or None
+
+    attributes = property(_getAttributes, _setAttributes)
+
+    def cloneNode(self):
+        newNode = type(self)(self.name, self.namespace)
+        if self._attributes:
+            newNode._attributes = self._attributes.copy()
+        return newNode
 
     def __str__(self):
         return "<%s>" % self.name
 
     def toxml(self):
         result = '<' + self.name
-        if self.attributes:
-            for name,value in self.attributes.items():
+        if self._attributes:
+            for name,value in self._attributes.items():
                 result += ' %s="%s"' % (name, escape(value,{'"':'&quot;'}))
         if self.childNodes:
             result += '>'
@@ -172,8 +327,8 @@ class Element(Node):
     
     def hilite(self):
         result = '&lt;<code class="markup element-name">%s</code>' % self.name
-        if self.attributes:
-            for name, value in self.attributes.items():
+        if self._attributes:
+            for name, value in self._attributes.items():
                 result += ' <code class="markup attribute-name">%s</code>=<code class="markup attribute-value">"%s"</code>' % (name, escape(value, {'"':'&quot;'}))
         if self.childNodes:
             result += ">"
@@ -186,14 +341,15 @@ class Element(Node):
     def printTree(self, indent):
         tree = '\n|%s%s' % (' '*indent, str(self))
         indent += 2
-        if self.attributes:
-            for name, value in self.attributes.items():
+        if self._attributes:
+            for name, value in self._attributes.items():
                 tree += '\n|%s%s="%s"' % (' ' * indent, name, value)
         for child in self.childNodes:
             tree += child.printTree(indent)
         return tree
 
 class CommentNode(Node):
+    __slots__ = ("data",)
     type = 6
     def __init__(self, data):
         Node.__init__(self, None)
@@ -217,3 +373,31 @@ class TreeBuilder(_base.TreeBuilder):
     
     def testSerializer(self, node):
         return node.printTree()
+
+    def getDocument(self):
+        "Return the final tree"
+        self.joinText(self.document)
+        return self.document
+
+    def getFragment(self):
+        "Return the final fragment"
+        fragment = _base.TreeBuilder.getFragment(self)
+        self.joinText(fragment)
+        return fragment
+
+    def joinText(self, root):
+        """Join the fragments of the text nodes in root, which are mostly
+        the last children of elements"""
+        node = root
+        while node is not None:
+            if node.firstChild is not None:
+                node = node.firstChild
+                continue
+            if isinstance(node, TextNode):
+                node.joinFragments()
+            while node is not root and node.nextSibling is None:
+                node = node.parent
+            if node is root:
+                node = None
+            else:
+                node = node.nextSibling
@@ -22,10 +22,13 @@ def getTreeWalker(treeType, implementation=None, **kwargs):
                 "pulldom" - The xml.dom.pulldom event stream
                 "etree" - A generic walker for tree implementations exposing an
                           elementtree-like interface (known to work with
-                          ElementTree, cElementTree and lxml.etree).
+                          ElementTree, cElementTree and lxml.etree). With
+                          native=True, a tree made by the etree builder with
+                          native=True
                 "lxml" - Optimized walker for lxml.etree
                 "beautifulsoup" - Beautiful soup (if installed)
                 "genshi" - a Genshi stream
+                "flat" - a treebuilders.flat Tree
 
     implementation - (Currently applies to the "etree" tree type only). A module
                       implementing the tree type e.g. xml.etree.ElementTree or
@@ -36,6 +39,9 @@ def getTreeWalker(treeType, implementation=None, **kwargs):
         if treeType in ("dom", "pulldom", "simpletree"):
             mod = __import__(treeType, globals())
             treeWalkerCache[treeType] = mod.TreeWalker
+        elif treeType == "flat":
+            from . import flat
+            treeWalkerCache[treeType] = flat.TreeWalker
         elif treeType == "genshi":
             from . import genshistream
             treeWalkerCache[treeType] = genshistream.TreeWalker
@@ -46,6 +52,9 @@ def getTreeWalker(treeType, implementation=None, **kwargs):
             from . import lxmletree
             treeWalkerCache[treeType] = lxmletree.TreeWalker
         elif treeType == "etree":
+            if kwargs.pop("native", False):
+                from . import etree_native
+                return etree_native.TreeWalker
             from . import etree
             if implementation is None:
                 try:
@@ -2,6 +2,7 @@ import gettext
 _ = gettext.gettext
 
 from html5lib.constants import voidElements, spaceCharacters
+from html5lib.utils import Token
 spaceCharacters = "".join(spaceCharacters)
 
 class TreeWalker(object):
@@ -12,7 +13,7 @@ class TreeWalker(object):
         raise NotImplementedError
 
     def error(self, msg):
-        return {"type": "SerializeError", "data": msg}
+        return Token("SerializeError", msg)
 
     def normalizeAttrs(self, attrs):
         if not attrs:
@@ -22,40 +23,36 @@ class TreeWalker(object):
         return [(str(name),str(value)) for name,value in attrs]
 
     def emptyTag(self, name, attrs, hasChildren=False):
-        yield {"type": "EmptyTag", "name": str(name), \
-                "data": self.normalizeAttrs(attrs)}
+        yield Token("EmptyTag", self.normalizeAttrs(attrs), name=str(name))
         if hasChildren:
             yield self.error(_("Void element has children"))
 
     def startTag(self, name, attrs):
-        return {"type": "StartTag", "name": str(name), \
-                 "data": self.normalizeAttrs(attrs)}
+        return Token("StartTag", self.normalizeAttrs(attrs), name=str(name))
 
     def endTag(self, name):
-        return {"type": "EndTag", "name": str(name), "data": []}
+        return Token("EndTag", [], name=str(name))
 
     def text(self, data):
         data = str(data)
         middle = data.lstrip(spaceCharacters)
         left = data[:len(data)-len(middle)]
         if left:
-            yield {"type": "SpaceCharacters", "data": left}
+            yield Token("SpaceCharacters", left)
         data = middle
         middle = data.rstrip(spaceCharacters)
         right = data[len(middle):]
         if middle:
-            yield {"type": "Characters", "data": middle}
+            yield Token("Characters", middle)
         if right:
-            yield {"type": "SpaceCharacters", "data": right}
+            yield Token("SpaceCharacters", right)
 
     def comment(self, data):
-        return {"type": "Comment", "data": str(data)}
+        return Token("Comment", str(data))
 
     def doctype(self, name, publicId=None, systemId=None, correct=True):
-        return {"type": "Doctype",
-                "name": name is not None and str(name) or "",
-                "publicId": publicId, "systemId": systemId,
-                "correct": correct}
+        return Token("Doctype", name=name is not None and str(name) or "",
+                     publicId=publicId, systemId=systemId, correct=correct)
 
     def unknown(self, nodeType):
         return self.error(_("Unknown node type: ") + nodeType)
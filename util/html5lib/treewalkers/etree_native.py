@@ -0,0 +1,69 @@
+import gettext
+_ = gettext.gettext
+
+from . import _base
+
+from html5lib.constants import voidElements
+
+def localName(tag):
+    if tag[:1] == "{":
+        return tag[tag.index("}") + 1:]
+    return tag
+
+class TreeWalker(_base.TreeWalker):
+    """Walks a tree made by treebuilders.etree_native, or any tree of
+    ElementTree elements with the same pseudo elements for the document,
+    doctype and comments.
+
+    ElementTree elements don't know their parents, so rather than going back
+    up the tree the walker keeps a stack of what is still to be walked: the
+    elements, the text and tails to give as text, and the end tags"""
+
+    def __iter__(self):
+        tree = self.tree
+        if not hasattr(tree, "tag"):
+            tree = tree.getroot()
+        # Things to do, in reverse order: elements, and (True, text) and
+        # (False, name) for text and end tags
+        pending = [tree]
+        while pending:
+            node = pending.pop()
+            if type(node) is tuple:
+                isText, data = node
+                if isText:
+                    for token in self.text(data):
+                        yield token
+                else:
+                    yield self.endTag(data)
+                continue
+
+            tag = node.tag
+            if tag in ("<DOCUMENT_ROOT>", "<DOCUMENT_FRAGMENT>"):
+                pass
+
+            elif tag == "<!DOCTYPE>":
+                yield self.doctype(node.text, node.get("publicId"),
+                                   node.get("systemId"))
+                continue
+
+            elif not isinstance(tag, str):
+                yield self.comment(node.text)
+                continue
+
+            else:
+                name = localName(tag)
+                hasChildren = bool(node.text or len(node))
+                if name in voidElements:
+                    for token in self.emptyTag(name, node.attrib.items(),
+                                               hasChildren):
+                        yield token
+                    continue
+                yield self.startTag(name, node.attrib.items())
+                pending.append((False, name))
+
+            for child in reversed(node):
+                if child.tail:
+                    pending.append((True, child.tail))
+                pending.append(child)
+            if node.text:
+                pending.append((True, node.text))
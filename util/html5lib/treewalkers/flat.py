@@ -0,0 +1,58 @@
+from . import _base
+
+from ..treebuilders.flat import NONE, DOCUMENT, FRAGMENT, DOCTYPE, TEXT, \
+    ELEMENT, COMMENT
+
+class TreeWalker(_base.NonRecursiveTreeWalker):
+    """Walks a treebuilders.flat.Tree. The nodes are the indices in the
+    tree, except for the Tree itself which stands for its root, 0"""
+
+    def getNodeDetails(self, node):
+        if node is self.tree:
+            node = 0
+        tree = self.tree
+        kind = tree.kinds[node]
+        if kind in (DOCUMENT, FRAGMENT):
+            return (_base.DOCUMENT,)
+
+        elif kind == DOCTYPE:
+            publicId, systemId = tree.doctypeIds[node]
+            return _base.DOCTYPE, tree.name(node), publicId, systemId
+
+        elif kind == TEXT:
+            return _base.TEXT, tree.value(node)
+
+        elif kind == ELEMENT:
+            return _base.ELEMENT, tree.name(node), \
+                list(tree.attributes(node).items()), \
+                tree.firstChildren[node] != NONE
+
+        elif kind == COMMENT:
+            return _base.COMMENT, tree.value(node)
+
+        else:
+            return _base.UNKNOWN, kind
+
+    def getFirstChild(self, node):
+        if node is self.tree:
+            node = 0
+        child = self.tree.firstChildren[node]
+        if child == NONE:
+            return None
+        return child
+
+    def getNextSibling(self, node):
+        if node is self.tree:
+            node = 0
+        sibling = self.tree.nextSiblings[node]
+        if sibling == NONE:
+            return None
+        return sibling
+
+    def getParentNode(self, node):
+        if node is self.tree:
+            node = 0
+        parent = self.tree.parents[node]
+        if parent == NONE:
+            return None
+        return parent
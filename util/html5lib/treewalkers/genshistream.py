@@ -22,7 +22,7 @@ class TreeWalker(_base.TreeWalker):
                 if ignore_until is None:
                     for token in self.tokens(previous, event):
                         yield token
-                        if token["type"] == "EmptyTag":
+                        if token.type == "EmptyTag":
                             ignore_until = depth
                 if previous[0] == END:
                     depth -= 1
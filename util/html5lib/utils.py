@@ -35,6 +35,93 @@ class MethodDispatcher(dict):
     def __getitem__(self, key):
         return dict.get(self, key, self.default)
 
+class Token(object):
+    """A token produced by the tokenizer or by a tree walker.
+
+    Tokens are compact objects with a fixed set of attributes instead of
+    dicts. type is one of the values in constants.tokenTypes for tokens
+    coming from the tokenizer, or the matching type name for tokens coming
+    from tree walkers. Attributes that are not set for a kind of token (e.g.
+    name for Characters) are missing, exactly as keys of the old token dicts
+    were.
+
+    Tokens can still be used as dicts, so code that reads or modifies
+    token["name"] or token.get("namespace") keeps working:
+
+    t = Token(tokenTypes["StartTag"], [], name="p", selfClosing=False)
+    t["name"] == t.name == "p"
+    """
+
+    __slots__ = ("type", "name", "data", "datavars", "namespace",
+                 "selfClosing", "selfClosingAcknowledged",
+                 "publicId", "systemId", "correct")
+
+    def __init__(self, type, data=None, **kwargs):
+        self.type = type
+        if data is not None:
+            self.data = data
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def fromDict(cls, token):
+        """Make a Token out of a token dict"""
+        data = token.get("data")
+        rv = cls(token["type"], data)
+        for key, value in token.items():
+            if key not in ("type", "data"):
+                setattr(rv, key, value)
+        return rv
+    fromDict = classmethod(fromDict)
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (Token, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        rv = self.__eq__(other)
+        if rv is NotImplemented:
+            return rv
+        return not rv
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Token(%r)" % dict(self.items())
+
 #Pure python implementation of deque taken from the ASPN Python Cookbook
 #Original code by Raymond Hettinger
 
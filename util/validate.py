@@ -1,13 +1,22 @@
+import os.path
 import sys
-import html5lib
+from html5lib import batch
 
-input_filename = sys.argv[1]
-parser = html5lib.HTMLParser()
-with open(input_filename, encoding='utf-8') as stream:
-    data = stream.read()
-html5doc = parser.parse(data, encoding='utf-8')
-if parser.errors:
-    for ((line, column), errtype, params) in parser.errors:
-        print("Error: {} {} on line {} of {}".format(errtype, repr(params), line, input_filename), file=sys.stderr)
-    sys.exit(1)
+# Chapters that haven't changed since the last run aren't parsed again
+cache_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.parsecache')
 
+def main(filenames):
+    # The files are parsed over all the processors of the machine, and only
+    # the errors are wanted, so no tree is built
+    failed = False
+    for input_filename, errors in zip(filenames, batch.parseFiles(filenames, encoding='utf-8', cacheDirectory=cache_directory)):
+        if errors:
+            for ((line, column), errtype, params) in errors:
+                print("Error: {} {} on line {} of {}".format(errtype, repr(params), line, input_filename), file=sys.stderr)
+            failed = True
+    return failed
+
+# Worker processes import this module again where processes are spawned
+if __name__ == '__main__':
+    if main(sys.argv[1:]):
+        sys.exit(1)